@@ -0,0 +1,81 @@
+"""Compares SetRFSettings throughput over unary calls and a ControlSession stream.
+
+Starts an in-process server on a free local port and sends the same
+frequency-hopping sequence both ways over one warm channel:
+
+    python benchmarks/control_session.py --count 5000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import rfcontrol_pb2
+
+from client.rf_client import RFClient
+from server.server import RFControlServicer, add_servicer_to_server
+
+
+def hop_sequence(count: int, device_id: str):
+    """Returns count configs hopping across 100 channels in the 902-928 MHz band."""
+    return [
+        rfcontrol_pb2.RFConfig(frequency=902.0 + (i % 100) * 0.26, gain=20.0, device_id=device_id)
+        for i in range(count)
+    ]
+
+
+def bench_unary(client, configs) -> float:
+    start = time.perf_counter()
+    for config in configs:
+        client.stub.SetRFSettings(config)
+    return time.perf_counter() - start
+
+
+def bench_session(client, configs) -> float:
+    start = time.perf_counter()
+    for _ in client.control_session(configs):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="Updates per run")
+    parser.add_argument("--device-id", type=str, default="BENCH01", help="Device to retune")
+    args = parser.parse_args()
+
+    # Per-request server logging would dominate both numbers
+    logging.disable(logging.INFO)
+
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+
+    configs = hop_sequence(args.count, args.device_id)
+    client = RFClient(f"127.0.0.1:{port}")
+    try:
+        # Warm up the connection and the device before timing
+        bench_unary(client, configs[:100])
+
+        unary = bench_unary(client, configs)
+        session = bench_session(client, configs)
+    finally:
+        server.stop(0)
+        servicer.close()
+
+    print(f"{'path':<10}{'updates':>10}{'seconds':>10}{'updates/s':>12}")
+    for name, elapsed in (("unary", unary), ("session", session)):
+        print(f"{name:<10}{args.count:>10}{elapsed:>10.3f}{args.count / elapsed:>12.0f}")
+    print(f"session speedup: {unary / session:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Load generator and latency benchmark for the RF control server.
+
+Drives SetRFSettings and/or GetDeviceStatus at a fixed rate (open loop) or
+as fast as the concurrency limit allows (closed loop), then reports
+throughput and latency percentiles and can write them as JSON.
+
+    # In-process thread-pool server, 20 000 requests, 64 in flight
+    python benchmarks/loadgen.py --requests 20000 --concurrency 64
+
+    # Server in a subprocess (here the asyncio one), 2 000 req/s for 30 s
+    python benchmarks/loadgen.py --spawn subprocess --server-args="--aio" \\
+        --rate 2000 --duration 30 --output results.json
+
+    # Existing server; fail if p99 or throughput is >10% worse than a baseline
+    python benchmarks/loadgen.py --server localhost:50051 --baseline results.json
+
+With --rate, latency is measured from each request's scheduled send time,
+so a stalled server is charged for the requests queued behind it instead
+of hiding them (coordinated omission).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+
+from client.aio_client import AsyncRFClient
+from client.latency import LatencyStats
+from server.server import RFControlServicer, add_servicer_to_server
+
+METHODS = {
+    "set": ("SetRFSettings",),
+    "status": ("GetDeviceStatus",),
+    "mixed": ("SetRFSettings", "GetDeviceStatus"),
+}
+
+# Metrics compared against --baseline, and whether higher is better.
+REGRESSION_METRICS = (
+    ("throughput_rps", True),
+    ("p50_ms", False),
+    ("p99_ms", False),
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_inprocess_server(workers: int):
+    """Starts a thread-pool server in this process; returns (address, stop)."""
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+
+    def stop():
+        server.stop(0)
+        servicer.close()
+
+    return f"127.0.0.1:{port}", stop
+
+
+def start_subprocess_server(extra_args):
+    """Starts `python -m server.server` on a free port; returns (address, stop)."""
+    address = f"127.0.0.1:{free_port()}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "server.server", "--address", address, *extra_args],
+        env=dict(os.environ, PYTHONPATH=SRC_DIR),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    channel = grpc.insecure_channel(address)
+    try:
+        grpc.channel_ready_future(channel).result(timeout=15)
+    except grpc.FutureTimeoutError:
+        process.kill()
+        raise RuntimeError("Server subprocess did not come up within 15 seconds.")
+    finally:
+        channel.close()
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return address, stop
+
+
+async def run_load(address, args, stats: LatencyStats) -> float:
+    """Sends the configured load and returns the elapsed wall time in seconds."""
+    methods = METHODS[args.method]
+    device_ids = [f"LOAD{i:05d}" for i in range(args.devices)]
+    rng = random.Random(args.seed)
+
+    async with AsyncRFClient(address, max_in_flight=args.concurrency, timeout=args.timeout) as client:
+        async def one(index, scheduled):
+            method = methods[index % len(methods)]
+            device_id = device_ids[index % len(device_ids)]
+            if scheduled is not None:
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            start = scheduled if scheduled is not None else time.perf_counter()
+            ok = True
+            try:
+                if method == "SetRFSettings":
+                    await client.set_settings(rng.uniform(70.0, 6000.0), rng.uniform(0.0, 60.0), device_id)
+                else:
+                    await client.get_status(device_id)
+            except grpc.aio.AioRpcError:
+                ok = False
+            if index >= args.warmup:
+                stats.record(method, time.perf_counter() - start, ok)
+
+        # Warm up the connection and register the devices before timing
+        await asyncio.gather(*(one(i, None) for i in range(args.warmup)))
+
+        counter = iter(range(args.warmup, sys.maxsize))
+        begin = time.perf_counter()
+        if args.rate:
+            # Open loop: request i is due at begin + i / rate, whatever the server does
+            total = args.requests or int(args.rate * args.duration)
+            interval = 1.0 / args.rate
+            tasks = []
+            for i in range(total):
+                tasks.append(asyncio.ensure_future(one(next(counter), begin + i * interval)))
+                # Don't create tasks far ahead of the schedule
+                if i % 1000 == 999:
+                    await asyncio.sleep(max(0.0, begin + (i - 500) * interval - time.perf_counter()))
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: `concurrency` workers each send back to back
+            total = args.requests or sys.maxsize
+            deadline = None if args.requests else begin + args.duration
+
+            async def worker():
+                while True:
+                    index = next(counter)
+                    if index - args.warmup >= total:
+                        return
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+                    await one(index, None)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return time.perf_counter() - begin
+
+
+def build_results(args, stats: LatencyStats, elapsed: float) -> dict:
+    overall = stats.summary()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            key: getattr(args, key)
+            for key in ("spawn", "server_args", "method", "rate", "concurrency",
+                        "requests", "duration", "devices", "warmup")
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "grpc": grpc.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "elapsed_s": elapsed,
+        "throughput_rps": overall["count"] / elapsed if elapsed else 0.0,
+        "overall": overall,
+        "methods": {method: stats.summary(method) for method in stats.methods()},
+    }
+
+
+def print_report(results: dict):
+    print(f"elapsed {results['elapsed_s']:.2f}s, throughput {results['throughput_rps']:.0f} req/s")
+    header = f"{'method':<18}{'count':>8}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}{'max ms':>9}"
+    print(header)
+    rows = list(results["methods"].items()) + [("all", results["overall"])]
+    for name, s in rows:
+        print(
+            f"{name:<18}{s['count']:>8}{s['errors']:>8}{s['p50_ms']:>9.2f}"
+            f"{s['p99_ms']:>9.2f}{s['p99.9_ms']:>10.2f}{s['max_ms']:>9.2f}"
+        )
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float):
+    """Returns a list of regressions beyond tolerance (a fraction, e.g. 0.1)."""
+    regressions = []
+    for metric, higher_is_better in REGRESSION_METRICS:
+        current = results.get(metric, results["overall"].get(metric))
+        previous = baseline.get(metric, baseline["overall"].get(metric))
+        if not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric}: {previous:.2f} -> {current:.2f} ({change:+.1%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[2:]),
+    )
+    target = parser.add_argument_group("server")
+    target.add_argument("--server", type=str, default=None,
+                        help="Address of a running server; if unset, one is started (see --spawn)")
+    target.add_argument("--spawn", choices=["inprocess", "subprocess"], default="inprocess",
+                        help="How to start the server when --server is not given")
+    target.add_argument("--server-args", type=str, default="",
+                        help="Extra arguments for a subprocess server, e.g. \"--aio\"")
+    target.add_argument("--server-workers", type=int, default=10,
+                        help="Thread pool size of an in-process server")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--method", choices=sorted(METHODS), default="mixed",
+                      help="RPCs to send; mixed alternates set and status")
+    load.add_argument("--rate", type=float, default=0.0,
+                      help="Target requests/s (open loop); 0 sends as fast as --concurrency allows")
+    load.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight")
+    load.add_argument("--requests", type=int, default=0, help="Number of timed requests")
+    load.add_argument("--duration", type=float, default=10.0,
+                      help="Seconds to run when --requests is not given")
+    load.add_argument("--devices", type=int, default=100, help="Number of distinct device ids")
+    load.add_argument("--warmup", type=int, default=200, help="Untimed requests sent first")
+    load.add_argument("--timeout", type=float, default=10.0, help="Per-request deadline in seconds")
+    load.add_argument("--seed", type=int, default=0, help="Seed for generated settings")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output", type=str, default=None, help="Write results as JSON to this file")
+    output.add_argument("--baseline", type=str, default=None,
+                        help="JSON results of a previous run to compare against")
+    output.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed fractional regression vs. --baseline before failing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Per-request server logging would dominate the measurement
+    logging.disable(logging.INFO)
+
+    stop = None
+    if args.server:
+        address = args.server
+    elif args.spawn == "subprocess":
+        address, stop = start_subprocess_server(args.server_args.split())
+    else:
+        address, stop = start_inprocess_server(args.server_workers)
+
+    stats = LatencyStats()
+    try:
+        elapsed = asyncio.run(run_load(address, args, stats))
+    finally:
+        if stop is not None:
+            stop()
+
+    results = build_results(args, stats, elapsed)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.max_regression)
+        if regressions:
+            print("REGRESSION against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("no regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import grpc
+
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+from client.channel_pool import DEFAULT_CHANNEL_OPTIONS
+from client.latency import LatencyStats
+from client.rf_client import list_request, rf_config
+
+class AsyncRFClient:
+    """asyncio client for the RFControl service, built on grpc.aio.
+
+    All calls share one channel, so many requests can be in flight at once
+    over a single HTTP/2 connection. max_in_flight caps how many unary calls
+    run concurrently; extra calls wait for a slot instead of piling onto the
+    server. Latency of every unary call is recorded in stats.
+
+        async with AsyncRFClient("localhost:50051", max_in_flight=200) as client:
+            await asyncio.gather(*(
+                client.set_settings(915.0, 20.0, f"DEV{i:03d}") for i in range(500)
+            ))
+            print(client.stats.summary("SetRFSettings"))
+
+    Use the client from one event loop only; grpc.aio channels are bound to
+    the loop they were created on.
+    """
+
+    def __init__(
+        self,
+        server_addr: str,
+        max_in_flight: int = 100,
+        timeout: float = None,
+        options=DEFAULT_CHANNEL_OPTIONS,
+    ):
+        self.server_addr = server_addr
+        self.max_in_flight = max_in_flight
+        self._timeout = timeout
+        self._options = list(options)
+        self._channel = None
+        self._stub = None
+        self._slots = None
+        self.stats = LatencyStats()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def stub(self) -> rfcontrol_pb2_grpc.RFControlStub:
+        if self._stub is None:
+            self._channel = grpc.aio.insecure_channel(self.server_addr, options=self._options)
+            self._stub = rfcontrol_pb2_grpc.RFControlStub(self._channel)
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self._stub
+
+    async def close(self):
+        if self._channel is not None:
+            await self._channel.close()
+        self._channel = self._stub = None
+
+    async def _call(self, method: str, request):
+        stub = self.stub
+        async with self._slots:
+            start = time.perf_counter()
+            ok = False
+            try:
+                response = await getattr(stub, method)(request, timeout=self._timeout)
+                ok = True
+                return response
+            finally:
+                self.stats.record(method, time.perf_counter() - start, ok)
+
+    async def set_settings(self, frequency: float, gain: float, device_id: str, execute_at: float = None):
+        """Calls SetRFSettings and returns the RFResponse; see RFClient.set_settings."""
+        return await self._call("SetRFSettings", rf_config(frequency, gain, device_id, execute_at))
+
+    async def set_settings_batch(self, configs):
+        """Calls SetRFSettingsBatch with a list of RFConfig and returns the RFBatchResponse."""
+        return await self._call("SetRFSettingsBatch", rfcontrol_pb2.RFConfigBatch(configs=configs))
+
+    async def get_status(self, device_id: str, if_newer_than: int = 0, wait_ms: int = 0):
+        """Calls GetDeviceStatus and returns the RFResponse; see RFClient.get_status."""
+        return await self._call(
+            "GetDeviceStatus",
+            rfcontrol_pb2.DeviceStatusRequest(
+                device_id=device_id, if_newer_than=if_newer_than, wait_ms=wait_ms
+            ),
+        )
+
+    def watch_status(self, device_id: str, min_interval_ms: int = 0):
+        """Opens a WatchDeviceStatus stream; use `async for` for updates, cancel() to stop."""
+        return self.stub.WatchDeviceStatus(
+            rfcontrol_pb2.WatchStatusRequest(device_id=device_id, min_interval_ms=min_interval_ms)
+        )
+
+    def sweep(self, start: float, stop: float, step: float, dwell_ms: float, gain: float, device_id: str):
+        """Opens a Sweep stream; see RFClient.sweep."""
+        return self.stub.Sweep(rfcontrol_pb2.SweepRequest(
+            device_id=device_id,
+            start_frequency=start,
+            stop_frequency=stop,
+            step_frequency=step,
+            dwell_ms=dwell_ms,
+            gain=gain,
+        ))
+
+    async def list_devices(self, **query):
+        """Yields every DeviceStatus matching the query; see RFClient.list_devices."""
+        request = list_request(**query)
+        while True:
+            response = await self._call("ListDevices", request)
+            for status in response.devices:
+                yield status
+            if not response.next_page_token:
+                return
+            request.page_token = response.next_page_token
+
+    async def control_session(self, configs):
+        """Sends configs over one ControlSession stream, yielding (config, ack) in order."""
+        configs = list(configs)
+        updates = [
+            rfcontrol_pb2.ControlUpdate(sequence=sequence, config=config)
+            for sequence, config in enumerate(configs)
+        ]
+        async for ack in self.stub.ControlSession(iter(updates), timeout=self._timeout):
+            yield configs[ack.sequence], ack
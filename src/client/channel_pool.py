@@ -0,0 +1,75 @@
+import grpc
+import threading
+
+# Keepalive and reconnect settings for pooled channels.
+#
+# Pings are only sent while calls are in flight (e.g. a long watch stream),
+# no more often than a default gRPC server accepts; more aggressive pings
+# get the connection closed with "too_many_pings". Channels connect lazily
+# on their first call and, after a server restart, reconnect with a short
+# backoff instead of the default of up to two minutes.
+DEFAULT_CHANNEL_OPTIONS = (
+    ("grpc.keepalive_time_ms", 300000),
+    ("grpc.keepalive_timeout_ms", 20000),
+    ("grpc.keepalive_permit_without_calls", 0),
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.min_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 5000),
+)
+
+class ChannelPool:
+    """Shares one gRPC channel per server address.
+
+    gRPC channels are thread-safe and multiplex any number of concurrent
+    calls over one HTTP/2 connection, so reusing a channel saves the TCP and
+    HTTP/2 handshake on every request after the first.
+    """
+
+    def __init__(self, options=DEFAULT_CHANNEL_OPTIONS):
+        self._options = list(options)
+        self._channels = {}
+        self._stubs = {}
+        self._lock = threading.Lock()
+
+    def channel(self, address: str) -> grpc.Channel:
+        """Returns the channel for address, creating it on first use."""
+        channel = self._channels.get(address)
+        if channel is None:
+            with self._lock:
+                channel = self._channels.get(address)
+                if channel is None:
+                    channel = grpc.insecure_channel(address, options=self._options)
+                    self._channels[address] = channel
+        return channel
+
+    def stub(self, address: str, stub_class):
+        """Returns a stub_class stub bound to the pooled channel for address."""
+        key = (address, stub_class)
+        stub = self._stubs.get(key)
+        if stub is None:
+            stub = stub_class(self.channel(address))
+            with self._lock:
+                stub = self._stubs.setdefault(key, stub)
+        return stub
+
+    def reset(self, address: str):
+        """Closes the channel for address; the next call opens a fresh one."""
+        with self._lock:
+            channel = self._channels.pop(address, None)
+            self._stubs = {key: stub for key, stub in self._stubs.items() if key[0] != address}
+        if channel is not None:
+            channel.close()
+
+    def close(self):
+        """Closes every pooled channel."""
+        with self._lock:
+            channels, self._channels = list(self._channels.values()), {}
+            self._stubs = {}
+        for channel in channels:
+            channel.close()
+
+_default_pool = ChannelPool()
+
+def default_pool() -> ChannelPool:
+    """Returns the process-wide channel pool shared by all clients."""
+    return _default_pool
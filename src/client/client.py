@@ -1,29 +1,155 @@
 import grpc
+import json
 import logging
 import argparse
 
-# Import generated classes
+from google.protobuf import text_format
+
 import rfcontrol_pb2
 import rfcontrol_pb2_grpc
 
+from client.channel_pool import default_pool
+from client.rf_client import RFClient, rf_config
+
 logging.basicConfig(level=logging.INFO)
 
-def run(frequency: float, gain: float, device_id: str, server_addr: str):
+def run(frequency: float, gain: float, device_id: str, server_addr: str, execute_at: float = None):
     """Contacts the gRPC server and sends RF settings."""
-    # NOTE(gRPC Python Team): .close() is possible on a channel and should be
-    # used in circumstances in which the with statement does not fit the needs
-    # of the code.
-    with grpc.insecure_channel(server_addr) as channel:
-        stub = rfcontrol_pb2_grpc.RFControlStub(channel)
-        try:
-            response = stub.SetRFSettings(
-                rfcontrol_pb2.RFConfig(
-                    frequency=frequency, gain=gain, device_id=device_id
+    try:
+        response = RFClient(server_addr).set_settings(frequency, gain, device_id, execute_at)
+        logging.info(f"Server Response: Success={response.success}, Status='{response.device_status}'")
+        if execute_at is not None:
+            logging.info(f"Applied {response.apply_error_us:.1f}us after the requested time")
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+
+
+def load_batch(path: str):
+    """Reads a batch file: a JSON list of {"frequency", "gain", "device_id", "execute_at"} objects.
+
+    device_id and execute_at (Unix time in seconds) are optional.
+    """
+    with open(path) as f:
+        items = json.load(f)
+    return [
+        rf_config(
+            float(item["frequency"]),
+            float(item["gain"]),
+            str(item.get("device_id", "")),
+            item.get("execute_at"),
+        )
+        for item in items
+    ]
+
+def run_batch(configs, server_addr: str):
+    """Sends all RF settings in a single SetRFSettingsBatch call."""
+    try:
+        response = RFClient(server_addr).set_settings_batch(configs)
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+        return
+    for config, result in zip(configs, response.results):
+        logging.info(
+            f"Server Response [{config.device_id}]: Success={result.success}, "
+            f"Status='{result.device_status}'"
+        )
+    failed = sum(1 for result in response.results if not result.success)
+    logging.info(f"Batch complete: {len(response.results) - failed} succeeded, {failed} failed")
+
+def run_session(configs, server_addr: str):
+    """Applies settings one after another over a single ControlSession stream."""
+    failed = 0
+    try:
+        for config, ack in RFClient(server_addr).control_session(configs):
+            if not ack.success:
+                failed += 1
+                logging.warning(
+                    f"Update #{ack.sequence} [{config.device_id}] failed: '{ack.device_status}'"
                 )
-            )
-            logging.info(f"Server Response: Success={response.success}, Status='{response.device_status}'")
-        except grpc.RpcError as e:
+            last = ack
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+        return
+    if configs:
+        logging.info(f"Final Status: '{last.device_status}'")
+    logging.info(f"Session complete: {len(configs) - failed} succeeded, {failed} failed")
+
+def watch(device_id: str, server_addr: str, min_interval_ms: int = 0):
+    """Streams status updates for a device until interrupted."""
+    updates = RFClient(server_addr).watch_status(device_id, min_interval_ms)
+    try:
+        for update in updates:
+            logging.info(f"Status Update [{device_id}]: '{update.device_status}'")
+    except grpc.RpcError as e:
+        if e.code() != grpc.StatusCode.CANCELLED:
             logging.error(f"RPC failed: {e.code()} - {e.details()}")
+    except KeyboardInterrupt:
+        updates.cancel()
+
+def sweep(start: float, stop: float, step: float, dwell_ms: float, gain: float,
+          device_id: str, server_addr: str):
+    """Runs a server-side sweep, logging each step and the timing summary."""
+    progress = RFClient(server_addr).sweep(start, stop, step, dwell_ms, gain, device_id)
+    try:
+        for message in progress:
+            if message.HasField("step"):
+                s = message.step
+                logging.info(
+                    f"Step {s.index}: {s.frequency} MHz, Success={s.success}, "
+                    f"late {s.late_us:.0f} us"
+                )
+            else:
+                s = message.summary
+                logging.info(
+                    f"Sweep complete: {s.steps} steps, {s.failed} failed in {s.elapsed_ms:.1f} ms; "
+                    f"lateness mean {s.late_mean_us:.0f} us, p99 {s.late_p99_us:.0f} us, "
+                    f"max {s.late_max_us:.0f} us"
+                )
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+    except KeyboardInterrupt:
+        progress.cancel()
+
+def list_devices(server_addr: str, **query):
+    """Prints the devices matching query, one per line."""
+    count = 0
+    try:
+        for status in RFClient(server_addr).list_devices(**query):
+            print(text_format.MessageToString(status, as_one_line=True))
+            count += 1
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+        return
+    logging.info(f"{count} devices listed")
+
+def profile(seconds: float, mode: str, output: str, server_addr: str):
+    """Profiles the server for seconds and writes the profile to output."""
+    admin = default_pool().stub(server_addr, rfcontrol_pb2_grpc.AdminStub)
+    request = rfcontrol_pb2.ProfileRequest(
+        mode=rfcontrol_pb2.ProfileRequest.Mode.Value(mode.upper()), seconds=seconds
+    )
+    try:
+        result = admin.Profile(request)
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+        return
+    path = output or f"rfcontrol-{result.pid}.{'collapsed' if result.format == 'collapsed' else 'pstats'}"
+    with open(path, "wb") as f:
+        f.write(result.data)
+    logging.info(f"Profile of server process {result.pid} written to {path}\n{result.summary}")
+
+def dump_threads(thread_prefix: str, server_addr: str):
+    """Prints the stack of every server thread whose name starts with thread_prefix."""
+    admin = default_pool().stub(server_addr, rfcontrol_pb2_grpc.AdminStub)
+    try:
+        dump = admin.DumpThreads(rfcontrol_pb2.ThreadDumpRequest(thread_prefix=thread_prefix))
+    except grpc.RpcError as e:
+        logging.error(f"RPC failed: {e.code()} - {e.details()}")
+        return
+    for thread in dump.threads:
+        print(f"--- {thread.name} ({thread.ident}{', daemon' if thread.daemon else ''}) ---")
+        print(thread.stack)
+    logging.info(f"{len(dump.threads)} threads in server process {dump.pid}")
 
 
 if __name__ == '__main__':
@@ -40,6 +166,90 @@ if __name__ == '__main__':
     parser.add_argument(
         "--id", type=str, default="DEV001", help="Device ID to configure"
     )
+    parser.add_argument(
+        "--at", type=float, default=None,
+        help="Unix time at which the server should apply --freq/--gain"
+    )
+    parser.add_argument(
+        "--batch", type=str, default=None,
+        help="JSON file with a list of settings to apply in one batch call "
+             "(overrides --freq/--gain/--id)"
+    )
+    parser.add_argument(
+        "--session", type=str, default=None,
+        help="JSON file (same format as --batch) whose settings are applied in order "
+             "over one ControlSession stream"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Stream status updates for --id instead of setting RF parameters"
+    )
+    parser.add_argument(
+        "--min-interval-ms", type=int, default=0,
+        help="With --watch, minimum gap between updates; faster changes are coalesced"
+    )
+    parser.add_argument(
+        "--sweep", type=float, nargs=3, metavar=("START", "STOP", "STEP"), default=None,
+        help="Sweep --id from START to STOP MHz in STEP increments at --gain, run on the server"
+    )
+    parser.add_argument(
+        "--dwell-ms", type=float, default=10.0, help="With --sweep, time spent on each step"
+    )
+    parser.add_argument(
+        "--list", action="store_true",
+        help="List the server's devices matching --band, --min-gain, --max-gain, --state "
+             "and --id-prefix instead of setting RF parameters"
+    )
+    parser.add_argument(
+        "--band", type=float, nargs=2, metavar=("LOW", "HIGH"), default=(None, None),
+        help="With --list, only devices tuned from LOW to HIGH MHz"
+    )
+    parser.add_argument("--min-gain", type=float, default=None, help="With --list, lowest gain in dB")
+    parser.add_argument("--max-gain", type=float, default=None, help="With --list, highest gain in dB")
+    parser.add_argument(
+        "--state", choices=["disconnected", "idle", "operating"], action="append", default=[],
+        help="With --list, only devices in this state (repeatable)"
+    )
+    parser.add_argument("--id-prefix", type=str, default="", help="With --list, only ids starting with this")
+    parser.add_argument(
+        "--fields", type=str, default="",
+        help="With --list, comma-separated DeviceStatus fields to return (default all)"
+    )
+    parser.add_argument(
+        "--profile", type=float, default=None, metavar="SECONDS",
+        help="Profile the server (started with --admin) for SECONDS and save the result"
+    )
+    parser.add_argument(
+        "--profile-mode", choices=["sample", "cprofile"], default="sample",
+        help="With --profile, sample all thread stacks or cProfile the RPC handlers"
+    )
+    parser.add_argument(
+        "--profile-out", type=str, default=None,
+        help="With --profile, file to write (collapsed stacks or pstats)"
+    )
+    parser.add_argument(
+        "--dump-threads", type=str, nargs="?", const="", default=None, metavar="PREFIX",
+        help="Print the stacks of the server's threads, optionally only those named PREFIX*"
+    )
     args = parser.parse_args()
 
-    run(args.freq, args.gain, args.id, args.server)
+    if args.profile is not None:
+        profile(args.profile, args.profile_mode, args.profile_out, args.server)
+    elif args.dump_threads is not None:
+        dump_threads(args.dump_threads, args.server)
+    elif args.list:
+        list_devices(
+            args.server, min_frequency=args.band[0], max_frequency=args.band[1],
+            min_gain=args.min_gain, max_gain=args.max_gain, states=args.state,
+            id_prefix=args.id_prefix, fields=[f for f in args.fields.split(",") if f],
+        )
+    elif args.watch:
+        watch(args.id, args.server, args.min_interval_ms)
+    elif args.batch:
+        run_batch(load_batch(args.batch), args.server)
+    elif args.session:
+        run_session(load_batch(args.session), args.server)
+    elif args.sweep:
+        sweep(*args.sweep, args.dwell_ms, args.gain, args.id, args.server)
+    else:
+        run(args.freq, args.gain, args.id, args.server, args.at)
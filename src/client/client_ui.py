@@ -1,21 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
+import asyncio
 import logging
 import grpc
 
 # Import gRPC client logic
-import rfcontrol_pb2
-import rfcontrol_pb2_grpc
+from client.aio_client import AsyncRFClient
 
 logging.basicConfig(level=logging.INFO)
 
+# Minimum gap between status updates while watching; faster changes are coalesced.
+WATCH_MIN_INTERVAL_MS = 100
+
 class RFControlUI(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("RF Device Control")
         self.geometry("400x400")
 
+        # All gRPC calls run as tasks on one background event loop, so a
+        # click never blocks the UI and never needs a thread of its own
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="grpc-loop", daemon=True).start()
+        # One AsyncRFClient (and channel) per server address, used on the loop only
+        self._clients = {}
+        # Active WatchDeviceStatus task, if any
+        self._watch_future = None
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.create_widgets()
 
     def create_widgets(self):
@@ -59,6 +73,9 @@ class RFControlUI(tk.Tk):
         self.get_status_button = ttk.Button(button_frame, text="Get Device Status", command=self.get_device_status)
         self.get_status_button.pack(side="left", padx=5)
 
+        self.watch_button = ttk.Button(button_frame, text="Watch Status", command=self.toggle_watch)
+        self.watch_button.pack(side="left", padx=5)
+
         # Response Frame
         response_frame = ttk.LabelFrame(self, text="Server Response", padding="10")
         response_frame.pack(padx=10, pady=10, fill="both", expand=True)
@@ -86,11 +103,7 @@ class RFControlUI(tk.Tk):
             self.set_button.config(state="normal")
             return
 
-        # Run the gRPC call in a separate thread to keep the UI responsive
-        threading.Thread(
-            target=self._send_grpc_request,
-            args=(frequency, gain, device_id, server_addr)
-        ).start()
+        self._submit(self._send_grpc_request(frequency, gain, device_id, server_addr))
 
     def get_device_status(self):
         self.status_label.config(text="Getting device status...")
@@ -100,21 +113,64 @@ class RFControlUI(tk.Tk):
         device_id = self.id_entry.get()
         server_addr = self.server_entry.get()
 
-        threading.Thread(
-            target=self._get_status_grpc_request,
-            args=(device_id, server_addr)
-        ).start()
+        self._submit(self._get_status_grpc_request(device_id, server_addr))
+
+    def _submit(self, coro):
+        """Schedules a coroutine on the gRPC loop and returns its concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _client(self, server_addr):
+        client = self._clients.get(server_addr)
+        if client is None:
+            client = self._clients[server_addr] = AsyncRFClient(server_addr)
+        return client
+
+    def toggle_watch(self):
+        if self._watch_future is not None:
+            self._watch_future.cancel()
+            return
+
+        device_id = self.id_entry.get()
+        server_addr = self.server_entry.get()
+        self.clear_response_text()
+        self.status_label.config(text=f"Watching {device_id}...")
+        self.watch_button.config(text="Stop Watching")
+
+        self._watch_future = self._submit(self._watch_grpc_stream(device_id, server_addr))
+
+    async def _watch_grpc_stream(self, device_id, server_addr):
+        # One stream for the whole watch; the server pushes updates only when
+        # the device changes, so there is nothing to poll.
+        call = self._client(server_addr).watch_status(device_id, WATCH_MIN_INTERVAL_MS)
+        try:
+            async for update in call:
+                self.after(0, self.display_status_update, update.device_status)
+        except asyncio.CancelledError:
+            call.cancel()
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                self.after(0, self.display_error, f"RPC failed: {e.code()} - {e.details()}")
+        except Exception as e:
+            self.after(0, self.display_error, f"An unexpected error occurred: {e}")
+        finally:
+            self.after(0, self._watch_stopped)
+
+    def _watch_stopped(self):
+        self._watch_future = None
+        self.watch_button.config(text="Watch Status")
+        self.status_label.config(text="Stopped watching")
+
+    def display_status_update(self, status):
+        self.response_text.config(state="normal")
+        self.response_text.delete(1.0, tk.END)
+        self.response_text.insert(tk.END, f"Device Status: {status}\n")
+        self.response_text.config(state="disabled")
 
-    def _send_grpc_request(self, frequency, gain, device_id, server_addr):
+    async def _send_grpc_request(self, frequency, gain, device_id, server_addr):
         try:
-            with grpc.insecure_channel(server_addr) as channel:
-                stub = rfcontrol_pb2_grpc.RFControlStub(channel)
-                response = stub.SetRFSettings(
-                    rfcontrol_pb2.RFConfig(
-                        frequency=frequency, gain=gain, device_id=device_id
-                    )
-                )
-                self.after(0, self.display_response, response.success, response.device_status)
+            # Reuses the client's channel, so only the first click pays for the connection
+            response = await self._client(server_addr).set_settings(frequency, gain, device_id)
+            self.after(0, self.display_response, response.success, response.device_status)
         except grpc.RpcError as e:
             self.after(0, self.display_error, f"RPC failed: {e.code()} - {e.details()}")
         except Exception as e:
@@ -123,14 +179,10 @@ class RFControlUI(tk.Tk):
             self.after(0, lambda: self.set_button.config(state="normal"))
             self.after(0, lambda: self.get_status_button.config(state="normal"))
 
-    def _get_status_grpc_request(self, device_id, server_addr):
+    async def _get_status_grpc_request(self, device_id, server_addr):
         try:
-            with grpc.insecure_channel(server_addr) as channel:
-                stub = rfcontrol_pb2_grpc.RFControlStub(channel)
-                response = stub.GetDeviceStatus(
-                    rfcontrol_pb2.DeviceStatusRequest(device_id=device_id)
-                )
-                self.after(0, self.display_response, response.success, response.device_status)
+            response = await self._client(server_addr).get_status(device_id)
+            self.after(0, self.display_response, response.success, response.device_status)
         except grpc.RpcError as e:
             self.after(0, self.display_error, f"RPC failed: {e.code()} - {e.details()}")
         except Exception as e:
@@ -153,6 +205,21 @@ class RFControlUI(tk.Tk):
         self.status_label.config(text="Error during request")
         messagebox.showerror("Error", error_message)
 
+    async def _close_clients(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+    def on_close(self):
+        if self._watch_future is not None:
+            self._watch_future.cancel()
+        try:
+            self._submit(self._close_clients()).result(timeout=2)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.destroy()
+
     def clear_response_text(self):
         self.response_text.config(state="normal")
         self.response_text.delete(1.0, tk.END)
@@ -0,0 +1,60 @@
+import math
+import threading
+
+def percentile(sorted_values, q: float) -> float:
+    """Returns the q-th percentile (0-100) of an ascending list, nearest-rank method."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class LatencyStats:
+    """Records call latencies per method and summarizes them.
+
+    Every sample is kept, so percentiles are exact; call reset() between
+    runs when recording millions of calls.
+    """
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        self._samples = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self._samples.setdefault(method, []).append(seconds)
+            if not ok:
+                self._errors[method] = self._errors.get(method, 0) + 1
+
+    def methods(self):
+        return list(self._samples)
+
+    def summary(self, method: str = None) -> dict:
+        """Returns count, errors, mean, max and percentiles (in milliseconds).
+
+        Without a method, all methods are summarized together.
+        """
+        with self._lock:
+            if method is None:
+                samples = [s for values in self._samples.values() for s in values]
+                errors = sum(self._errors.values())
+            else:
+                samples = list(self._samples.get(method, ()))
+                errors = self._errors.get(method, 0)
+        samples.sort()
+        result = {
+            "count": len(samples),
+            "errors": errors,
+            "mean_ms": 1000.0 * sum(samples) / len(samples) if samples else 0.0,
+            "max_ms": 1000.0 * samples[-1] if samples else 0.0,
+        }
+        for q in self.PERCENTILES:
+            result[f"p{q:g}_ms"] = 1000.0 * percentile(samples, q)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._errors.clear()
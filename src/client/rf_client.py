@@ -0,0 +1,115 @@
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+from client.channel_pool import ChannelPool, default_pool
+
+def rf_config(frequency: float, gain: float, device_id: str, execute_at: float = None):
+    """Builds an RFConfig; execute_at is a Unix time in seconds."""
+    config = rfcontrol_pb2.RFConfig(frequency=frequency, gain=gain, device_id=device_id)
+    if execute_at is not None:
+        config.execute_at.FromNanoseconds(int(execute_at * 1e9))
+    return config
+
+def list_request(min_frequency: float = None, max_frequency: float = None, min_gain: float = None,
+                 max_gain: float = None, states=(), id_prefix: str = "", fields=(), page_size: int = 0):
+    """Builds a ListDevicesRequest; states are names such as "OPERATING"."""
+    request = rfcontrol_pb2.ListDevicesRequest(
+        states=[rfcontrol_pb2.DeviceState.Value(f"DEVICE_STATE_{state.upper()}") for state in states],
+        id_prefix=id_prefix,
+        page_size=page_size,
+    )
+    bounds = dict(min_frequency=min_frequency, max_frequency=max_frequency, min_gain=min_gain, max_gain=max_gain)
+    for name, value in bounds.items():
+        if value is not None:
+            setattr(request, name, value)
+    request.fields.paths.extend(fields)
+    return request
+
+class RFClient:
+    """Blocking client for the RFControl service.
+
+    Clients for the same server address share one pooled channel, so
+    creating an RFClient per request is cheap and every call after the
+    first reuses a warm connection. Errors are raised as grpc.RpcError.
+    """
+
+    def __init__(self, server_addr: str, pool: ChannelPool = None, timeout: float = None):
+        self.server_addr = server_addr
+        self._pool = pool if pool is not None else default_pool()
+        self._timeout = timeout
+
+    @property
+    def stub(self) -> rfcontrol_pb2_grpc.RFControlStub:
+        return self._pool.stub(self.server_addr, rfcontrol_pb2_grpc.RFControlStub)
+
+    def set_settings(self, frequency: float, gain: float, device_id: str, execute_at: float = None):
+        """Calls SetRFSettings and returns the RFResponse.
+
+        With execute_at (Unix time in seconds), the server applies the
+        settings at that time and the call returns once they are applied;
+        apply_error_us in the reply says how late that was.
+        """
+        return self.stub.SetRFSettings(
+            rf_config(frequency, gain, device_id, execute_at), timeout=self._timeout
+        )
+
+    def set_settings_batch(self, configs):
+        """Calls SetRFSettingsBatch with a list of RFConfig and returns the RFBatchResponse."""
+        return self.stub.SetRFSettingsBatch(
+            rfcontrol_pb2.RFConfigBatch(configs=configs), timeout=self._timeout
+        )
+
+    def get_status(self, device_id: str, if_newer_than: int = 0, wait_ms: int = 0):
+        """Calls GetDeviceStatus and returns the RFResponse.
+
+        With if_newer_than (a status.generation seen before), the reply has
+        not_modified set unless the status changed since; wait_ms makes the
+        server hold the call until a change or the wait runs out.
+        """
+        return self.stub.GetDeviceStatus(
+            rfcontrol_pb2.DeviceStatusRequest(
+                device_id=device_id, if_newer_than=if_newer_than, wait_ms=wait_ms
+            ),
+            timeout=self._timeout,
+        )
+
+    def watch_status(self, device_id: str, min_interval_ms: int = 0):
+        """Opens a WatchDeviceStatus stream; iterate it for updates, cancel() to stop."""
+        return self.stub.WatchDeviceStatus(
+            rfcontrol_pb2.WatchStatusRequest(device_id=device_id, min_interval_ms=min_interval_ms)
+        )
+
+    def sweep(self, start: float, stop: float, step: float, dwell_ms: float, gain: float, device_id: str):
+        """Opens a Sweep stream of SweepProgress messages; the last one holds the summary."""
+        return self.stub.Sweep(rfcontrol_pb2.SweepRequest(
+            device_id=device_id,
+            start_frequency=start,
+            stop_frequency=stop,
+            step_frequency=step,
+            dwell_ms=dwell_ms,
+            gain=gain,
+        ))
+
+    def list_devices(self, **query):
+        """Calls ListDevices page after page, yielding every matching DeviceStatus.
+
+        Takes the arguments of list_request(), e.g.
+        list_devices(min_frequency=902.0, max_frequency=928.0, fields=["device_id"]).
+        """
+        request = list_request(**query)
+        while True:
+            response = self.stub.ListDevices(request, timeout=self._timeout)
+            yield from response.devices
+            if not response.next_page_token:
+                return
+            request.page_token = response.next_page_token
+
+    def control_session(self, configs):
+        """Sends configs over one ControlSession stream, yielding (config, ack) in order."""
+        configs = list(configs)
+        updates = (
+            rfcontrol_pb2.ControlUpdate(sequence=sequence, config=config)
+            for sequence, config in enumerate(configs)
+        )
+        for ack in self.stub.ControlSession(updates, timeout=self._timeout):
+            yield configs[ack.sequence], ack
@@ -22,21 +22,63 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
+from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0frfcontrol.proto\x12\trfcontrol\">\n\x08RFConfig\x12\x11\n\tfrequency\x18\x01 \x01(\x01\x12\x0c\n\x04gain\x18\x02 \x01(\x01\x12\x11\n\tdevice_id\x18\x03 \x01(\t\"(\n\x13\x44\x65viceStatusRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\"4\n\nRFResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rdevice_status\x18\x02 \x01(\t2\x96\x01\n\tRFControl\x12=\n\rSetRFSettings\x12\x13.rfcontrol.RFConfig\x1a\x15.rfcontrol.RFResponse\"\x00\x12J\n\x0fGetDeviceStatus\x12\x1e.rfcontrol.DeviceStatusRequest\x1a\x15.rfcontrol.RFResponse\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0frfcontrol.proto\x12\trfcontrol\x1a google/protobuf/field_mask.proto\x1a\x1fgoogle/protobuf/timestamp.proto\"n\n\x08RFConfig\x12\x11\n\tfrequency\x18\x01 \x01(\x01\x12\x0c\n\x04gain\x18\x02 \x01(\x01\x12\x11\n\tdevice_id\x18\x03 \x01(\t\x12.\n\nexecute_at\x18\x04 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\"P\n\x13\x44\x65viceStatusRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\x15\n\rif_newer_than\x18\x02 \x01(\x04\x12\x0f\n\x07wait_ms\x18\x03 \x01(\r\"@\n\x12WatchStatusRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\x17\n\x0fmin_interval_ms\x18\x02 \x01(\r\"\x9f\x01\n\nRFResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rdevice_status\x18\x02 \x01(\t\x12\x12\n\nsuperseded\x18\x03 \x01(\x08\x12\'\n\x06status\x18\x04 \x01(\x0b\x32\x17.rfcontrol.DeviceStatus\x12\x14\n\x0cnot_modified\x18\x05 \x01(\x08\x12\x16\n\x0e\x61pply_error_us\x18\x06 \x01(\x01\"\xad\x01\n\x0c\x44\x65viceStatus\x12%\n\x05state\x18\x01 \x01(\x0e\x32\x16.rfcontrol.DeviceState\x12\x11\n\tfrequency\x18\x02 \x01(\x01\x12\x0c\n\x04gain\x18\x03 \x01(\x01\x12\x11\n\tdevice_id\x18\x04 \x01(\t\x12.\n\nupdated_at\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x12\n\ngeneration\x18\x06 \x01(\x04\"5\n\rRFConfigBatch\x12$\n\x07\x63onfigs\x18\x01 \x03(\x0b\x32\x13.rfcontrol.RFConfig\"9\n\x0fRFBatchResponse\x12&\n\x07results\x18\x01 \x03(\x0b\x32\x15.rfcontrol.RFResponse\"F\n\rControlUpdate\x12\x10\n\x08sequence\x18\x01 \x01(\x04\x12#\n\x06\x63onfig\x18\x02 \x01(\x0b\x32\x13.rfcontrol.RFConfig\"^\n\nControlAck\x12\x10\n\x08sequence\x18\x01 \x01(\x04\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x15\n\rdevice_status\x18\x03 \x01(\t\x12\x16\n\x0e\x61pply_error_us\x18\x04 \x01(\x01\"\x8a\x01\n\x0cSweepRequest\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\x17\n\x0fstart_frequency\x18\x02 \x01(\x01\x12\x16\n\x0estop_frequency\x18\x03 \x01(\x01\x12\x16\n\x0estep_frequency\x18\x04 \x01(\x01\x12\x10\n\x08\x64well_ms\x18\x05 \x01(\x01\x12\x0c\n\x04gain\x18\x06 \x01(\x01\"|\n\tSweepStep\x12\r\n\x05index\x18\x01 \x01(\r\x12\x11\n\tfrequency\x18\x02 \x01(\x01\x12\x0f\n\x07success\x18\x03 \x01(\x08\x12\x15\n\rdevice_status\x18\x04 \x01(\t\x12\x14\n\x0cscheduled_ms\x18\x05 \x01(\x01\x12\x0f\n\x07late_us\x18\x06 \x01(\x01\"\xa9\x01\n\x0cSweepSummary\x12\r\n\x05steps\x18\x01 \x01(\r\x12\x0e\n\x06\x66\x61iled\x18\x02 \x01(\r\x12\x11\n\tcancelled\x18\x03 \x01(\x08\x12\x12\n\nelapsed_ms\x18\x04 \x01(\x01\x12\x14\n\x0clate_mean_us\x18\x05 \x01(\x01\x12\x13\n\x0blate_p50_us\x18\x06 \x01(\x01\x12\x13\n\x0blate_p99_us\x18\x07 \x01(\x01\x12\x13\n\x0blate_max_us\x18\x08 \x01(\x01\"i\n\rSweepProgress\x12$\n\x04step\x18\x01 \x01(\x0b\x32\x14.rfcontrol.SweepStepH\x00\x12*\n\x07summary\x18\x02 \x01(\x0b\x32\x17.rfcontrol.SweepSummaryH\x00\x42\x06\n\x04kind\"\xc6\x02\n\x12ListDevicesRequest\x12\x1a\n\rmin_frequency\x18\x01 \x01(\x01H\x00\x88\x01\x01\x12\x1a\n\rmax_frequency\x18\x02 \x01(\x01H\x01\x88\x01\x01\x12\x15\n\x08min_gain\x18\x03 \x01(\x01H\x02\x88\x01\x01\x12\x15\n\x08max_gain\x18\x04 \x01(\x01H\x03\x88\x01\x01\x12&\n\x06states\x18\x05 \x03(\x0e\x32\x16.rfcontrol.DeviceState\x12\x11\n\tid_prefix\x18\x06 \x01(\t\x12*\n\x06\x66ields\x18\x07 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x11\n\tpage_size\x18\x08 \x01(\r\x12\x12\n\npage_token\x18\t \x01(\tB\x10\n\x0e_min_frequencyB\x10\n\x0e_max_frequencyB\x0b\n\t_min_gainB\x0b\n\t_max_gain\"X\n\x13ListDevicesResponse\x12(\n\x07\x64\x65vices\x18\x01 \x03(\x0b\x32\x17.rfcontrol.DeviceStatus\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"\x9d\x01\n\x0eProfileRequest\x12,\n\x04mode\x18\x01 \x01(\x0e\x32\x1e.rfcontrol.ProfileRequest.Mode\x12\x0f\n\x07seconds\x18\x02 \x01(\x01\x12\x13\n\x0binterval_ms\x18\x03 \x01(\x01\x12\x15\n\rthread_prefix\x18\x04 \x01(\t\" \n\x04Mode\x12\n\n\x06SAMPLE\x10\x00\x12\x0c\n\x08\x43PROFILE\x10\x01\"j\n\rProfileResult\x12\x0e\n\x06\x66ormat\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\x12\x0f\n\x07summary\x18\x03 \x01(\t\x12\x0f\n\x07samples\x18\x04 \x01(\x04\x12\x0c\n\x04path\x18\x05 \x01(\t\x12\x0b\n\x03pid\x18\x06 \x01(\x05\"*\n\x11ThreadDumpRequest\x12\x15\n\rthread_prefix\x18\x01 \x01(\t\"I\n\x0bThreadStack\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05ident\x18\x02 \x01(\x04\x12\x0e\n\x06\x64\x61\x65mon\x18\x03 \x01(\x08\x12\r\n\x05stack\x18\x04 \x01(\t\"B\n\nThreadDump\x12\x0b\n\x03pid\x18\x01 \x01(\x05\x12\'\n\x07threads\x18\x02 \x03(\x0b\x32\x16.rfcontrol.ThreadStack*}\n\x0b\x44\x65viceState\x12\x1c\n\x18\x44\x45VICE_STATE_UNSPECIFIED\x10\x00\x12\x1d\n\x19\x44\x45VICE_STATE_DISCONNECTED\x10\x01\x12\x15\n\x11\x44\x45VICE_STATE_IDLE\x10\x02\x12\x1a\n\x16\x44\x45VICE_STATE_OPERATING\x10\x03\x32\x8c\x04\n\tRFControl\x12=\n\rSetRFSettings\x12\x13.rfcontrol.RFConfig\x1a\x15.rfcontrol.RFResponse\"\x00\x12J\n\x0fGetDeviceStatus\x12\x1e.rfcontrol.DeviceStatusRequest\x1a\x15.rfcontrol.RFResponse\"\x00\x12L\n\x12SetRFSettingsBatch\x12\x18.rfcontrol.RFConfigBatch\x1a\x1a.rfcontrol.RFBatchResponse\"\x00\x12M\n\x11WatchDeviceStatus\x12\x1d.rfcontrol.WatchStatusRequest\x1a\x15.rfcontrol.RFResponse\"\x00\x30\x01\x12G\n\x0e\x43ontrolSession\x12\x18.rfcontrol.ControlUpdate\x1a\x15.rfcontrol.ControlAck\"\x00(\x01\x30\x01\x12>\n\x05Sweep\x12\x17.rfcontrol.SweepRequest\x1a\x18.rfcontrol.SweepProgress\"\x00\x30\x01\x12N\n\x0bListDevices\x12\x1d.rfcontrol.ListDevicesRequest\x1a\x1e.rfcontrol.ListDevicesResponse\"\x00\x32\x8f\x01\n\x05\x41\x64min\x12@\n\x07Profile\x12\x19.rfcontrol.ProfileRequest\x1a\x18.rfcontrol.ProfileResult\"\x00\x12\x44\n\x0b\x44umpThreads\x12\x1c.rfcontrol.ThreadDumpRequest\x1a\x15.rfcontrol.ThreadDump\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'rfcontrol_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_RFCONFIG']._serialized_start=30
-  _globals['_RFCONFIG']._serialized_end=92
-  _globals['_DEVICESTATUSREQUEST']._serialized_start=94
-  _globals['_DEVICESTATUSREQUEST']._serialized_end=134
-  _globals['_RFRESPONSE']._serialized_start=136
-  _globals['_RFRESPONSE']._serialized_end=188
-  _globals['_RFCONTROL']._serialized_start=191
-  _globals['_RFCONTROL']._serialized_end=341
+  _globals['_DEVICESTATE']._serialized_start=2397
+  _globals['_DEVICESTATE']._serialized_end=2522
+  _globals['_RFCONFIG']._serialized_start=97
+  _globals['_RFCONFIG']._serialized_end=207
+  _globals['_DEVICESTATUSREQUEST']._serialized_start=209
+  _globals['_DEVICESTATUSREQUEST']._serialized_end=289
+  _globals['_WATCHSTATUSREQUEST']._serialized_start=291
+  _globals['_WATCHSTATUSREQUEST']._serialized_end=355
+  _globals['_RFRESPONSE']._serialized_start=358
+  _globals['_RFRESPONSE']._serialized_end=517
+  _globals['_DEVICESTATUS']._serialized_start=520
+  _globals['_DEVICESTATUS']._serialized_end=693
+  _globals['_RFCONFIGBATCH']._serialized_start=695
+  _globals['_RFCONFIGBATCH']._serialized_end=748
+  _globals['_RFBATCHRESPONSE']._serialized_start=750
+  _globals['_RFBATCHRESPONSE']._serialized_end=807
+  _globals['_CONTROLUPDATE']._serialized_start=809
+  _globals['_CONTROLUPDATE']._serialized_end=879
+  _globals['_CONTROLACK']._serialized_start=881
+  _globals['_CONTROLACK']._serialized_end=975
+  _globals['_SWEEPREQUEST']._serialized_start=978
+  _globals['_SWEEPREQUEST']._serialized_end=1116
+  _globals['_SWEEPSTEP']._serialized_start=1118
+  _globals['_SWEEPSTEP']._serialized_end=1242
+  _globals['_SWEEPSUMMARY']._serialized_start=1245
+  _globals['_SWEEPSUMMARY']._serialized_end=1414
+  _globals['_SWEEPPROGRESS']._serialized_start=1416
+  _globals['_SWEEPPROGRESS']._serialized_end=1521
+  _globals['_LISTDEVICESREQUEST']._serialized_start=1524
+  _globals['_LISTDEVICESREQUEST']._serialized_end=1850
+  _globals['_LISTDEVICESRESPONSE']._serialized_start=1852
+  _globals['_LISTDEVICESRESPONSE']._serialized_end=1940
+  _globals['_PROFILEREQUEST']._serialized_start=1943
+  _globals['_PROFILEREQUEST']._serialized_end=2100
+  _globals['_PROFILEREQUEST_MODE']._serialized_start=2068
+  _globals['_PROFILEREQUEST_MODE']._serialized_end=2100
+  _globals['_PROFILERESULT']._serialized_start=2102
+  _globals['_PROFILERESULT']._serialized_end=2208
+  _globals['_THREADDUMPREQUEST']._serialized_start=2210
+  _globals['_THREADDUMPREQUEST']._serialized_end=2252
+  _globals['_THREADSTACK']._serialized_start=2254
+  _globals['_THREADSTACK']._serialized_end=2327
+  _globals['_THREADDUMP']._serialized_start=2329
+  _globals['_THREADDUMP']._serialized_end=2395
+  _globals['_RFCONTROL']._serialized_start=2525
+  _globals['_RFCONTROL']._serialized_end=3049
+  _globals['_ADMIN']._serialized_start=3052
+  _globals['_ADMIN']._serialized_end=3195
 # @@protoc_insertion_point(module_scope)
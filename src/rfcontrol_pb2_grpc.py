@@ -45,6 +45,31 @@ class RFControlStub(object):
                 request_serializer=rfcontrol__pb2.DeviceStatusRequest.SerializeToString,
                 response_deserializer=rfcontrol__pb2.RFResponse.FromString,
                 _registered_method=True)
+        self.SetRFSettingsBatch = channel.unary_unary(
+                '/rfcontrol.RFControl/SetRFSettingsBatch',
+                request_serializer=rfcontrol__pb2.RFConfigBatch.SerializeToString,
+                response_deserializer=rfcontrol__pb2.RFBatchResponse.FromString,
+                _registered_method=True)
+        self.WatchDeviceStatus = channel.unary_stream(
+                '/rfcontrol.RFControl/WatchDeviceStatus',
+                request_serializer=rfcontrol__pb2.WatchStatusRequest.SerializeToString,
+                response_deserializer=rfcontrol__pb2.RFResponse.FromString,
+                _registered_method=True)
+        self.ControlSession = channel.stream_stream(
+                '/rfcontrol.RFControl/ControlSession',
+                request_serializer=rfcontrol__pb2.ControlUpdate.SerializeToString,
+                response_deserializer=rfcontrol__pb2.ControlAck.FromString,
+                _registered_method=True)
+        self.Sweep = channel.unary_stream(
+                '/rfcontrol.RFControl/Sweep',
+                request_serializer=rfcontrol__pb2.SweepRequest.SerializeToString,
+                response_deserializer=rfcontrol__pb2.SweepProgress.FromString,
+                _registered_method=True)
+        self.ListDevices = channel.unary_unary(
+                '/rfcontrol.RFControl/ListDevices',
+                request_serializer=rfcontrol__pb2.ListDevicesRequest.SerializeToString,
+                response_deserializer=rfcontrol__pb2.ListDevicesResponse.FromString,
+                _registered_method=True)
 
 
 class RFControlServicer(object):
@@ -65,6 +90,42 @@ class RFControlServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SetRFSettingsBatch(self, request, context):
+        """Applies a batch of RF configurations and returns one result per item.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchDeviceStatus(self, request, context):
+        """Streams the device status, sending an update whenever it changes.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ControlSession(self, request_iterator, context):
+        """Applies a stream of RF configurations in order, acknowledging each one.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Sweep(self, request, context):
+        """Steps a device through a frequency range on a server-side schedule,
+        confirming each step, and ends with a timing summary.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListDevices(self, request, context):
+        """Lists the registered devices that match a query, a page at a time.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RFControlServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -78,6 +139,31 @@ def add_RFControlServicer_to_server(servicer, server):
                     request_deserializer=rfcontrol__pb2.DeviceStatusRequest.FromString,
                     response_serializer=rfcontrol__pb2.RFResponse.SerializeToString,
             ),
+            'SetRFSettingsBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.SetRFSettingsBatch,
+                    request_deserializer=rfcontrol__pb2.RFConfigBatch.FromString,
+                    response_serializer=rfcontrol__pb2.RFBatchResponse.SerializeToString,
+            ),
+            'WatchDeviceStatus': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchDeviceStatus,
+                    request_deserializer=rfcontrol__pb2.WatchStatusRequest.FromString,
+                    response_serializer=rfcontrol__pb2.RFResponse.SerializeToString,
+            ),
+            'ControlSession': grpc.stream_stream_rpc_method_handler(
+                    servicer.ControlSession,
+                    request_deserializer=rfcontrol__pb2.ControlUpdate.FromString,
+                    response_serializer=rfcontrol__pb2.ControlAck.SerializeToString,
+            ),
+            'Sweep': grpc.unary_stream_rpc_method_handler(
+                    servicer.Sweep,
+                    request_deserializer=rfcontrol__pb2.SweepRequest.FromString,
+                    response_serializer=rfcontrol__pb2.SweepProgress.SerializeToString,
+            ),
+            'ListDevices': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListDevices,
+                    request_deserializer=rfcontrol__pb2.ListDevicesRequest.FromString,
+                    response_serializer=rfcontrol__pb2.ListDevicesResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'rfcontrol.RFControl', rpc_method_handlers)
@@ -143,3 +229,258 @@ class RFControl(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def SetRFSettingsBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rfcontrol.RFControl/SetRFSettingsBatch',
+            rfcontrol__pb2.RFConfigBatch.SerializeToString,
+            rfcontrol__pb2.RFBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchDeviceStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/rfcontrol.RFControl/WatchDeviceStatus',
+            rfcontrol__pb2.WatchStatusRequest.SerializeToString,
+            rfcontrol__pb2.RFResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ControlSession(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/rfcontrol.RFControl/ControlSession',
+            rfcontrol__pb2.ControlUpdate.SerializeToString,
+            rfcontrol__pb2.ControlAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Sweep(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/rfcontrol.RFControl/Sweep',
+            rfcontrol__pb2.SweepRequest.SerializeToString,
+            rfcontrol__pb2.SweepProgress.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListDevices(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rfcontrol.RFControl/ListDevices',
+            rfcontrol__pb2.ListDevicesRequest.SerializeToString,
+            rfcontrol__pb2.ListDevicesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class AdminStub(object):
+    """Diagnostics for the server process itself. Only served with --admin.
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Profile = channel.unary_unary(
+                '/rfcontrol.Admin/Profile',
+                request_serializer=rfcontrol__pb2.ProfileRequest.SerializeToString,
+                response_deserializer=rfcontrol__pb2.ProfileResult.FromString,
+                _registered_method=True)
+        self.DumpThreads = channel.unary_unary(
+                '/rfcontrol.Admin/DumpThreads',
+                request_serializer=rfcontrol__pb2.ThreadDumpRequest.SerializeToString,
+                response_deserializer=rfcontrol__pb2.ThreadDump.FromString,
+                _registered_method=True)
+
+
+class AdminServicer(object):
+    """Diagnostics for the server process itself. Only served with --admin.
+    """
+
+    def Profile(self, request, context):
+        """Profiles the live process for a while and returns the result.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DumpThreads(self, request, context):
+        """Returns the current stack of each thread.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_AdminServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Profile': grpc.unary_unary_rpc_method_handler(
+                    servicer.Profile,
+                    request_deserializer=rfcontrol__pb2.ProfileRequest.FromString,
+                    response_serializer=rfcontrol__pb2.ProfileResult.SerializeToString,
+            ),
+            'DumpThreads': grpc.unary_unary_rpc_method_handler(
+                    servicer.DumpThreads,
+                    request_deserializer=rfcontrol__pb2.ThreadDumpRequest.FromString,
+                    response_serializer=rfcontrol__pb2.ThreadDump.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'rfcontrol.Admin', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('rfcontrol.Admin', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Admin(object):
+    """Diagnostics for the server process itself. Only served with --admin.
+    """
+
+    @staticmethod
+    def Profile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rfcontrol.Admin/Profile',
+            rfcontrol__pb2.ProfileRequest.SerializeToString,
+            rfcontrol__pb2.ProfileResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DumpThreads(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rfcontrol.Admin/DumpThreads',
+            rfcontrol__pb2.ThreadDumpRequest.SerializeToString,
+            rfcontrol__pb2.ThreadDump.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
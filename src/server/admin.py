@@ -0,0 +1,116 @@
+import asyncio
+import cProfile
+import logging
+import os
+import threading
+
+import grpc
+
+# Import generated classes
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+from server.profiling import (
+    CPROFILE, DEFAULT_SAMPLE_INTERVAL, MAX_PROFILE_SECONDS, PROFILER, SAMPLE, dump_threads,
+)
+
+logger = logging.getLogger("rfcontrol.admin")
+
+_MODES = {
+    rfcontrol_pb2.ProfileRequest.SAMPLE: SAMPLE,
+    rfcontrol_pb2.ProfileRequest.CPROFILE: CPROFILE,
+}
+
+def _profile_options(request):
+    """Returns (mode, seconds, begin() keyword arguments) for a ProfileRequest."""
+    seconds = min(max(request.seconds, 0.0), MAX_PROFILE_SECONDS)
+    interval = request.interval_ms / 1000.0 if request.interval_ms > 0 else DEFAULT_SAMPLE_INTERVAL
+    return _MODES.get(request.mode, SAMPLE), seconds, {
+        "interval": interval, "thread_prefix": request.thread_prefix,
+    }
+
+def _profile_result(output):
+    return rfcontrol_pb2.ProfileResult(
+        format=output.format,
+        data=output.data,
+        summary=output.summary,
+        samples=output.samples,
+        path=output.path,
+        pid=os.getpid(),
+    )
+
+def _thread_dump(request):
+    return rfcontrol_pb2.ThreadDump(
+        pid=os.getpid(),
+        threads=[
+            rfcontrol_pb2.ThreadStack(
+                name=thread.name, ident=thread.ident, daemon=thread.daemon, stack=stack
+            )
+            for thread, stack in dump_threads(request.thread_prefix)
+        ],
+    )
+
+class AdminServicer(rfcontrol_pb2_grpc.AdminServicer):
+    """Diagnostics for the live server process.
+
+    A CPROFILE session profiles the calls handled while it runs, through
+    profiling.ProfilingHook in the interceptor chain. Profiles are also
+    saved to output_dir when one is given.
+    """
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir
+
+    def Profile(self, request, context):
+        mode, seconds, options = _profile_options(request)
+        logger.info("Profiling (%s) for %.1f s on request.", mode, seconds)
+        try:
+            PROFILER.begin(mode, **options)
+        except RuntimeError as e:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(e))
+        stopped = threading.Event()
+        context.add_callback(stopped.set)
+        try:
+            # Ends early if the client goes away; the profile is still saved
+            stopped.wait(seconds)
+        finally:
+            output = PROFILER.end(self.output_dir)
+        return _profile_result(output)
+
+    def DumpThreads(self, request, context):
+        return _thread_dump(request)
+
+class AsyncAdminServicer(rfcontrol_pb2_grpc.AdminServicer):
+    """AdminServicer for the grpc.aio server.
+
+    Every RPC runs on the event loop thread, so a CPROFILE session simply
+    profiles that thread for its duration.
+    """
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir
+
+    async def Profile(self, request, context):
+        mode, seconds, options = _profile_options(request)
+        logger.info("Profiling (%s) for %.1f s on request.", mode, seconds)
+        try:
+            PROFILER.begin(mode, **options)
+        except RuntimeError as e:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(e))
+        profile = cProfile.Profile() if mode == CPROFILE else None
+        try:
+            if profile is not None:
+                profile.enable()
+            await asyncio.sleep(seconds)
+        finally:
+            if profile is not None:
+                profile.disable()
+                PROFILER.add(profile)
+            # Saving and summarizing a large profile can take a while
+            output = await asyncio.get_running_loop().run_in_executor(
+                None, PROFILER.end, self.output_dir
+            )
+        return _profile_result(output)
+
+    async def DumpThreads(self, request, context):
+        return _thread_dump(request)
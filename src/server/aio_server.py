@@ -0,0 +1,389 @@
+import asyncio
+import logging
+import signal
+import threading
+import time
+
+import grpc
+
+# Import generated classes
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+from server.admin import AsyncAdminServicer
+from server.coalescing import AsyncCoalescingWriter
+from server.config import ServerConfig
+from server.device_registry import AsyncDeviceRegistry
+from server.drivers import create_device_factory
+from server.interceptors import AsyncInterceptorChain
+from server.log_pipeline import RPC_LOGGER
+from server.metrics import ServerMetrics
+from server.profiling import install_signal_handlers
+from server.scheduler import ApplyScheduler, deadline_for
+from server.server import (
+    DEFAULT_DEVICE_ID, add_servicer_to_server, create_hooks, create_journal, create_metrics,
+    start_metrics_server, status_wait,
+)
+from server.status_cache import NOT_MODIFIED, StatusResponseCache
+from server.sweep import run_sweep, sweep_frequencies
+
+logger = logging.getLogger("rfcontrol.aio")
+rpc_logger = logging.getLogger(RPC_LOGGER)
+
+class AsyncRFControlServicer(rfcontrol_pb2_grpc.RFControlServicer):
+    """grpc.aio implementation of the RF control service.
+
+    Every RPC is a coroutine on one event loop, so an RPC that waits (for a
+    busy device, a slow driver or a quiet watch stream) costs a suspended
+    task rather than an OS thread.
+    """
+
+    def __init__(
+        self, registry: AsyncDeviceRegistry = None, coalesce_writes: bool = False,
+        metrics: ServerMetrics = None,
+    ):
+        self.registry = registry if registry is not None else AsyncDeviceRegistry()
+        self.coalesce_writes = coalesce_writes
+        self._writers = {}
+        self._status_cache = StatusResponseCache()
+        # Only wakes the waiting task at execute_at; loop timers are too coarse
+        self._scheduler = ApplyScheduler()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.track_length("scheduled", self._scheduler)
+
+    async def close(self):
+        """Cancels scheduled settings and disconnects all devices."""
+        self._scheduler.close()
+        await self.registry.close()
+
+    async def _apply_settings(self, device, config):
+        """Applies one RFConfig to an acquired device and returns (success, status)."""
+        if self.metrics is None:
+            return await device.apply(config), device.status
+        start = time.perf_counter()
+        success = await device.apply(config)
+        self.metrics.observe_apply(time.perf_counter() - start)
+        return success, device.status
+
+    async def _apply_to_device(self, device_id, config):
+        async with self.registry.acquire(device_id) as device:
+            return await self._apply_settings(device, config)
+
+    async def _apply_at(self, device_id, config):
+        """Applies config at its execute_at time and returns (success, status, apply_error_us).
+
+        Raises ValueError if execute_at is too far ahead.
+        """
+        deadline = deadline_for(config.execute_at)
+        loop = asyncio.get_running_loop()
+        due = loop.create_future()
+
+        def wake():
+            if not due.done():
+                due.set_result(None)
+
+        job = self._scheduler.schedule(deadline, lambda: loop.call_soon_threadsafe(wake))
+        try:
+            await due
+        finally:
+            # A cancelled client cancels this task; drop the job with it
+            job.cancel()
+        async with self.registry.acquire(device_id) as device:
+            error = time.perf_counter() - deadline
+            success, status = await self._apply_settings(device, config)
+        return success, status, 1e6 * error
+
+    async def _try_apply_at(self, device_id, config):
+        try:
+            return await self._apply_at(device_id, config)
+        except ValueError as e:
+            return False, f"ERROR - {e}", 0.0
+
+    def _writer(self, device_id) -> AsyncCoalescingWriter:
+        writer = self._writers.get(device_id)
+        if writer is None:
+            writer = AsyncCoalescingWriter(
+                lambda config: self._apply_to_device(device_id, config),
+                on_idle=lambda w: self._writers.pop(device_id, None),
+            )
+            self._writers[device_id] = writer
+        return writer
+
+    async def SetRFSettings(self, request, context):
+        """Handles the SetRFSettings RPC."""
+        rpc_logger.info(
+            "Received SetRFSettings request: Freq=%sMHz, Gain=%sdB, DeviceID='%s'",
+            request.frequency, request.gain, request.device_id,
+            extra={"rpc": "SetRFSettings", "device_id": request.device_id},
+        )
+
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        superseded = False
+        apply_error_us = 0.0
+        if request.HasField("execute_at"):
+            try:
+                success, status, apply_error_us = await self._apply_at(device_id, request)
+            except ValueError as e:
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        elif self.coalesce_writes:
+            success, status, superseded = await self._writer(device_id).submit(request)
+        else:
+            success, status = await self._apply_to_device(device_id, request)
+
+        if not success:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Failed to apply RF settings on the device.")
+
+        return rfcontrol_pb2.RFResponse(
+            success=success, device_status=status, superseded=superseded,
+            apply_error_us=apply_error_us,
+        )
+
+    async def GetDeviceStatus(self, request, context):
+        """Handles the GetDeviceStatus RPC."""
+        rpc_logger.info(
+            "Received GetDeviceStatus request for DeviceID='%s'", request.device_id,
+            extra={"rpc": "GetDeviceStatus", "device_id": request.device_id},
+        )
+
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        async with self.registry.acquire(device_id) as device:
+            snapshot = device.snapshot()
+        if snapshot.generation > request.if_newer_than:
+            return self._status_cache.get(snapshot)
+
+        wait = status_wait(request, context)
+        if wait <= 0:
+            return NOT_MODIFIED
+        return await self._wait_for_status(device_id, request.if_newer_than, wait)
+
+    async def _wait_for_status(self, device_id, generation, wait):
+        """Long poll; see RFControlServicer._wait_for_status."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        subscription = await self.registry.subscribe(device_id)
+        try:
+            # A cancelled client cancels this task, which closes the subscription
+            while await subscription.next(timeout=max(deadline - loop.time(), 0)) is not None:
+                async with self.registry.acquire(device_id) as device:
+                    snapshot = device.snapshot()
+                if snapshot.generation > generation:
+                    return self._status_cache.get(snapshot)
+        finally:
+            subscription.close()
+        return NOT_MODIFIED
+
+    async def _apply_device_batch(self, device_id, items):
+        """Applies (index, config) pairs for one device in order, holding its lock once."""
+        results = []
+        try:
+            async with self.registry.acquire(device_id) as device:
+                for index, config in items:
+                    success, status = await self._apply_settings(device, config)
+                    results.append(
+                        (index, rfcontrol_pb2.RFResponse(success=success, device_status=status))
+                    )
+        except Exception as e:
+            logger.exception("Batch apply failed for DeviceID='%s'", device_id)
+            done = {index for index, _ in results}
+            results.extend(
+                (index, rfcontrol_pb2.RFResponse(success=False, device_status=f"ERROR - {e}"))
+                for index, _ in items if index not in done
+            )
+        return results
+
+    async def SetRFSettingsBatch(self, request, context):
+        """Handles the SetRFSettingsBatch RPC; device groups and timed items run as concurrent tasks."""
+        rpc_logger.info(
+            "Received SetRFSettingsBatch request with %d item(s)", len(request.configs),
+            extra={"rpc": "SetRFSettingsBatch"},
+        )
+
+        by_device = {}
+        scheduled = []
+        for index, config in enumerate(request.configs):
+            device_id = config.device_id or DEFAULT_DEVICE_ID
+            if config.HasField("execute_at"):
+                scheduled.append((index, device_id, config))
+            else:
+                by_device.setdefault(device_id, []).append((index, config))
+
+        results = [None] * len(request.configs)
+        groups = asyncio.gather(*(
+            self._apply_device_batch(device_id, items) for device_id, items in by_device.items()
+        ))
+        timed = asyncio.gather(*(
+            self._try_apply_at(device_id, config) for _, device_id, config in scheduled
+        ))
+        groups, timed = await asyncio.gather(groups, timed)
+        for group in groups:
+            for index, response in group:
+                results[index] = response
+        for (index, _, _), (success, status, apply_error_us) in zip(scheduled, timed):
+            results[index] = rfcontrol_pb2.RFResponse(
+                success=success, device_status=status, apply_error_us=apply_error_us
+            )
+
+        if not all(response.success for response in results):
+            logger.warning("Some items in the batch failed to apply.")
+
+        return rfcontrol_pb2.RFBatchResponse(results=results)
+
+    async def WatchDeviceStatus(self, request, context):
+        """Handles the WatchDeviceStatus RPC; see RFControlServicer.WatchDeviceStatus."""
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        rpc_logger.info(
+            "Received WatchDeviceStatus request for DeviceID='%s'", device_id,
+            extra={"rpc": "WatchDeviceStatus", "device_id": device_id},
+        )
+
+        subscription = await self.registry.subscribe(device_id)
+        min_interval = request.min_interval_ms / 1000.0
+        try:
+            # A cancelled client cancels this task, which ends the loop
+            while not subscription.closed:
+                status = await subscription.next()
+                if status is None:
+                    continue
+                yield rfcontrol_pb2.RFResponse(success=True, device_status=status)
+                if min_interval and not await subscription.sleep(min_interval):
+                    break
+        finally:
+            subscription.close()
+            rpc_logger.info(
+                "Stopped watching DeviceID='%s' (%d update(s) coalesced)",
+                device_id, subscription.coalesced,
+            )
+
+    async def ControlSession(self, request_iterator, context):
+        """Handles the ControlSession RPC; see RFControlServicer.ControlSession."""
+        rpc_logger.info("ControlSession opened.", extra={"rpc": "ControlSession"})
+        applied = failed = 0
+        async for update in request_iterator:
+            config = update.config
+            device_id = config.device_id or DEFAULT_DEVICE_ID
+            apply_error_us = 0.0
+            if config.HasField("execute_at"):
+                success, status, apply_error_us = await self._try_apply_at(device_id, config)
+            else:
+                async with self.registry.acquire(device_id) as device:
+                    success, status = await self._apply_settings(device, config)
+            if success:
+                applied += 1
+            else:
+                failed += 1
+            yield rfcontrol_pb2.ControlAck(
+                sequence=update.sequence, success=success, device_status=status,
+                apply_error_us=apply_error_us,
+            )
+        rpc_logger.info("ControlSession closed: %d applied, %d failed.", applied, failed)
+
+    async def Sweep(self, request, context):
+        """Handles the Sweep RPC; see RFControlServicer.Sweep.
+
+        The timed loop runs on an executor thread against the wrapped
+        device, since precise timing needs a thread that does nothing else.
+        """
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        rpc_logger.info(
+            "Received Sweep request: %s-%s MHz step %s MHz, dwell %s ms, DeviceID='%s'",
+            request.start_frequency, request.stop_frequency, request.step_frequency,
+            request.dwell_ms, device_id, extra={"rpc": "Sweep", "device_id": device_id},
+        )
+        try:
+            frequencies = sweep_frequencies(
+                request.start_frequency, request.stop_frequency, request.step_frequency
+            )
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        loop = asyncio.get_running_loop()
+        progress = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def emit(item):
+            loop.call_soon_threadsafe(progress.put_nowait, item)
+
+        def run(device):
+            try:
+                summary = run_sweep(device, request, frequencies, emit, cancelled)
+                emit(rfcontrol_pb2.SweepProgress(summary=summary))
+            except Exception as e:
+                logger.exception("Sweep failed for DeviceID='%s'", device_id)
+                emit(e)
+            finally:
+                emit(None)
+
+        async with self.registry.acquire(device_id) as device:
+            worker = loop.run_in_executor(None, run, device.device)
+            try:
+                while (item := await progress.get()) is not None:
+                    if isinstance(item, Exception):
+                        await context.abort(grpc.StatusCode.INTERNAL, f"Sweep failed: {item}")
+                    yield item
+            finally:
+                # Keep the device until the sweep thread has let go of it
+                cancelled.set()
+                await asyncio.shield(worker)
+
+    async def ListDevices(self, request, context):
+        """Handles the ListDevices RPC; the index is in memory, so this never waits."""
+        rpc_logger.info(
+            "Received ListDevices request: page_size %d, token %s",
+            request.page_size, "set" if request.page_token else "unset",
+            extra={"rpc": "ListDevices"},
+        )
+        try:
+            return self.registry.index.list_devices(request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+async def serve_async(config: ServerConfig = None):
+    """Starts the grpc.aio server and runs until cancelled."""
+    config = config if config is not None else ServerConfig()
+    grace = config.grace
+    metrics = create_metrics(config)
+    # Calls do not queue for threads here, so there is no load shedding;
+    # maximum_concurrent_rpcs caps the load instead
+    server = grpc.aio.server(
+        interceptors=[AsyncInterceptorChain(create_hooks(config, metrics))],
+        options=config.grpc_options(),
+        maximum_concurrent_rpcs=config.maximum_concurrent_rpcs,
+        compression=config.grpc_compression(),
+    )
+    servicer = AsyncRFControlServicer(
+        AsyncDeviceRegistry(
+            create_device_factory(config), idle_timeout=config.idle_timeout,
+            journal=create_journal(config),
+        ),
+        coalesce_writes=config.coalesce_writes,
+        metrics=metrics,
+    )
+    await servicer.registry.restore(config.restore_reapply)
+    add_servicer_to_server(servicer, server)
+    if config.admin:
+        rfcontrol_pb2_grpc.add_AdminServicer_to_server(AsyncAdminServicer(config.profile_dir), server)
+    server.add_insecure_port(config.address)
+    await server.start()
+    servicer.registry.start_reaper()
+    logger.info("Async server started on %s.", config.address)
+    install_signal_handlers(config.profile_seconds, config.profile_dir)
+    metrics_server = start_metrics_server(config, metrics)
+
+    # Drain in-flight RPCs on Ctrl+C or `docker stop` instead of dying mid-call
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(server.stop(grace)))
+        except (NotImplementedError, RuntimeError):
+            pass  # Not supported on this platform or thread
+    try:
+        await server.wait_for_termination()
+    finally:
+        logger.info("Server stopping...")
+        await server.stop(grace)
+        if metrics_server is not None:
+            metrics_server.stop()
+        await servicer.close()
+        logger.info("Server stopped.")
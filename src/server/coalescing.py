@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger("rfcontrol.coalescing")
+
+
+class _Write:
+    """A submitted config and the requests it stands in for."""
+
+    __slots__ = ("config", "replaced", "result", "ready")
+
+    def __init__(self, config, ready=None):
+        self.config = config
+        # Older writes this one superseded; they are answered with its result
+        self.replaced = []
+        self.result = None
+        self.ready = ready
+
+    def supersede(self, older):
+        self.replaced.extend(older.replaced)
+        older.replaced = []
+        self.replaced.append(older)
+
+
+class CoalescingWriter:
+    """Last-writer-wins write queue for one device.
+
+    At most one write per device is applied at a time, and at most one
+    waits behind it. A write that arrives while another is waiting replaces
+    it, so a burst of settings costs the device two commands rather than
+    one per request. submit() returns (success, status, superseded); a
+    replaced write returns the outcome of the write that replaced it with
+    superseded=True.
+
+    The thread that finds the writer idle applies the pending write. When it
+    is done and a newer write is waiting, it hands over to that write's
+    thread instead of applying it, so no caller's latency grows with other
+    callers' traffic.
+    """
+
+    def __init__(self, apply, on_idle=None):
+        # apply(config) -> (success, status); called without the writer's lock
+        self._apply = apply
+        self._on_idle = on_idle
+        self._lock = threading.Lock()
+        self._pending = None
+        self._busy = False
+        self.applied = 0
+        self.superseded = 0
+
+    def submit(self, config):
+        write = _Write(config, threading.Event())
+        with self._lock:
+            if self._pending is not None:
+                write.supersede(self._pending)
+                self.superseded += 1
+            self._pending = write
+            lead = not self._busy
+            self._busy = True
+        if not lead:
+            write.ready.wait()
+            if write.result is not None:
+                return write.result
+            # Woken without a result: handed the job of applying
+        self._drain(write)
+        return write.result
+
+    def _drain(self, own):
+        while True:
+            with self._lock:
+                current = self._pending
+                if current is None:
+                    self._busy = False
+                    break
+                if own.result is not None:
+                    # Our request is answered; let the newest waiter apply its own
+                    current.ready.set()
+                    return
+                self._pending = None
+            self._run(current)
+        if self._on_idle is not None:
+            self._on_idle(self)
+
+    def _run(self, write):
+        try:
+            success, status = self._apply(write.config)
+        except Exception as e:
+            logger.exception("Coalesced write failed")
+            success, status = False, f"ERROR - {e}"
+        self.applied += 1
+        write.result = (success, status, False)
+        write.ready.set()
+        for older in write.replaced:
+            older.result = (success, status, True)
+            older.ready.set()
+
+    @property
+    def idle(self) -> bool:
+        with self._lock:
+            return not self._busy
+
+
+class AsyncCoalescingWriter:
+    """The asyncio counterpart of CoalescingWriter, for the grpc.aio server.
+
+    apply is a coroutine function. Pending writes are drained by one task
+    per burst, so a cancelled caller never strands the writes behind it.
+    """
+
+    def __init__(self, apply, on_idle=None):
+        self._apply = apply
+        self._on_idle = on_idle
+        self._pending = None
+        self._drainer = None
+        self.applied = 0
+        self.superseded = 0
+
+    async def submit(self, config):
+        write = _Write(config, asyncio.get_running_loop().create_future())
+        if self._pending is not None:
+            write.supersede(self._pending)
+            self.superseded += 1
+        self._pending = write
+        if self._drainer is None:
+            self._drainer = asyncio.ensure_future(self._drain())
+        # The write still happens if this caller goes away
+        return await asyncio.shield(write.ready)
+
+    async def _drain(self):
+        try:
+            while self._pending is not None:
+                write, self._pending = self._pending, None
+                try:
+                    success, status = await self._apply(write.config)
+                except Exception as e:
+                    logger.exception("Coalesced write failed")
+                    success, status = False, f"ERROR - {e}"
+                self.applied += 1
+                write.ready.set_result((success, status, False))
+                for older in write.replaced:
+                    older.ready.set_result((success, status, True))
+        finally:
+            self._drainer = None
+        if self._on_idle is not None:
+            self._on_idle(self)
+
+    @property
+    def idle(self) -> bool:
+        return self._drainer is None
@@ -0,0 +1,253 @@
+import os
+import json
+import typing
+import logging
+import argparse
+import dataclasses
+from dataclasses import dataclass, field
+
+import grpc
+
+from server.drivers import DRIVERS
+from server.log_pipeline import parse_levels
+
+logger = logging.getLogger("rfcontrol.config")
+
+# Environment variables are named ENV_PREFIX + the field name in upper case,
+# e.g. RFCONTROL_MAX_WORKERS=32.
+ENV_PREFIX = "RFCONTROL_"
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+def _option(default, help, **kwargs):
+    return field(default=default, metadata=dict(help=help, **kwargs))
+
+@dataclass
+class ServerConfig:
+    """Settings for the RF control server.
+
+    Values come from, in increasing order of precedence: the defaults below,
+    a JSON file (--config or RFCONTROL_CONFIG), RFCONTROL_* environment
+    variables, and command-line flags. Options left at None keep gRPC's
+    own default.
+    """
+
+    address: str = _option("0.0.0.0:50051", "Address to listen on")
+    aio: bool = _option(False, "Run the asyncio (grpc.aio) server instead of the thread-pool server")
+    workers: int = _option(
+        1, "Number of server processes sharing the port via SO_REUSEPORT; "
+           "each device is always served by the same worker"
+    )
+    max_workers: int = _option(10, "Threads handling RPCs in the thread-pool server")
+    maximum_concurrent_rpcs: typing.Optional[int] = _option(
+        None, "Reject RPCs with RESOURCE_EXHAUSTED beyond this many in flight"
+    )
+    max_concurrent_streams: typing.Optional[int] = _option(
+        None, "HTTP/2 streams (concurrent calls) allowed per client connection",
+        grpc_option="grpc.max_concurrent_streams",
+    )
+    keepalive_time_ms: typing.Optional[int] = _option(
+        None, "Interval between server keepalive pings on idle connections",
+        grpc_option="grpc.keepalive_time_ms",
+    )
+    keepalive_timeout_ms: typing.Optional[int] = _option(
+        None, "How long to wait for a keepalive ping ack before closing the connection",
+        grpc_option="grpc.keepalive_timeout_ms",
+    )
+    keepalive_permit_without_calls: typing.Optional[bool] = _option(
+        None, "Accept client keepalive pings on connections without active calls",
+        grpc_option="grpc.keepalive_permit_without_calls",
+    )
+    min_ping_interval_ms: typing.Optional[int] = _option(
+        None, "Minimum interval between client pings without data before they count as abuse",
+        grpc_option="grpc.http2.min_ping_interval_without_data_ms",
+    )
+    max_receive_message_length: typing.Optional[int] = _option(
+        None, "Largest request message in bytes (gRPC default 4 MiB)",
+        grpc_option="grpc.max_receive_message_length",
+    )
+    max_send_message_length: typing.Optional[int] = _option(
+        None, "Largest response message in bytes",
+        grpc_option="grpc.max_send_message_length",
+    )
+    compression: str = _option(
+        "none", "Default response compression", choices=sorted(COMPRESSION)
+    )
+    batch_workers: int = _option(32, "Threads applying per-device groups of a batch")
+    coalesce_writes: bool = _option(
+        False, "Apply only the newest queued SetRFSettings per device; "
+               "older queued ones are answered as superseded"
+    )
+    schedule_workers: int = _option(
+        8, "Threads applying settings whose execute_at has come"
+    )
+    shed_queue_depth: typing.Optional[int] = _option(
+        None, "Answer new RPCs with RESOURCE_EXHAUSTED while more than this many "
+              "wait for a thread (thread-pool server)"
+    )
+    slow_rpc_ms: typing.Optional[float] = _option(
+        None, "Log unary RPCs that take at least this long at WARNING"
+    )
+    admin: bool = _option(
+        False, "Serve the Admin service (profiling, thread dumps) on the RPC port"
+    )
+    profile_dir: typing.Optional[str] = _option(
+        None, "Directory where profiles are saved; SIGUSR2 profiles go to the temp dir if unset"
+    )
+    profile_seconds: float = _option(30.0, "How long SIGUSR2 profiles the process")
+    metrics_port: typing.Optional[int] = _option(
+        None, "Serve Prometheus metrics over HTTP on this port (off by default; "
+              "worker N of --workers uses the port plus N)"
+    )
+    metrics_address: str = _option("127.0.0.1", "Address the metrics endpoint listens on")
+    driver: str = _option(
+        "simulated",
+        "Device driver: 'simulated', 'table' for large simulated fleets, "
+        "or 'scpi' for instruments at scpi_address"
+    )
+    scpi_address: str = _option(
+        "127.0.0.1:5025", "host:port of the SCPI instruments (scpi driver)"
+    )
+    scpi_connections: int = _option(2, "Pooled connections per instrument (scpi driver)")
+    scpi_timeout: float = _option(2.0, "Seconds to wait for an instrument's reply (scpi driver)")
+    device_emulation: typing.Optional[str] = _option(
+        None, "Emulate instrument latency and faults: 'default' or a JSON latency profile"
+    )
+    state_dir: typing.Optional[str] = _option(
+        None, "Directory for the device state journal; devices and their settings "
+              "are restored from it on restart"
+    )
+    restore_reapply: bool = _option(
+        False, "On restart, reconnect the restored devices and reapply their settings "
+               "at once, in parallel, instead of on first use"
+    )
+    idle_timeout: float = _option(300.0, "Seconds before an unused device is disconnected")
+    grace: float = _option(5.0, "Seconds to let in-flight RPCs finish on shutdown")
+    log_level: str = _option("INFO", "Root log level")
+    log_levels: str = _option(
+        "", "Per-logger levels, e.g. \"rfcontrol.rpc=WARNING,rfcontrol.device=DEBUG\""
+    )
+    log_format: str = _option("text", "Log output format", choices=["json", "text"])
+    log_sample_every: int = _option(
+        1, "Log one in this many per-request (rfcontrol.rpc) records below WARNING"
+    )
+
+    def grpc_options(self):
+        """Returns the channel arguments for grpc.server()/grpc.aio.server()."""
+        options = []
+        for f in dataclasses.fields(self):
+            name = f.metadata.get("grpc_option")
+            value = getattr(self, f.name)
+            if name is not None and value is not None:
+                options.append((name, int(value)))
+        return options
+
+    def grpc_compression(self) -> grpc.Compression:
+        return COMPRESSION[self.compression]
+
+    def validate(self):
+        if self.compression not in COMPRESSION:
+            raise ValueError(f"compression must be one of {sorted(COMPRESSION)}")
+        if min(self.workers, self.max_workers, self.batch_workers, self.schedule_workers) < 1:
+            raise ValueError(
+                "workers, max_workers, batch_workers and schedule_workers must be at least 1"
+            )
+        if self.workers > 1 and self.aio:
+            raise ValueError("workers > 1 and aio cannot be combined")
+        if self.metrics_port is not None and not (
+            0 <= self.metrics_port and self.metrics_port + self.workers - 1 <= 65535
+        ):
+            raise ValueError("metrics_port (plus one per extra worker) must be a valid TCP port")
+        if self.shed_queue_depth is not None and self.shed_queue_depth < 0:
+            raise ValueError("shed_queue_depth must not be negative")
+        if self.driver not in DRIVERS:
+            raise ValueError(f"driver must be one of {sorted(DRIVERS)}")
+        if self.scpi_connections < 1 or self.scpi_timeout <= 0:
+            raise ValueError("scpi_connections must be at least 1 and scpi_timeout positive")
+        if self.device_emulation not in (None, "default") and not os.path.isfile(self.device_emulation):
+            raise ValueError(f"device_emulation profile {self.device_emulation!r} not found")
+        if self.profile_seconds <= 0:
+            raise ValueError("profile_seconds must be positive")
+        if self.log_sample_every < 1:
+            raise ValueError("log_sample_every must be at least 1")
+        if not isinstance(logging.getLevelName(self.log_level.upper()), int):
+            raise ValueError(f"unknown log level {self.log_level!r}")
+        parse_levels(self.log_levels)
+
+    def log_effective(self):
+        """Logs every setting, so the config a server actually ran with is on record."""
+        logger.info("Effective server config: %s", json.dumps(dataclasses.asdict(self), sort_keys=True))
+
+def _field_type(f):
+    hint = typing.get_type_hints(ServerConfig)[f.name]
+    args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+    return args[0] if args else hint
+
+def _parse_value(f, raw):
+    """Converts a string or JSON value to the field's type."""
+    if raw is None:
+        return None
+    type_ = _field_type(f)
+    if type_ is bool and isinstance(raw, str):
+        if raw.lower() in ("1", "true", "yes", "on"):
+            return True
+        if raw.lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"{f.name}: expected a boolean, got {raw!r}")
+    return type_(raw)
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description="gRPC RF Control Server")
+    parser.add_argument(
+        "--config", type=str, default=None,
+        help=f"JSON file with server settings (also {ENV_PREFIX}CONFIG)"
+    )
+    for f in dataclasses.fields(ServerConfig):
+        flag = "--" + f.name.replace("_", "-")
+        kwargs = {"dest": f.name, "default": None, "help": f.metadata["help"]}
+        if _field_type(f) is bool:
+            kwargs["action"] = argparse.BooleanOptionalAction
+        else:
+            kwargs["type"] = _field_type(f)
+            if "choices" in f.metadata:
+                kwargs["choices"] = f.metadata["choices"]
+        parser.add_argument(flag, **kwargs)
+    return parser
+
+def load_config(argv=None, environ=None) -> ServerConfig:
+    """Builds a ServerConfig from a config file, the environment and argv."""
+    environ = os.environ if environ is None else environ
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    values = {}
+    config_path = args.config or environ.get(ENV_PREFIX + "CONFIG")
+    if config_path:
+        with open(config_path) as f:
+            from_file = json.load(f)
+        known = {f.name for f in dataclasses.fields(ServerConfig)}
+        unknown = set(from_file) - known
+        if unknown:
+            parser.error(f"unknown setting(s) in {config_path}: {', '.join(sorted(unknown))}")
+        values.update(from_file)
+
+    for f in dataclasses.fields(ServerConfig):
+        raw = environ.get(ENV_PREFIX + f.name.upper())
+        if raw is not None:
+            values[f.name] = raw
+        if getattr(args, f.name) is not None:
+            values[f.name] = getattr(args, f.name)
+
+    fields_by_name = {f.name: f for f in dataclasses.fields(ServerConfig)}
+    try:
+        config = ServerConfig(**{
+            name: _parse_value(fields_by_name[name], value) for name, value in values.items()
+        })
+        config.validate()
+    except ValueError as e:
+        parser.error(str(e))
+    return config
@@ -0,0 +1,408 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent import futures
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from server.device_table import DeviceTable
+from server.fleet_index import FleetIndex, TableFleetIndex
+from server.rf_device import AsyncRFDevice, SimulatedRFDevice
+from server.status_watch import AsyncStatusSubscription, StatusBroadcaster
+
+logger = logging.getLogger("rfcontrol.registry")
+
+
+def _follow(device_factory, journal):
+    """Returns (table, index) for a registry's devices.
+
+    table is the device_factory if it is a DeviceTable, else None. A
+    table is indexed and journaled as a whole, through its columns;
+    other devices are watched one by one as they are registered.
+    """
+    if not isinstance(device_factory, DeviceTable):
+        return None, FleetIndex()
+    if journal is not None:
+        journal.watch_table(device_factory)
+    return device_factory, TableFleetIndex(device_factory)
+
+
+class _DeviceEntry:
+    """A registered device together with its lock and bookkeeping."""
+
+    __slots__ = (
+        "device_id", "device", "lock", "broadcaster", "connected", "evicted", "last_used"
+    )
+
+    def __init__(self, device_id, device, lock=None):
+        self.device_id = device_id
+        self.device = device
+        self.lock = lock if lock is not None else threading.Lock()
+        self.broadcaster = StatusBroadcaster()
+        device.add_listener(self.broadcaster.publish)
+        self.connected = False
+        self.evicted = False
+        self.last_used = time.monotonic()
+
+
+class DeviceRegistry:
+    """Keeps one device per device_id, connected lazily on first use.
+
+    Lookups are a single dict access. Each device has its own lock, so
+    requests for different devices never wait on each other; the registry
+    lock is only held while inserting or evicting entries.
+
+    With a StateJournal, every device's last settings are journaled, and
+    restore() brings the devices of the previous run back: each gets its
+    last settings reapplied when it is next connected.
+
+    index is a FleetIndex of every registered device, for ListDevices.
+    table is the DeviceTable the devices live in, if the device_factory
+    is one.
+    """
+
+    def __init__(self, device_factory=SimulatedRFDevice, idle_timeout: float = 300.0, journal=None):
+        self._device_factory = device_factory
+        self._idle_timeout = idle_timeout
+        self._journal = journal
+        self.table, self.index = _follow(device_factory, journal)
+        # Saved settings still to be reapplied, by device_id
+        self._restored = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reaper = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, device_id):
+        return device_id in self._entries
+
+    def device_ids(self):
+        """Returns the ids of all currently registered devices."""
+        return list(self._entries)
+
+    def _get_entry(self, device_id: str) -> _DeviceEntry:
+        entry = self._entries.get(device_id)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(device_id)
+                if entry is None:
+                    entry = _DeviceEntry(device_id, self._device_factory())
+                    if self._journal is not None and self.table is None:
+                        self._journal.watch(device_id, entry.device)
+                    self.index.watch(device_id, entry.device)
+                    self._entries[device_id] = entry
+        return entry
+
+    def restore(self, reapply: bool = False, max_workers: int = 32) -> int:
+        """Registers the devices saved in the journal; returns how many there are.
+
+        With reapply, they are also connected and given their last settings
+        right away, max_workers at a time, instead of on first use.
+        """
+        if self._journal is None:
+            return 0
+        self._restored = self._journal.load()
+        for device_id in self._restored:
+            self._get_entry(device_id)
+        if reapply and self._restored:
+            start = time.perf_counter()
+            count = len(self._restored)
+            with futures.ThreadPoolExecutor(max_workers, thread_name_prefix="rf-restore") as pool:
+                list(pool.map(self._connect, list(self._restored)))
+            logger.info(
+                "Reapplied saved settings to %d devices in %.1f ms.",
+                count, 1000.0 * (time.perf_counter() - start),
+            )
+        return len(self._entries)
+
+    def _connect(self, device_id: str):
+        with self._locked_entry(device_id):
+            pass
+
+    def _reapply(self, entry):
+        """Gives a just-connected device the settings it had before the restart."""
+        saved = self._restored.pop(entry.device_id, None)
+        if saved is not None and not entry.device.apply(saved):
+            logger.warning("Could not reapply saved settings to '%s'.", entry.device_id)
+
+    @contextmanager
+    def _locked_entry(self, device_id: str):
+        """Yields the live, connected entry for device_id while holding its lock."""
+        while True:
+            entry = self._get_entry(device_id)
+            entry.lock.acquire()
+            if not entry.evicted:
+                break
+            # Evicted between lookup and lock; retry with a fresh entry.
+            entry.lock.release()
+        try:
+            if not entry.connected:
+                entry.connected = entry.device.connect(device_id)
+                if entry.connected and self._restored:
+                    self._reapply(entry)
+            entry.last_used = time.monotonic()
+            yield entry
+        finally:
+            entry.last_used = time.monotonic()
+            entry.lock.release()
+
+    @contextmanager
+    def acquire(self, device_id: str):
+        """Yields the connected device for device_id while holding its lock."""
+        with self._locked_entry(device_id) as entry:
+            yield entry.device
+
+    @contextmanager
+    def acquire_many(self, device_ids):
+        """Yields {device_id: device} for several devices while holding all their locks.
+
+        The locks are taken in device_id order, so two callers never deadlock.
+        """
+        with ExitStack() as stack:
+            yield {
+                device_id: stack.enter_context(self.acquire(device_id))
+                for device_id in sorted(set(device_ids))
+            }
+
+    def subscribe(self, device_id: str):
+        """Returns a StatusSubscription for device_id, primed with its current status.
+
+        Close the subscription when done; a device with open subscriptions is
+        never evicted.
+        """
+        with self._locked_entry(device_id) as entry:
+            subscription = entry.broadcaster.subscribe()
+            subscription.offer(entry.device.status)
+        return subscription
+
+    def evict_idle(self, now: float = None) -> int:
+        """Disconnects and drops devices unused for longer than idle_timeout.
+
+        An evicted device is taken to have left the fleet: its saved
+        settings are dropped from the journal too, so it is not brought
+        back on the next restart and the journal only holds live devices.
+        """
+        return self._remove_idle(time.monotonic() if now is None else now, evicted=True)
+
+    def _remove_idle(self, now: float, evicted: bool) -> int:
+        """Disconnects and drops idle devices; evicted is False when shutting down."""
+        removed = []
+        with self._lock:
+            for device_id, entry in list(self._entries.items()):
+                if now - entry.last_used < self._idle_timeout or len(entry.broadcaster):
+                    continue
+                # Skip devices that are busy right now; they are not idle.
+                if not entry.lock.acquire(blocking=False):
+                    continue
+                entry.evicted = True
+                del self._entries[device_id]
+                removed.append(entry)
+        for entry in removed:
+            try:
+                if entry.connected:
+                    entry.device.disconnect()
+            finally:
+                entry.lock.release()
+            self.index.remove(entry.device_id, entry.device)
+            if evicted:
+                self._forget(entry.device_id)
+                logger.info("Evicted idle device '%s'.", entry.device_id)
+        return len(removed)
+
+    def start_reaper(self, interval: float = None):
+        """Starts a daemon thread that periodically evicts idle devices."""
+        if self._reaper is not None:
+            return
+        if interval is None:
+            interval = max(self._idle_timeout / 2, 1.0)
+
+        def reap():
+            while not self._stop_event.wait(interval):
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="device-reaper", daemon=True)
+        self._reaper.start()
+
+    def _forget(self, device_id):
+        if self._journal is not None:
+            self._restored.pop(device_id, None)
+            self._journal.forget(device_id)
+
+    def close(self):
+        """Stops the reaper, disconnects every registered device and closes the journal."""
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join()
+            self._reaper = None
+        # Devices disconnected by a shutdown are exactly the ones to restore later
+        self._remove_idle(float("inf"), evicted=False)
+        if self._journal is not None:
+            self._journal.close()
+
+
+class AsyncDeviceRegistry:
+    """The asyncio counterpart of DeviceRegistry, for the grpc.aio server.
+
+    Devices are wrapped in AsyncRFDevice and guarded by asyncio locks, so a
+    request waiting for a busy device yields the event loop instead of
+    blocking a thread. Calls to drivers that wait on I/O (those whose class
+    sets blocking, or all of them with blocking_devices=True) are run on
+    an executor.
+    """
+
+    def __init__(
+        self,
+        device_factory=SimulatedRFDevice,
+        idle_timeout: float = 300.0,
+        blocking_devices: bool = False,
+        journal=None,
+    ):
+        self._device_factory = device_factory
+        self._idle_timeout = idle_timeout
+        self._blocking_devices = blocking_devices
+        self._journal = journal
+        self.table, self.index = _follow(device_factory, journal)
+        self._restored = {}
+        self._entries = {}
+        self._reaper = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, device_id):
+        return device_id in self._entries
+
+    def device_ids(self):
+        """Returns the ids of all currently registered devices."""
+        return list(self._entries)
+
+    def _get_entry(self, device_id: str) -> _DeviceEntry:
+        # Only the event loop thread touches the dict, so no lock is needed
+        entry = self._entries.get(device_id)
+        if entry is None:
+            device = self._device_factory()
+            blocking = self._blocking_devices or getattr(device, "blocking", False)
+            device = AsyncRFDevice(device, blocking=blocking)
+            entry = _DeviceEntry(device_id, device, lock=asyncio.Lock())
+            if self._journal is not None and self.table is None:
+                self._journal.watch(device_id, device)
+            self.index.watch(device_id, device)
+            self._entries[device_id] = entry
+        return entry
+
+    async def restore(self, reapply: bool = False) -> int:
+        """Registers the devices saved in the journal; see DeviceRegistry.restore()."""
+        if self._journal is None:
+            return 0
+        self._restored = self._journal.load()
+        for device_id in self._restored:
+            self._get_entry(device_id)
+        if reapply and self._restored:
+            start = time.perf_counter()
+            device_ids = list(self._restored)
+            await asyncio.gather(*(self._connect(device_id) for device_id in device_ids))
+            logger.info(
+                "Reapplied saved settings to %d devices in %.1f ms.",
+                len(device_ids), 1000.0 * (time.perf_counter() - start),
+            )
+        return len(self._entries)
+
+    async def _connect(self, device_id: str):
+        async with self._locked_entry(device_id):
+            pass
+
+    async def _reapply(self, entry):
+        saved = self._restored.pop(entry.device_id, None)
+        if saved is not None and not await entry.device.apply(saved):
+            logger.warning("Could not reapply saved settings to '%s'.", entry.device_id)
+
+    @asynccontextmanager
+    async def _locked_entry(self, device_id: str):
+        """Yields the live, connected entry for device_id while holding its lock."""
+        while True:
+            entry = self._get_entry(device_id)
+            await entry.lock.acquire()
+            if not entry.evicted:
+                break
+            entry.lock.release()
+        try:
+            if not entry.connected:
+                entry.connected = await entry.device.connect(device_id)
+                if entry.connected and self._restored:
+                    await self._reapply(entry)
+            entry.last_used = time.monotonic()
+            yield entry
+        finally:
+            entry.last_used = time.monotonic()
+            entry.lock.release()
+
+    @asynccontextmanager
+    async def acquire(self, device_id: str):
+        """Yields the connected AsyncRFDevice for device_id while holding its lock."""
+        async with self._locked_entry(device_id) as entry:
+            yield entry.device
+
+    async def subscribe(self, device_id: str) -> AsyncStatusSubscription:
+        """Returns an AsyncStatusSubscription for device_id, primed with its current status."""
+        async with self._locked_entry(device_id) as entry:
+            subscription = entry.broadcaster.subscribe(AsyncStatusSubscription)
+            subscription.offer(entry.device.status)
+        return subscription
+
+    async def evict_idle(self, now: float = None) -> int:
+        """Disconnects and drops devices unused for longer than idle_timeout.
+
+        Their saved settings are dropped from the journal; see
+        DeviceRegistry.evict_idle().
+        """
+        return await self._remove_idle(time.monotonic() if now is None else now, evicted=True)
+
+    async def _remove_idle(self, now: float, evicted: bool) -> int:
+        removed = []
+        for device_id, entry in list(self._entries.items()):
+            if now - entry.last_used < self._idle_timeout or len(entry.broadcaster):
+                continue
+            if entry.lock.locked():
+                continue
+            entry.evicted = True
+            del self._entries[device_id]
+            removed.append(entry)
+        for entry in removed:
+            if entry.connected:
+                await entry.device.disconnect()
+            self.index.remove(entry.device_id, entry.device)
+            if evicted:
+                self._forget(entry.device_id)
+                logger.info("Evicted idle device '%s'.", entry.device_id)
+        return len(removed)
+
+    def _forget(self, device_id):
+        if self._journal is not None:
+            self._restored.pop(device_id, None)
+            self._journal.forget(device_id)
+
+    def start_reaper(self, interval: float = None):
+        """Starts a task on the running loop that periodically evicts idle devices."""
+        if self._reaper is not None:
+            return
+        if interval is None:
+            interval = max(self._idle_timeout / 2, 1.0)
+
+        async def reap():
+            while True:
+                await asyncio.sleep(interval)
+                await self.evict_idle()
+
+        self._reaper = asyncio.get_running_loop().create_task(reap())
+
+    async def close(self):
+        """Stops the reaper, disconnects every registered device and closes the journal."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await self._remove_idle(float("inf"), evicted=False)
+        if self._journal is not None:
+            self._journal.close()
@@ -0,0 +1,337 @@
+import logging
+import sys
+import threading
+import time
+from array import array
+
+from server.rf_device import DeviceSnapshot, RFDevice, _generations
+
+logger = logging.getLogger("rfcontrol.device")
+
+# DeviceSnapshot.state by state code, as stored in DeviceTable.state
+STATES = ("DISCONNECTED", "IDLE", "OPERATING")
+DISCONNECTED, IDLE, OPERATING = range(len(STATES))
+
+# Shared by devices that have never been connected
+_NEVER_CONNECTED = DeviceSnapshot(
+    "DISCONNECTED", 0.0, 0.0, "", 0.0, next(_generations), "DISCONNECTED"
+)
+
+def _status_text(state: int, frequency: float, gain: float) -> str:
+    if state == OPERATING:
+        return f"OPERATING - Freq: {frequency}MHz, Gain: {gain}dB"
+    return "CONNECTED - IDLE" if state == IDLE else "DISCONNECTED"
+
+class DeviceTable:
+    """The state of a whole fleet of simulated devices, one column per field.
+
+    Each connected device owns a row, found through its interned ID. The
+    frequency, gain, state, generation and updated_at columns are flat
+    arrays, so a device's state costs a few dozen bytes and nothing for
+    the garbage collector to trace. Devices are TableRFDevice views of
+    their row. Snapshots are built only when asked for and cached until
+    the row changes.
+
+    The table is itself a device_factory. A registry built on it follows
+    the whole table through add_listener() instead of each device, and
+    applies batches through apply_many().
+
+    The table lock is held only while the columns change; listeners are
+    called after it is released.
+    """
+
+    def __init__(self):
+        self.frequency = array("d")
+        self.gain = array("d")
+        self.state = array("B")
+        self.generation = array("q")
+        self.updated_at = array("d")
+        self.device_ids = []
+        self._views = []
+        self._snapshots = []
+        self._rows = {}
+        self._free = []
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, device_id):
+        return device_id in self._rows
+
+    def device(self) -> "TableRFDevice":
+        """Returns a new, disconnected device; the device_factory for a DeviceRegistry."""
+        return TableRFDevice(self)
+
+    __call__ = device
+
+    def add_listener(self, callback):
+        """Registers callback(row) to be called after every change to a row, its release included."""
+        self._listeners.append(callback)
+
+    def row_of(self, device_id: str) -> int:
+        """Returns device_id's row, or -1 if it is not connected."""
+        return self._rows.get(device_id, -1)
+
+    def _allocate(self, view, device_id: str) -> int:
+        device_id = sys.intern(device_id)
+        if self._free:
+            row = self._free.pop()
+            self.device_ids[row] = device_id
+            self._views[row] = view
+        else:
+            row = len(self.device_ids)
+            self.device_ids.append(device_id)
+            self._views.append(view)
+            self._snapshots.append(None)
+            self.frequency.append(0.0)
+            self.gain.append(0.0)
+            self.state.append(DISCONNECTED)
+            self.generation.append(0)
+            self.updated_at.append(0.0)
+        self._rows[device_id] = row
+        return row
+
+    def _release(self, row: int):
+        del self._rows[self.device_ids[row]]
+        # A free row must not match queries for connected devices
+        self.state[row] = DISCONNECTED
+        self.device_ids[row] = None
+        self._views[row] = None
+        self._snapshots[row] = None
+        self._free.append(row)
+
+    def _set(self, row: int, state: int, frequency: float, gain: float) -> tuple:
+        """Stores new values for row; call with the lock held, then _notify() the returned change."""
+        self.state[row] = state
+        self.frequency[row] = frequency
+        self.gain[row] = gain
+        self.generation[row] = next(_generations)
+        self.updated_at[row] = time.time()
+        self._snapshots[row] = None
+        return row, self._views[row], _status_text(state, frequency, gain)
+
+    def _notify(self, changes):
+        """Calls the listeners for [(row, view, status)]; call without the lock."""
+        for row, view, status in changes:
+            for callback in self._listeners:
+                callback(row)
+            for callback in list(view._listeners):
+                callback(status)
+
+    def read(self, row: int):
+        """Returns (device_id, state code, frequency, gain, generation, updated_at) of row.
+
+        device_id is None if the row is free. The values are read together,
+        so they always belong to the same change.
+        """
+        with self._lock:
+            return (
+                self.device_ids[row], self.state[row], self.frequency[row], self.gain[row],
+                self.generation[row], self.updated_at[row],
+            )
+
+    def snapshot(self, row: int) -> DeviceSnapshot:
+        snapshot = self._snapshots[row]
+        if snapshot is None:
+            with self._lock:
+                state, frequency, gain = self.state[row], self.frequency[row], self.gain[row]
+                snapshot = DeviceSnapshot(
+                    STATES[state], frequency, gain, self.device_ids[row],
+                    self.updated_at[row], self.generation[row],
+                    _status_text(state, frequency, gain),
+                )
+                self._snapshots[row] = snapshot
+        return snapshot
+
+    def query(self, min_frequency: float = None, max_frequency: float = None, state: str = None,
+              min_gain: float = None, max_gain: float = None):
+        """Returns the IDs of connected devices within the given bounds (inclusive) and state.
+
+        One pass over the columns, linear in the size of the table; the
+        registry's TableFleetIndex answers ListDevices without a scan.
+        """
+        lo = float("-inf") if min_frequency is None else min_frequency
+        hi = float("inf") if max_frequency is None else max_frequency
+        gain_lo = float("-inf") if min_gain is None else min_gain
+        gain_hi = float("inf") if max_gain is None else max_gain
+        code = None if state is None else STATES.index(state)
+        with self._lock:
+            ids = self.device_ids
+            return [
+                ids[row]
+                for row, (frequency, gain, row_state) in enumerate(
+                    zip(self.frequency, self.gain, self.state)
+                )
+                if lo <= frequency <= hi and gain_lo <= gain <= gain_hi
+                and (row_state == code if code is not None else row_state != DISCONNECTED)
+            ]
+
+    def bulk_apply(self, device_ids, frequency: float = None, gain: float = None) -> int:
+        """Applies frequency and/or gain to every listed connected device; returns how many.
+
+        Invalid values change nothing. Listeners are notified as for
+        apply(), and each device gets a new generation.
+        """
+        with self._lock:
+            settings = [
+                (
+                    row,
+                    self.frequency[row] if frequency is None else frequency,
+                    self.gain[row] if gain is None else gain,
+                )
+                for row in map(self.row_of, device_ids) if row >= 0
+            ]
+            for _, new_frequency, new_gain in settings:
+                error = RFDevice._validate(new_frequency, new_gain)
+                if error:
+                    logger.error("Rejected bulk settings: %s", error)
+                    return 0
+            changes = [self._set(row, OPERATING, f, g) for row, f, g in settings]
+        self._notify(changes)
+        return len(changes)
+
+    def apply_many(self, settings):
+        """Applies [(device_id, frequency, gain)] in order, taking the lock once.
+
+        Returns (success, status) per item. An item fails like
+        TableRFDevice.apply() does: if its device is not connected or its
+        values are invalid.
+        """
+        results, changes = [], []
+        with self._lock:
+            for device_id, frequency, gain in settings:
+                row = self.row_of(device_id)
+                if row < 0:
+                    logger.error("Cannot apply settings: No device connected.")
+                    results.append((False, "DISCONNECTED"))
+                    continue
+                state = self.state[row]
+                error = RFDevice._validate(frequency, gain)
+                if error:
+                    logger.error("Rejected settings: %s", error)
+                    results.append((False, _status_text(state, self.frequency[row], self.gain[row])))
+                    continue
+                if (state, self.frequency[row], self.gain[row]) != (OPERATING, frequency, gain):
+                    changes.append(self._set(row, OPERATING, frequency, gain))
+                results.append((True, _status_text(OPERATING, frequency, gain)))
+        self._notify(changes)
+        return results
+
+class TableRFDevice:
+    """A simulated device whose state lives in a DeviceTable row.
+
+    Behaves like SimulatedRFDevice, but the object itself only holds its
+    table, row and status listeners. Listeners run after the table lock
+    is released; the registry's device lock keeps the changes of one
+    device in order.
+    """
+
+    __slots__ = ("_table", "_row", "_listeners", "_detached")
+
+    blocking = False
+
+    def __init__(self, table: DeviceTable):
+        self._table = table
+        self._row = -1
+        self._listeners = []
+        self._detached = _NEVER_CONNECTED
+
+    def add_listener(self, callback):
+        """Registers callback(status) to be called whenever the status changes."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Unregisters a callback added with add_listener."""
+        self._listeners.remove(callback)
+
+    def connect(self, device_id: str) -> bool:
+        """Simulates connecting to the device; it takes a row of the table."""
+        table = self._table
+        changes = []
+        with table._lock:
+            if self._row >= 0:
+                logger.warning("Device already connected to %s.", table.device_ids[self._row])
+                return True
+            row = table.row_of(device_id)
+            if row >= 0:
+                # A device evicted but not yet disconnected; this one takes over its row
+                previous = table._views[row]
+                table._release(row)
+                previous._detach()
+                changes.append((row, previous, "DISCONNECTED"))
+            self._row = table._allocate(self, device_id)
+            changes.append(table._set(self._row, IDLE, 0.0, 0.0))
+        table._notify(changes)
+        logger.info("Successfully connected to %s.", device_id)
+        return True
+
+    def disconnect(self):
+        """Simulates disconnecting from the device; its row is freed."""
+        table = self._table
+        with table._lock:
+            if self._row < 0:
+                logger.warning("No device connected.")
+                return
+            row = self._row
+            device_id = table.device_ids[row]
+            table._release(row)
+            self._detach()
+        table._notify([(row, self, "DISCONNECTED")])
+        logger.info("Device %s disconnected.", device_id)
+
+    def _detach(self):
+        """Forgets the row, which has been released; the caller notifies the listeners."""
+        self._row = -1
+        self._detached = DeviceSnapshot(
+            "DISCONNECTED", 0.0, 0.0, "", time.time(), next(_generations), "DISCONNECTED"
+        )
+
+    def set_frequency(self, freq: float) -> bool:
+        """Simulates setting the RF frequency."""
+        return self._apply_values(freq=freq)
+
+    def set_gain(self, gain: float) -> bool:
+        """Simulates setting the RF gain."""
+        return self._apply_values(gain=gain)
+
+    def apply(self, config) -> bool:
+        """Applies config.frequency and config.gain as one operation; see RFDevice.apply()."""
+        return self._apply_values(config.frequency, config.gain)
+
+    def _apply_values(self, freq: float = None, gain: float = None) -> bool:
+        table = self._table
+        with table._lock:
+            row = self._row
+            if row < 0:
+                logger.error("Cannot apply settings: No device connected.")
+                return False
+            freq = table.frequency[row] if freq is None else freq
+            gain = table.gain[row] if gain is None else gain
+            error = RFDevice._validate(freq, gain)
+            if error:
+                logger.error("Rejected settings: %s", error)
+                return False
+            logger.debug("Applying frequency %s MHz, gain %s dB.", freq, gain)
+            if (table.state[row], table.frequency[row], table.gain[row]) == (OPERATING, freq, gain):
+                return True
+            change = table._set(row, OPERATING, freq, gain)
+        table._notify([change])
+        return True
+
+    def get_idn(self) -> str:
+        """Simulates the *IDN? query."""
+        if self._row < 0:
+            return "No device connected."
+        return f"Simulated RF Device, s/n:{self._table.device_ids[self._row]}, fw:1.0"
+
+    @property
+    def status(self) -> str:
+        """Returns the current device status."""
+        return self.snapshot().status
+
+    def snapshot(self) -> DeviceSnapshot:
+        """Returns the current state; the same object until the status changes."""
+        row = self._row
+        return self._table.snapshot(row) if row >= 0 else self._detached
@@ -0,0 +1,40 @@
+import functools
+
+from server import emulator
+from server.device_table import DeviceTable
+from server.rf_device import SimulatedRFDevice
+from server.scpi import ScpiRFDevice
+
+# Driver name -> build(config), which returns the device factory for the
+# DeviceRegistry. Select one with --driver.
+DRIVERS = {}
+
+def register_driver(name: str, build):
+    """Makes build(config) available as --driver name."""
+    DRIVERS[name] = build
+
+def create_device_factory(config):
+    """Returns a factory making devices of the driver config selects."""
+    try:
+        build = DRIVERS[config.driver]
+    except KeyError:
+        raise ValueError(f"unknown driver {config.driver!r}; choose from {sorted(DRIVERS)}") from None
+    return build(config)
+
+def _simulated(config):
+    if config.device_emulation is None:
+        return SimulatedRFDevice
+    return emulator.device_factory(emulator.LatencyModel.load(config.device_emulation))
+
+def _table(config):
+    # The table itself, so the registry can index and journal it as a whole
+    return DeviceTable()
+
+def _scpi(config):
+    return functools.partial(
+        ScpiRFDevice, config.scpi_address, config.scpi_connections, config.scpi_timeout
+    )
+
+register_driver("simulated", _simulated)
+register_driver("table", _table)
+register_driver("scpi", _scpi)
@@ -0,0 +1,349 @@
+import argparse
+import functools
+import json
+import logging
+import math
+import random
+import socketserver
+import threading
+import time
+
+from server.device_registry import DeviceRegistry
+from server.rf_device import RFDevice
+
+logger = logging.getLogger("rfcontrol.emulator")
+
+# Operations an emulated instrument spends time on. "command" is the round
+# trip every transaction pays (VISA/LAN overhead); "frequency" and "gain"
+# are the settling times paid only when that value changes.
+OPERATIONS = ("connect", "disconnect", "command", "frequency", "gain", "query")
+
+class Latency:
+    """A latency distribution, sampled in seconds.
+
+    Built from a profile entry: a number of milliseconds, or a dict with
+    "dist" set to "fixed" (ms), "uniform" (low_ms, high_ms), "normal"
+    (mean_ms, stddev_ms) or "lognormal" (median_ms, sigma).
+    """
+
+    def __init__(self, dist: str = "fixed", **params):
+        if dist not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"unknown latency distribution {dist!r}")
+        self.dist = dist
+        self.params = {name: float(value) for name, value in params.items()}
+        # Fail on a bad profile now, not on the first device call
+        self.sample(random.Random(0))
+
+    @classmethod
+    def parse(cls, spec) -> "Latency":
+        if isinstance(spec, (int, float)):
+            return cls("fixed", ms=spec)
+        spec = dict(spec)
+        return cls(spec.pop("dist", "fixed"), **spec)
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.dist == "fixed":
+            ms = p["ms"]
+        elif self.dist == "uniform":
+            ms = rng.uniform(p["low_ms"], p["high_ms"])
+        elif self.dist == "normal":
+            ms = rng.gauss(p["mean_ms"], p["stddev_ms"])
+        else:
+            ms = p["median_ms"] * math.exp(rng.gauss(0.0, p["sigma"]))
+        return max(ms, 0.0) / 1000.0
+
+# Rough figures for a LAN-attached signal generator.
+DEFAULT_PROFILE = {
+    "connect": {"dist": "lognormal", "median_ms": 50.0, "sigma": 0.3},
+    "disconnect": {"dist": "fixed", "ms": 5.0},
+    "command": {"dist": "lognormal", "median_ms": 0.4, "sigma": 0.3},
+    "frequency": {"dist": "lognormal", "median_ms": 2.5, "sigma": 0.5},
+    "gain": {"dist": "lognormal", "median_ms": 0.3, "sigma": 0.3},
+    "query": {"dist": "lognormal", "median_ms": 0.5, "sigma": 0.3},
+    "failure_rate": 0.001,
+    "timeout_rate": 0.0002,
+    "timeout_ms": 2000.0,
+}
+
+class LatencyModel:
+    """Latency distributions per operation plus fault injection.
+
+    failure_rate is the chance that a transaction fails (the instrument
+    reports an error); timeout_rate the chance that it hangs for timeout_ms
+    and then fails. Operations missing from the profile take no time.
+    """
+
+    def __init__(self, latencies=None, failure_rate: float = 0.0, timeout_rate: float = 0.0,
+                 timeout_ms: float = 2000.0, seed: int = None):
+        self.latencies = dict(latencies or {})
+        unknown = set(self.latencies) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"unknown operations in latency profile: {sorted(unknown)}")
+        if not (0.0 <= failure_rate <= 1.0 and 0.0 <= timeout_rate <= 1.0):
+            raise ValueError("failure_rate and timeout_rate must be between 0 and 1")
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout_ms / 1000.0
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_dict(cls, profile: dict) -> "LatencyModel":
+        profile = dict(profile)
+        options = {
+            name: profile.pop(name)
+            for name in ("failure_rate", "timeout_rate", "timeout_ms", "seed")
+            if name in profile
+        }
+        return cls({op: Latency.parse(spec) for op, spec in profile.items()}, **options)
+
+    @classmethod
+    def load(cls, source: str) -> "LatencyModel":
+        """Returns the model for "default" or for a JSON profile file."""
+        if source == "default":
+            return cls.from_dict(DEFAULT_PROFILE)
+        with open(source) as f:
+            return cls.from_dict(json.load(f))
+
+    def sample(self, operation: str) -> float:
+        latency = self.latencies.get(operation)
+        return latency.sample(self._rng) if latency is not None else 0.0
+
+    def fault(self):
+        """Returns "timeout", "failure" or None for one transaction."""
+        roll = self._rng.random()
+        if roll < self.timeout_rate:
+            return "timeout"
+        if roll < self.timeout_rate + self.failure_rate:
+            return "failure"
+        return None
+
+class EmulatedRFDevice(RFDevice):
+    """A device that takes as long as a real instrument would.
+
+    Each operation is a transaction on the device's command bus: one at a
+    time, like a serial or VISA session, taking the time drawn from the
+    LatencyModel and sometimes failing or timing out. Calls block for
+    that long, so the aio server runs these devices on an executor.
+    """
+
+    blocking = True
+
+    def __init__(self, model: LatencyModel):
+        super().__init__()
+        self.model = model
+        self._bus = threading.Lock()
+        # "timeout" or "failure" if the last transaction hit a fault
+        self.last_error = None
+        self.transactions = 0
+        self.busy_time = 0.0
+
+    def _transact(self, *operations) -> bool:
+        """Holds the bus for the sampled duration; returns False on an injected fault."""
+        model = self.model
+        with self._bus:
+            fault = model.fault()
+            if fault == "timeout":
+                duration = model.timeout
+            else:
+                duration = model.sample("command") + sum(model.sample(op) for op in operations)
+            if duration > 0:
+                time.sleep(duration)
+            self.transactions += 1
+            self.busy_time += duration
+            self.last_error = fault
+        if fault is not None:
+            logger.warning("Emulated %s on device %s.", fault, self._device_id)
+            return False
+        return True
+
+    def _open(self, device_id: str) -> bool:
+        return self._transact("connect")
+
+    def _close(self):
+        self._transact("disconnect")
+
+    def _write(self, freq: float, gain: float) -> bool:
+        settling = []
+        if freq != self._frequency:
+            settling.append("frequency")
+        if gain != self._gain:
+            settling.append("gain")
+        return self._transact(*settling)
+
+    def _query_idn(self) -> str:
+        if not self._transact("query"):
+            return f"ERROR - {self.last_error}"
+        return f"Emulated RF Device, s/n:{self._device_id}, fw:1.0"
+
+def device_factory(model: LatencyModel):
+    """Returns a DeviceRegistry device_factory making EmulatedRFDevices."""
+    return functools.partial(EmulatedRFDevice, model)
+
+# SCPI error queue entries
+NO_ERROR = '0,"No error"'
+_UNDEFINED_HEADER = '-113,"Undefined header"'
+_DATA_OUT_OF_RANGE = '-222,"Data out of range"'
+_NO_INSTRUMENT = '-221,"Settings conflict; no instrument selected"'
+_FAULT_ERRORS = {
+    "failure": '-240,"Hardware error"',
+    "timeout": '-300,"Device-specific error; timed out"',
+}
+
+# Long and short forms of the supported headers
+_HEADERS = {
+    "*IDN?": "*IDN?", "*OPC?": "*OPC?", "*RST": "*RST",
+    "INST:SEL": "INST:SEL", "INSTRUMENT:SELECT": "INST:SEL",
+    "INST:SEL?": "INST:SEL?", "INSTRUMENT:SELECT?": "INST:SEL?",
+    "FREQ": "FREQ", "FREQUENCY": "FREQ", "FREQ?": "FREQ?", "FREQUENCY?": "FREQ?",
+    "POW": "POW", "POWER": "POW", "POW?": "POW?", "POWER?": "POW?",
+    "SYST:ERR?": "SYST:ERR?", "SYSTEM:ERROR?": "SYST:ERR?",
+    "SYST:STAT?": "SYST:STAT?", "SYSTEM:STATUS?": "SYST:STAT?",
+}
+
+class _ScpiHandler(socketserver.StreamRequestHandler):
+    """One SCPI session: newline-terminated messages of ';'-separated commands.
+
+    INST:SEL <device_id> picks the instrument for the rest of the session.
+    FREQ (MHz) and POW (dB) in one message are applied together when the
+    message ends or a query follows. Every query answers one line.
+    """
+
+    registry: DeviceRegistry = None
+
+    def setup(self):
+        super().setup()
+        self.device_id = None
+        self.errors = []
+        self.pending = {}
+
+    def handle(self):
+        for line in self.rfile:
+            replies = []
+            for command in line.decode("ascii", "replace").split(";"):
+                command = command.strip()
+                if command:
+                    self._command(command, replies)
+            self._flush()
+            if replies:
+                self.wfile.write(("".join(reply + "\n" for reply in replies)).encode())
+
+    def _command(self, command, replies):
+        header, _, argument = command.partition(" ")
+        header = _HEADERS.get(header.upper().removeprefix("SOUR:").removeprefix("SOURCE:"))
+        if header is None:
+            self.errors.append(_UNDEFINED_HEADER)
+        elif header in ("FREQ", "POW"):
+            try:
+                self.pending[header] = float(argument)
+            except ValueError:
+                self.errors.append(_DATA_OUT_OF_RANGE)
+        elif header == "INST:SEL":
+            self._flush()
+            self.device_id = argument.strip().strip('"') or None
+        else:
+            self._flush()
+            replies.append(self._query(header))
+
+    def _query(self, header):
+        if header == "*OPC?":
+            return "1"
+        if header == "SYST:ERR?":
+            return self.errors.pop(0) if self.errors else NO_ERROR
+        if header == "INST:SEL?":
+            return f'"{self.device_id or ""}"'
+        if self.device_id is None:
+            self.errors.append(_NO_INSTRUMENT)
+            return ""
+        with self.registry.acquire(self.device_id) as device:
+            if header == "*RST":
+                device.apply(_Settings(0.0, 0.0))
+                return ""
+            if header == "*IDN?":
+                return device.get_idn()
+            snapshot = device.snapshot()
+            if header == "FREQ?":
+                return repr(snapshot.frequency)
+            if header == "POW?":
+                return repr(snapshot.gain)
+            return snapshot.status
+
+    def _flush(self):
+        """Applies the FREQ/POW values set so far in one transaction."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        if self.device_id is None:
+            self.errors.append(_NO_INSTRUMENT)
+            return
+        with self.registry.acquire(self.device_id) as device:
+            snapshot = device.snapshot()
+            settings = _Settings(
+                pending.get("FREQ", snapshot.frequency), pending.get("POW", snapshot.gain)
+            )
+            if not device.apply(settings):
+                error = getattr(device, "last_error", None)
+                self.errors.append(_FAULT_ERRORS.get(error, _DATA_OUT_OF_RANGE))
+
+class _Settings:
+    """The frequency and gain fields device.apply() reads from an RFConfig."""
+
+    __slots__ = ("frequency", "gain")
+
+    def __init__(self, frequency: float, gain: float):
+        self.frequency = frequency
+        self.gain = gain
+
+class ScpiEmulator:
+    """Serves emulated instruments over a line-based SCPI TCP protocol.
+
+    Devices come from registry (by default one of EmulatedRFDevices with
+    the given model), so sessions for the same instrument take turns,
+    as they would on the real bus.
+    """
+
+    def __init__(self, address: str = "127.0.0.1", port: int = 5025, model: LatencyModel = None,
+                 registry: DeviceRegistry = None):
+        if registry is None:
+            registry = DeviceRegistry(device_factory(model or LatencyModel()))
+        self.registry = registry
+        handler = type("ScpiHandler", (_ScpiHandler,), {"registry": registry})
+        self._server = socketserver.ThreadingTCPServer((address, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="rf-scpi", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        logger.info("SCPI emulator listening on %s:%d", *self._server.server_address[:2])
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.registry.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emulated RF instruments served over SCPI/TCP")
+    parser.add_argument("--address", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=5025, help="TCP port (5025 is the SCPI default)")
+    parser.add_argument(
+        "--profile", default="default", help="'default' or a JSON latency profile file"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    emulator = ScpiEmulator(args.address, args.port, LatencyModel.load(args.profile)).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    emulator.stop()
+
+if __name__ == "__main__":
+    main()
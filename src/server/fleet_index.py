@@ -0,0 +1,402 @@
+import base64
+import bisect
+import binascii
+import collections
+import itertools
+import json
+import threading
+from array import array
+
+import rfcontrol_pb2
+from server.device_table import STATES
+from server.status_cache import DEVICE_STATES, status_message
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Index entries one ListDevices page may look at; a query that matches few
+# of them returns a short page and a token to go on from there.
+MAX_SCAN = 10000
+
+# Sorts after every character a device_id may contain
+_ID_END = "\U0010ffff"
+_INF = float("inf")
+# Keys per run of a _SortedKeys; a run is split in two beyond twice this
+_RUN = 512
+
+_STATUS_FIELDS = frozenset(rfcontrol_pb2.DeviceStatus.DESCRIPTOR.fields_by_name)
+
+# What a TableFleetIndex indexed for a device; has the DeviceSnapshot fields queries read
+IndexedRow = collections.namedtuple("IndexedRow", "state frequency gain device_id updated_at generation")
+
+def sort_key(order: str, device_id: str, status):
+    """The position of a device in the given order; status is a DeviceSnapshot or DeviceStatus."""
+    return (device_id,) if order == "id" else (getattr(status, order), device_id)
+
+class FleetQuery:
+    """The predicates of a ListDevicesRequest and the index that serves them.
+
+    A frequency bound makes the query walk the frequency index, else a gain
+    bound the gain index, else the device_id index (narrowed to id_prefix);
+    the other predicates are checked on each device found there.
+    """
+
+    __slots__ = ("min_frequency", "max_frequency", "min_gain", "max_gain", "states", "id_prefix", "order")
+
+    def __init__(self, min_frequency=None, max_frequency=None, min_gain=None, max_gain=None,
+                 states=(), id_prefix=""):
+        self.min_frequency = -_INF if min_frequency is None else min_frequency
+        self.max_frequency = _INF if max_frequency is None else max_frequency
+        self.min_gain = -_INF if min_gain is None else min_gain
+        self.max_gain = _INF if max_gain is None else max_gain
+        self.states = frozenset(states)
+        self.id_prefix = id_prefix
+        if min_frequency is not None or max_frequency is not None:
+            self.order = "frequency"
+        elif min_gain is not None or max_gain is not None:
+            self.order = "gain"
+        else:
+            self.order = "id"
+
+    @classmethod
+    def from_request(cls, request):
+        """Builds the query of a ListDevicesRequest."""
+        names = {value: name for name, value in DEVICE_STATES.items()}
+        return cls(
+            *(
+                getattr(request, field) if request.HasField(field) else None
+                for field in ("min_frequency", "max_frequency", "min_gain", "max_gain")
+            ),
+            states=[names[state] for state in request.states if state in names],
+            id_prefix=request.id_prefix,
+        )
+
+    def bounds(self):
+        """The (first, end) keys of the index range holding every possible match."""
+        if self.order == "frequency":
+            return (self.min_frequency,), (self.max_frequency, _ID_END)
+        if self.order == "gain":
+            return (self.min_gain,), (self.max_gain, _ID_END)
+        return (self.id_prefix,), (self.id_prefix + _ID_END,)
+
+    def matches(self, device_id, snapshot) -> bool:
+        return (
+            self.min_frequency <= snapshot.frequency <= self.max_frequency
+            and self.min_gain <= snapshot.gain <= self.max_gain
+            and (not self.states or snapshot.state in self.states)
+            and device_id.startswith(self.id_prefix)
+        )
+
+def encode_page_token(order: str, key) -> str:
+    return base64.urlsafe_b64encode(json.dumps([order, *key]).encode()).decode()
+
+def decode_page_token(token: str, order: str):
+    """Returns the key a page_token resumes after; raises ValueError if it is not one for order."""
+    try:
+        token_order, *key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise ValueError("malformed page_token") from None
+    if token_order != order or len(key) != (1 if order == "id" else 2):
+        raise ValueError("page_token belongs to a query with different predicates")
+    return tuple(key)
+
+def page_size(request) -> int:
+    return min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+def projection(request):
+    """Returns the DeviceStatus fields to clear; raises ValueError for unknown ones."""
+    paths = set(request.fields.paths)
+    if not paths:
+        return ()
+    unknown = paths - _STATUS_FIELDS
+    if unknown:
+        raise ValueError(f"unknown DeviceStatus fields: {', '.join(sorted(unknown))}")
+    return tuple(_STATUS_FIELDS - paths)
+
+def device_status(device_id, snapshot, cleared=()) -> rfcontrol_pb2.DeviceStatus:
+    message = status_message(snapshot)
+    # A disconnected device's snapshot has no device_id
+    message.device_id = device_id
+    for field in cleared:
+        message.ClearField(field)
+    return message
+
+class _SortedKeys:
+    """Sorted keys kept as a list of sorted runs of at most 2 * _RUN keys.
+
+    Adding or removing a key shifts the keys of one run rather than of
+    the whole index, so a status change costs the same in a fleet of a
+    thousand devices as in one of a hundred thousand.
+    """
+
+    __slots__ = ("_runs", "_maxes")
+
+    def __init__(self):
+        self._runs = []
+        # The last key of each run, to find the run a key belongs in
+        self._maxes = []
+
+    def __len__(self):
+        return sum(map(len, self._runs))
+
+    def add(self, key):
+        runs, maxes = self._runs, self._maxes
+        if not runs:
+            runs.append([key])
+            maxes.append(key)
+            return
+        i = min(bisect.bisect_left(maxes, key), len(runs) - 1)
+        run = runs[i]
+        bisect.insort(run, key)
+        maxes[i] = run[-1]
+        if len(run) > 2 * _RUN:
+            runs[i:i + 1] = [run[:_RUN], run[_RUN:]]
+            maxes[i:i + 1] = [run[_RUN - 1], run[-1]]
+
+    def remove(self, key):
+        """Removes key, which must be present."""
+        i = bisect.bisect_left(self._maxes, key)
+        run = self._runs[i]
+        del run[bisect.bisect_left(run, key)]
+        if run:
+            self._maxes[i] = run[-1]
+        else:
+            del self._runs[i]
+            del self._maxes[i]
+
+    def irange(self, start, inclusive: bool = True):
+        """Yields the keys from start on (or after it, if not inclusive), in order."""
+        find = bisect.bisect_left if inclusive else bisect.bisect_right
+        runs = self._runs
+        i = find(self._maxes, start)
+        if i == len(runs):
+            return
+        yield from itertools.islice(runs[i], find(runs[i], start), None)
+        for run in itertools.islice(runs, i + 1, None):
+            yield from run
+
+class FleetIndex:
+    """Sorted indexes over the latest status of every registered device.
+
+    The registry feeds it status changes. Devices are kept sorted by
+    device_id, by (frequency, device_id) and by (gain, device_id), so a
+    query bisects to the start of its range and reads on from there
+    instead of scanning the fleet. A change moves the device within an
+    index only if the key actually changed, and a change of state alone
+    moves it in none of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._snapshots = {}
+        self._indexes = {"id": _SortedKeys(), "frequency": _SortedKeys(), "gain": _SortedKeys()}
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def watch(self, device_id: str, device):
+        """Indexes device under device_id and keeps following its status."""
+
+        def on_status(status):
+            self._update(device_id, device)
+
+        with self._lock:
+            # Replaces a device evicted under the same id but not removed yet
+            self._drop(device_id)
+            self._devices[device_id] = device
+        device.add_listener(on_status)
+        self._update(device_id, device)
+
+    def remove(self, device_id: str, device):
+        """Drops device_id, unless another device has been registered under it since."""
+        with self._lock:
+            if self._devices.get(device_id) is device:
+                self._drop(device_id)
+
+    def _drop(self, device_id):
+        self._devices.pop(device_id, None)
+        snapshot = self._snapshots.pop(device_id, None)
+        if snapshot is not None:
+            for order, index in self._indexes.items():
+                index.remove(sort_key(order, device_id, snapshot))
+
+    def _update(self, device_id, device):
+        # Taken outside the lock, which status listeners of other devices may be waiting for
+        snapshot = device.snapshot()
+        with self._lock:
+            if self._devices.get(device_id) is not device:
+                return
+            old = self._snapshots.get(device_id)
+            if old is not None and old.generation >= snapshot.generation:
+                return
+            self._snapshots[device_id] = snapshot
+            if old is not None and (old.frequency, old.gain) == (snapshot.frequency, snapshot.gain):
+                # Only the state changed, which no index is sorted by
+                return
+            for order, index in self._indexes.items():
+                key = sort_key(order, device_id, snapshot)
+                if old is not None:
+                    old_key = sort_key(order, device_id, old)
+                    if old_key == key:
+                        continue
+                    index.remove(old_key)
+                index.add(key)
+
+    def _indexed(self, device_id):
+        """Returns what is indexed for device_id; call with the lock held."""
+        return self._snapshots[device_id]
+
+    def query(self, query: FleetQuery, after=None, limit: int = DEFAULT_PAGE_SIZE,
+              max_scan: int = MAX_SCAN):
+        """Returns ([(device_id, snapshot)], resume) for up to limit matches in query order.
+
+        The search starts after the key after, if given. resume is the key
+        to continue after, or None once the range is exhausted.
+        """
+        first, end = query.bounds()
+        if after is not None and after >= first:
+            start, inclusive = after, False
+        else:
+            start, inclusive = first, True
+        page = []
+        resume = last = None
+        scanned = 0
+        with self._lock:
+            indexed = self._indexed
+            for key in self._indexes[query.order].irange(start, inclusive):
+                if key >= end:
+                    break
+                if scanned == max_scan or len(page) == limit:
+                    # More of the range is left
+                    resume = last
+                    break
+                scanned += 1
+                last = key
+                device_id = key[-1]
+                snapshot = indexed(device_id)
+                if snapshot is not None and query.matches(device_id, snapshot):
+                    page.append((device_id, snapshot))
+        return page, resume
+
+    def list_devices(self, request) -> rfcontrol_pb2.ListDevicesResponse:
+        """Answers a ListDevicesRequest; raises ValueError if it is invalid."""
+        query = FleetQuery.from_request(request)
+        cleared = projection(request)
+        after = decode_page_token(request.page_token, query.order) if request.page_token else None
+        page, resume = self.query(query, after, page_size(request))
+        return rfcontrol_pb2.ListDevicesResponse(
+            devices=[device_status(device_id, snapshot, cleared) for device_id, snapshot in page],
+            next_page_token=encode_page_token(query.order, resume) if resume is not None else "",
+        )
+
+class TableFleetIndex(FleetIndex):
+    """A FleetIndex over the connected devices of a DeviceTable.
+
+    It follows the whole table through one table listener rather than
+    one per device, and keeps the values it indexed in columns of its own
+    by row, so it holds no snapshot or dict entry per device. A device is
+    listed from its first connect until its row is released.
+    """
+
+    def __init__(self, table):
+        super().__init__()
+        self._table = table
+        # The device_id indexed for each table row, or None
+        self._ids = []
+        self._state = array("B")
+        self._frequency = array("d")
+        self._gain = array("d")
+        self._generation = array("q")
+        self._updated_at = array("d")
+        self._count = 0
+        table.add_listener(self._sync)
+
+    def __len__(self):
+        return self._count
+
+    def watch(self, device_id: str, device):
+        """Nothing to do: devices are followed through their table."""
+
+    def remove(self, device_id: str, device):
+        """Nothing to do: a released row is dropped when the table reports it."""
+
+    def _sync(self, row: int):
+        """Brings the index entry of row up to date with the table.
+
+        Reads the row afresh rather than trusting the notification, so
+        notifications may arrive late or out of order.
+        """
+        with self._lock:
+            device_id, state, frequency, gain, generation, updated_at = self._table.read(row)
+            while len(self._ids) <= row:
+                self._ids.append(None)
+                for column in (self._state, self._frequency, self._gain, self._generation, self._updated_at):
+                    column.append(0)
+            old_id = self._ids[row]
+            if old_id is device_id and (device_id is None or self._generation[row] == generation):
+                return
+            old_keys = new_keys = {}
+            if old_id is not None:
+                old = self._indexed_row(row, old_id)
+                old_keys = {order: sort_key(order, old_id, old) for order in self._indexes}
+                self._count -= 1
+            if device_id is not None:
+                self._ids[row] = device_id
+                self._state[row] = state
+                self._frequency[row] = frequency
+                self._gain[row] = gain
+                self._generation[row] = generation
+                self._updated_at[row] = updated_at
+                new = self._indexed_row(row, device_id)
+                new_keys = {order: sort_key(order, device_id, new) for order in self._indexes}
+                self._count += 1
+            else:
+                self._ids[row] = None
+            for order, index in self._indexes.items():
+                old_key, new_key = old_keys.get(order), new_keys.get(order)
+                if old_key == new_key:
+                    continue
+                if old_key is not None:
+                    index.remove(old_key)
+                if new_key is not None:
+                    index.add(new_key)
+
+    def _indexed_row(self, row, device_id):
+        return IndexedRow(
+            STATES[self._state[row]], self._frequency[row], self._gain[row], device_id,
+            self._updated_at[row], self._generation[row],
+        )
+
+    def _indexed(self, device_id):
+        row = self._table.row_of(device_id)
+        if 0 <= row < len(self._ids) and self._ids[row] is device_id:
+            return self._indexed_row(row, device_id)
+        # Moved or released, and not synced yet
+        return None
+
+def merge_pages(order: str, pages, limit: int, cleared=()) -> rfcontrol_pb2.ListDevicesResponse:
+    """Merges pages of the same query over disjoint parts of the fleet into one page.
+
+    A part with more to come may still hold devices that sort before what
+    the others returned, so the merged page stops where the first of them
+    stopped.
+    """
+    resumes = [decode_page_token(page.next_page_token, order) for page in pages if page.next_page_token]
+    horizon = min(resumes, default=None)
+    devices = sorted(
+        (status for page in pages for status in page.devices),
+        key=lambda status: sort_key(order, status.device_id, status),
+    )
+    if horizon is not None:
+        devices = [status for status in devices if sort_key(order, status.device_id, status) <= horizon]
+    resume = horizon
+    if len(devices) > limit:
+        devices = devices[:limit]
+        resume = sort_key(order, devices[-1].device_id, devices[-1])
+    for status in devices:
+        for field in cleared:
+            status.ClearField(field)
+    return rfcontrol_pb2.ListDevicesResponse(
+        devices=devices,
+        next_page_token=encode_page_token(order, resume) if resume is not None else "",
+    )
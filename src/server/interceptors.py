@@ -0,0 +1,358 @@
+import asyncio
+import contextvars
+import inspect
+import logging
+import time
+import uuid
+from concurrent import futures
+
+import grpc
+
+from server.log_pipeline import RPC_LOGGER, request_id
+
+rpc_logger = logging.getLogger(RPC_LOGGER)
+
+# Metadata keys passed on to calls made while handling a request.
+REQUEST_ID_KEY = "x-request-id"
+TRACEPARENT_KEY = "traceparent"
+
+# Metadata of the request being handled that outgoing calls should carry.
+_propagated = contextvars.ContextVar("rfcontrol_propagated", default=())
+
+def propagated_metadata():
+    """Returns the trace metadata to send on calls made for the current request."""
+    return _propagated.get()
+
+class RejectRpc(Exception):
+    """Raised by a hook to end a call with code before the servicer sees it."""
+
+    def __init__(self, code: grpc.StatusCode, details: str):
+        super().__init__(details)
+        self.code = code
+        self.details = details
+
+class RpcCall:
+    """What the hooks know about one call."""
+
+    __slots__ = ("method", "context", "streaming", "start_time", "request_id", "rejection", "state")
+
+    def __init__(self, method: str, context, streaming: bool, rejection: RejectRpc = None):
+        self.method = method
+        self.context = context
+        self.streaming = streaming
+        self.start_time = time.perf_counter()
+        self.request_id = None
+        # Set when admit() turned the call away; the hooks still see it
+        self.rejection = rejection
+        # Per-call values hooks need in finish(), keyed by hook
+        self.state = {}
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+class ServerHook:
+    """One link of the interceptor chain; override only what is needed.
+
+    admit() runs as a call arrives, before it waits for a server thread, and
+    sees only the method name and request metadata. start() runs where the
+    call is handled, just before the servicer method, and finish() once the
+    call is over, with its status code. admit() and start() turn a call away
+    by raising RejectRpc. Hooks run in order and finish in reverse order.
+    """
+
+    def admit(self, method: str, metadata):
+        pass
+
+    def start(self, call: RpcCall):
+        pass
+
+    def finish(self, call: RpcCall, code: grpc.StatusCode):
+        pass
+
+class TracingHook(ServerHook):
+    """Takes the request ID from x-request-id metadata, or makes one up.
+
+    The ID is sent back in the trailing metadata, attached to log records
+    made while handling the call, and passed on with traceparent to calls
+    made for it (see propagated_metadata).
+    """
+
+    def start(self, call):
+        request_id_value = None
+        propagated = []
+        for key, value in call.context.invocation_metadata() or ():
+            if key == REQUEST_ID_KEY:
+                request_id_value = value
+            elif key == TRACEPARENT_KEY:
+                propagated.append((key, value))
+        if request_id_value is None:
+            request_id_value = uuid.uuid4().hex
+        propagated.append((REQUEST_ID_KEY, request_id_value))
+        call.request_id = request_id_value
+        call.context.set_trailing_metadata(((REQUEST_ID_KEY, request_id_value),))
+        call.state[self] = (request_id.set(request_id_value), _propagated.set(tuple(propagated)))
+
+    def finish(self, call, code):
+        tokens = call.state.pop(self, None)
+        if tokens is None:
+            return
+        try:
+            request_id.reset(tokens[0])
+            _propagated.reset(tokens[1])
+        except ValueError:
+            # A stream closed from another thread; its context is gone anyway
+            pass
+
+class MetricsHook(ServerHook):
+    """Records every call in a ServerMetrics."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def start(self, call):
+        metrics = self.metrics
+        metrics.rpc_started.labels(call.method).inc()
+        metrics.rpc_in_flight.labels(call.method).inc()
+        if call.streaming:
+            metrics.streams_active.labels(call.method).inc()
+
+    def finish(self, call, code):
+        metrics = self.metrics
+        metrics.rpc_duration.labels(call.method).observe(call.elapsed)
+        metrics.rpc_handled.labels(call.method, code.name).inc()
+        metrics.rpc_in_flight.labels(call.method).dec()
+        if call.streaming:
+            metrics.streams_active.labels(call.method).dec()
+
+class TimingHook(ServerHook):
+    """Logs how long each call took; unary calls slower than slow_seconds at WARNING."""
+
+    def __init__(self, slow_seconds: float = None):
+        self.slow_seconds = slow_seconds
+
+    def finish(self, call, code):
+        elapsed = call.elapsed
+        slow = (
+            self.slow_seconds is not None and not call.streaming and elapsed >= self.slow_seconds
+        )
+        level = logging.WARNING if slow else logging.DEBUG
+        if rpc_logger.isEnabledFor(level):
+            rpc_logger.log(
+                level, "%s%s finished with %s in %.3f ms",
+                "Slow call: " if slow else "", call.method, code.name, 1000.0 * elapsed,
+                extra={"rpc": call.method, "code": code.name, "duration_ms": 1000.0 * elapsed},
+            )
+
+class DeadlineHook(ServerHook):
+    """Turns away calls whose deadline has passed by the time a thread picks them up.
+
+    A call that waited in the server's queue past its deadline would only
+    tie up the device for a reply nobody is waiting for.
+    """
+
+    def __init__(self, min_remaining: float = 0.0):
+        self.min_remaining = min_remaining
+
+    def start(self, call):
+        remaining = call.context.time_remaining()
+        if remaining is not None and remaining <= self.min_remaining:
+            raise RejectRpc(
+                grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline expired before the call was handled."
+            )
+
+class LoadShedHook(ServerHook):
+    """Answers new calls with RESOURCE_EXHAUSTED while the queue is longer than max_depth.
+
+    queue_depth() is read as each call arrives, before it joins the queue,
+    so an overloaded server fails fast instead of letting every call wait
+    until its deadline.
+    """
+
+    def __init__(self, queue_depth, max_depth: int):
+        self.queue_depth = queue_depth
+        self.max_depth = max_depth
+
+    def admit(self, method, metadata):
+        depth = self.queue_depth()
+        if depth > self.max_depth:
+            raise RejectRpc(
+                grpc.StatusCode.RESOURCE_EXHAUSTED,
+                f"Server overloaded: {depth} calls queued (limit {self.max_depth}).",
+            )
+
+def _code_of(context, default: grpc.StatusCode) -> grpc.StatusCode:
+    code = context.code()
+    if code is None:
+        return default
+    if isinstance(code, grpc.StatusCode):
+        return code
+    # grpc.aio reports the numeric code
+    for status in grpc.StatusCode:
+        if status.value[0] == code:
+            return status
+    return default
+
+_BEHAVIORS = ("unary_unary", "unary_stream", "stream_unary", "stream_stream")
+
+# The thread-pool server runs a behavior on its experimental_thread_pool if
+# it has one. Rejections use this pool, so turning a call away is quick
+# even while every server thread is busy, which is when it matters.
+_REJECT_EXECUTOR = futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="rf-reject")
+
+class _Chain:
+    """Wraps method handlers so that hooks run around each call."""
+
+    # Whether handlers run on a grpc.aio server
+    asynchronous = False
+
+    def __init__(self, hooks):
+        self.hooks = tuple(hooks)
+        self._wrapped = {}
+
+    def _admit(self, handler, details):
+        if handler is None or not self.hooks:
+            return handler
+        method = details.method.rsplit("/", 1)[-1]
+        try:
+            for hook in self.hooks:
+                hook.admit(method, details.invocation_metadata)
+        except RejectRpc as rejection:
+            return self._wrap(handler, method, rejection)
+        # Wrapped once per method; handlers do not change between calls
+        cached = self._wrapped.get(details.method)
+        if cached is None or cached[0] is not handler:
+            cached = (handler, self._wrap(handler, method))
+            self._wrapped[details.method] = cached
+        return cached[1]
+
+    def _start(self, call):
+        """Runs start() hooks and returns those that ran, to be finished later.
+
+        If the call is turned away, the hooks that ran are finished here.
+        """
+        started = []
+        try:
+            for hook in self.hooks:
+                hook.start(call)
+                started.append(hook)
+            if call.rejection is not None:
+                raise call.rejection
+        except RejectRpc as e:
+            self._finish(call, started, e.code)
+            raise
+        except Exception:
+            self._finish(call, started, grpc.StatusCode.UNKNOWN)
+            raise
+        return started
+
+    @staticmethod
+    def _finish(call, started, code):
+        for hook in reversed(started):
+            try:
+                hook.finish(call, code)
+            except Exception:
+                rpc_logger.exception("Hook %r failed in finish()", hook)
+
+    def _wrap(self, handler, method, rejection=None):
+        kind = next(name for name in _BEHAVIORS if getattr(handler, name) is not None)
+        behavior = getattr(handler, kind)
+        streaming = handler.response_streaming or handler.request_streaming
+        chain = self
+
+        def start(context):
+            call = RpcCall(method, context, streaming, rejection)
+            return call, chain._start(call)
+
+        # Chosen by the handler's streaming flags: a streaming method may be
+        # a plain function returning an iterator, and finish() must wait
+        # until that iterator is done.
+        if self.asynchronous and handler.response_streaming:
+            async def wrapper(request, context):
+                try:
+                    call, started = start(context)
+                except RejectRpc as e:
+                    await context.abort(e.code, e.details)
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    responses = behavior(request, context)
+                    if inspect.isawaitable(responses):
+                        # Writes its responses with context.write()
+                        await responses
+                    elif hasattr(responses, "__aiter__"):
+                        async for response in responses:
+                            yield response
+                    else:
+                        for response in responses:
+                            yield response
+                    code = grpc.StatusCode.OK
+                except asyncio.CancelledError:
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    chain._finish(call, started, _code_of(context, code))
+        elif self.asynchronous:
+            async def wrapper(request, context):
+                try:
+                    call, started = start(context)
+                except RejectRpc as e:
+                    await context.abort(e.code, e.details)
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    response = behavior(request, context)
+                    if inspect.isawaitable(response):
+                        response = await response
+                    code = grpc.StatusCode.OK
+                    return response
+                except asyncio.CancelledError:
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    chain._finish(call, started, _code_of(context, code))
+        elif handler.response_streaming:
+            def wrapper(request, context):
+                try:
+                    call, started = start(context)
+                except RejectRpc as e:
+                    context.abort(e.code, e.details)
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    yield from behavior(request, context)
+                    code = grpc.StatusCode.OK
+                except GeneratorExit:
+                    # Closed before the end: the client went away
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    chain._finish(call, started, _code_of(context, code))
+        else:
+            def wrapper(request, context):
+                try:
+                    call, started = start(context)
+                except RejectRpc as e:
+                    context.abort(e.code, e.details)
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    response = behavior(request, context)
+                    code = grpc.StatusCode.OK
+                    return response
+                finally:
+                    chain._finish(call, started, _code_of(context, code))
+
+        if rejection is not None:
+            wrapper.experimental_thread_pool = _REJECT_EXECUTOR
+        return handler._replace(**{kind: wrapper})
+
+class InterceptorChain(_Chain, grpc.ServerInterceptor):
+    """grpc.ServerInterceptor running a list of ServerHooks around every call."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        return self._admit(continuation(handler_call_details), handler_call_details)
+
+class AsyncInterceptorChain(_Chain, grpc.aio.ServerInterceptor):
+    """InterceptorChain for grpc.aio servers."""
+
+    asynchronous = True
+
+    async def intercept_service(self, continuation, handler_call_details):
+        return self._admit(await continuation(handler_call_details), handler_call_details)
@@ -0,0 +1,131 @@
+import sys
+import json
+import queue
+import atexit
+import logging
+import itertools
+import contextvars
+import logging.handlers
+
+# Per-RPC records go to RPC_LOGGER so they can be sampled and levelled
+# separately from lifecycle messages.
+RPC_LOGGER = "rfcontrol.rpc"
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# LogRecord attributes that are not user-supplied `extra` fields.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# ID of the request being handled, set by the tracing interceptor. Records
+# made while it is set carry it as a request_id field.
+request_id = contextvars.ContextVar("rfcontrol_request_id", default=None)
+
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Passes one in every `every` records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        return next(self._counter) % self.every == 0
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats each record before enqueueing it so it
+    can cross process boundaries. The queue here never leaves the process,
+    so the record is passed as is and the caller only pays for creating it.
+    """
+
+    def prepare(self, record):
+        return record
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request_id to records made while handling a request."""
+
+    def filter(self, record):
+        value = request_id.get()
+        if value is not None and not hasattr(record, "request_id"):
+            record.request_id = value
+        return True
+
+def parse_levels(spec: str) -> dict:
+    """Parses "logger=LEVEL,..." into {logger: level}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, sep, level = item.partition("=")
+        level = level.strip().upper()
+        if not sep or not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"invalid log level spec {item!r}; expected logger=LEVEL")
+        levels[name.strip()] = level
+    return levels
+
+def configure_logging(level="INFO", levels=None, fmt="text", sample_every=1, stream=None):
+    """Routes all logging through a queue drained by a background thread.
+
+    Callers only build a LogRecord and enqueue it; formatting and writing to
+    stream (stderr by default) happen on the listener thread. levels maps
+    logger names to levels, and sample_every keeps one in that many
+    sub-WARNING records of the RPC logger. Calling this again replaces the
+    previous pipeline, which is what a forked worker process needs.
+    """
+    global _listener
+    stop_logging()
+
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    queue_handler = DeferredQueueHandler(records)
+    # Runs on the calling thread, where the request's context is visible
+    queue_handler.addFilter(RequestIdFilter())
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    rpc_logger = logging.getLogger(RPC_LOGGER)
+    for existing in [f for f in rpc_logger.filters if isinstance(f, SamplingFilter)]:
+        rpc_logger.removeFilter(existing)
+    if sample_every > 1:
+        rpc_logger.addFilter(SamplingFilter(sample_every))
+
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Flushes queued records and stops the listener thread, if one is running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
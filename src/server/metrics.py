@@ -0,0 +1,274 @@
+import bisect
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("rfcontrol.metrics")
+
+# Latency buckets in seconds, from sub-millisecond applies to long polls.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+class _Metric:
+    """A metric family; labels(...) returns the child for one set of label values."""
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        """Yields (name suffix, label values, extra labels, value) for every child."""
+        for values, child in list(self._children.items()):
+            for suffix, extra, value in child.samples():
+                yield suffix, values, extra, value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for suffix, values, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, values, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        yield "_total", (), self._value
+
+class Counter(_Metric):
+    """A value that only goes up. The name is given without the _total suffix."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ("_function",)
+
+    def __init__(self):
+        super().__init__()
+        self._function = None
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def set_function(self, function):
+        """Reads the value from function() at every scrape instead."""
+        self._function = function
+
+    @property
+    def value(self):
+        return self._function() if self._function is not None else self._value
+
+    def samples(self):
+        yield "", (), self.value
+
+class Gauge(_Metric):
+    """A value that goes up and down."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        # Bucket counts are kept per bucket and summed up only when scraped
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for bound, count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += count
+            yield "_bucket", (("le", _format_value(bound)),), cumulative
+        yield "_sum", (), total
+        yield "_count", (), cumulative
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, with their sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class ServerMetrics:
+    """The metrics of one RF control server process.
+
+    Recording is a dict lookup and a short lock per sample, so it can stay
+    on under load. Queue depths are read only when scraped. RPCs are
+    recorded by interceptors.MetricsHook.
+    """
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        register = self.registry.register
+        self.rpc_started = register(Counter(
+            "rfcontrol_rpc_started", "RPCs received.", ["method"]
+        ))
+        self.rpc_handled = register(Counter(
+            "rfcontrol_rpc_handled", "RPCs completed, by status code.", ["method", "code"]
+        ))
+        self.rpc_duration = register(Histogram(
+            "rfcontrol_rpc_duration_seconds", "Time from receiving an RPC to completing it.",
+            ["method"],
+        ))
+        self.rpc_in_flight = register(Gauge(
+            "rfcontrol_rpc_in_flight", "RPCs being handled.", ["method"]
+        ))
+        self.streams_active = register(Gauge(
+            "rfcontrol_streams_active", "Open streaming RPCs.", ["method"]
+        ))
+        self.apply_duration = register(Histogram(
+            "rfcontrol_device_apply_seconds", "Time a device takes to apply one RFConfig.",
+        ))
+        # Unlabelled: a child per device_id would grow with every device ever seen
+        self._apply_duration = self.apply_duration.labels()
+        self.queue_depth = register(Gauge(
+            "rfcontrol_queue_depth", "Work waiting to run, by queue.", ["queue"]
+        ))
+
+    def track_executor(self, name: str, executor):
+        """Reports the backlog of a concurrent.futures.ThreadPoolExecutor as queue_depth."""
+        self.queue_depth.labels(name).set_function(executor._work_queue.qsize)
+
+    def track_length(self, name: str, pending):
+        """Reports len(pending) as queue_depth."""
+        self.queue_depth.labels(name).set_function(lambda: len(pending))
+
+    def observe_apply(self, seconds: float):
+        self._apply_duration.observe(seconds)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request from %s: " + format, self.address_string(), *args)
+
+class MetricsServer:
+    """Serves GET /metrics over HTTP from a background thread."""
+
+    def __init__(self, metrics: ServerMetrics, address: str, port: int):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+        self._httpd = ThreadingHTTPServer((address, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="rf-metrics", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        logger.info("Metrics served on http://%s:%d/metrics", *self._httpd.server_address[:2])
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,441 @@
+import grpc
+import os
+import time
+import zlib
+import shutil
+import signal
+import logging
+import tempfile
+import threading
+import contextvars
+import multiprocessing
+from concurrent import futures
+
+# Import generated classes
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+from server.admin import AdminServicer
+from server.config import ServerConfig
+from server.device_registry import DeviceRegistry
+from server.drivers import create_device_factory
+from server.fleet_index import FleetQuery, decode_page_token, merge_pages, page_size, projection
+from server.interceptors import DeadlineHook, InterceptorChain, TracingHook, propagated_metadata
+from server.log_pipeline import stop_logging
+from server.profiling import install_signal_handlers
+from server.server import (
+    DEFAULT_DEVICE_ID, RFControlServicer, add_servicer_to_server, create_journal, create_metrics,
+    create_server, setup_logging, start_metrics_server,
+)
+
+logger = logging.getLogger("rfcontrol.multiproc")
+
+# Upper bound for a forwarded call when the caller set no deadline. Forwarded
+# calls wait for the owning worker to come back if it is being restarted.
+FORWARD_TIMEOUT = 30.0
+
+def shard_for(device_id: str, num_workers: int) -> int:
+    """Returns the index of the worker that owns device_id.
+
+    Uses CRC-32 rather than hash(), which is randomized per process, so that
+    every worker agrees on the owner.
+    """
+    return zlib.crc32((device_id or DEFAULT_DEVICE_ID).encode("utf-8")) % num_workers
+
+class ShardedRFControlServicer(RFControlServicer):
+    """RFControlServicer for one worker of a multi-process server.
+
+    SO_REUSEPORT balances connections, not devices, so any worker can receive
+    a request for any device. Each device is owned by exactly one worker
+    (see shard_for); requests for devices owned elsewhere are forwarded to
+    the owner over its private socket, so only one process ever drives a
+    given radio.
+    """
+
+    def __init__(self, worker_index: int, peer_addresses, **kwargs):
+        super().__init__(**kwargs)
+        self.worker_index = worker_index
+        self._peer_addresses = list(peer_addresses)
+        self._peer_stubs = {}
+        self._peer_channels = []
+        self._peers_lock = threading.Lock()
+        # Separate from the batch pool: the local share of a split batch
+        # submits work to that pool and waits on it
+        self._forward_executor = futures.ThreadPoolExecutor(
+            max_workers=len(self._peer_addresses), thread_name_prefix="rf-forward"
+        )
+
+    def close(self):
+        self._forward_executor.shutdown(wait=True)
+        for channel in self._peer_channels:
+            channel.close()
+        super().close()
+
+    def owner_of(self, device_id: str) -> int:
+        return shard_for(device_id, len(self._peer_addresses))
+
+    def _peer(self, index: int):
+        """Returns a stub for worker index, creating its channel on first use."""
+        stub = self._peer_stubs.get(index)
+        if stub is None:
+            with self._peers_lock:
+                stub = self._peer_stubs.get(index)
+                if stub is None:
+                    channel = grpc.insecure_channel(self._peer_addresses[index])
+                    self._peer_channels.append(channel)
+                    stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+                    self._peer_stubs[index] = stub
+        return stub
+
+    @staticmethod
+    def _timeout(context, configs=()):
+        """The timeout of a forwarded call: the caller's deadline, capped at FORWARD_TIMEOUT.
+
+        The owner holds a call with timed configs open until the last
+        execute_at, so their lead time is added to the cap.
+        """
+        now = time.time()
+        lead = max(
+            (config.execute_at.ToNanoseconds() / 1e9 - now for config in configs
+             if config.HasField("execute_at")),
+            default=0.0,
+        )
+        cap = FORWARD_TIMEOUT + max(lead, 0.0)
+        remaining = context.time_remaining() if context is not None else None
+        return cap if remaining is None else min(remaining, cap)
+
+    def _forward(self, owner, method, request, context, configs=()):
+        """Calls method on the owning worker, relaying any error status to the caller."""
+        try:
+            return getattr(self._peer(owner), method)(
+                request, timeout=self._timeout(context, configs), wait_for_ready=True,
+                metadata=propagated_metadata(),
+            )
+        except grpc.RpcError as e:
+            context.abort(e.code(), e.details())
+
+    def _apply_to_device(self, device_id, config):
+        owner = self.owner_of(device_id)
+        if owner == self.worker_index:
+            return super()._apply_to_device(device_id, config)
+        try:
+            response = self._peer(owner).SetRFSettings(
+                config, timeout=FORWARD_TIMEOUT, wait_for_ready=True,
+                metadata=propagated_metadata(),
+            )
+            return response.success, response.device_status
+        except grpc.RpcError as e:
+            return False, f"ERROR - {e.code().name}: {e.details()}"
+
+    def _apply_at(self, device_id, config):
+        owner = self.owner_of(device_id)
+        if owner == self.worker_index:
+            return super()._apply_at(device_id, config)
+        # The owner schedules it, so forwarding does not add to the error.
+        # No timeout: the call returns only at execute_at
+        try:
+            response = self._peer(owner).SetRFSettings(
+                config, wait_for_ready=True, metadata=propagated_metadata()
+            )
+            return response.success, response.device_status, response.apply_error_us
+        except grpc.RpcError as e:
+            return False, f"ERROR - {e.code().name}: {e.details()}", 0.0
+
+    def SetRFSettings(self, request, context):
+        owner = self.owner_of(request.device_id)
+        if owner == self.worker_index:
+            return super().SetRFSettings(request, context)
+        return self._forward(owner, "SetRFSettings", request, context, [request])
+
+    def GetDeviceStatus(self, request, context):
+        owner = self.owner_of(request.device_id)
+        if owner == self.worker_index:
+            return super().GetDeviceStatus(request, context)
+        return self._forward(owner, "GetDeviceStatus", request, context)
+
+    def _apply_shard_batch(self, owner, items, context):
+        """Applies (index, config) pairs owned by one worker as a sub-batch."""
+        batch = rfcontrol_pb2.RFConfigBatch(configs=[config for _, config in items])
+        try:
+            if owner == self.worker_index:
+                response = super().SetRFSettingsBatch(batch, context)
+            else:
+                response = self._peer(owner).SetRFSettingsBatch(
+                    batch, timeout=self._timeout(context, batch.configs), wait_for_ready=True,
+                    metadata=propagated_metadata(),
+                )
+            results = response.results
+        except grpc.RpcError as e:
+            failure = rfcontrol_pb2.RFResponse(
+                success=False, device_status=f"ERROR - {e.code().name}: {e.details()}"
+            )
+            results = [failure] * len(items)
+        return [(index, result) for (index, _), result in zip(items, results)]
+
+    def SetRFSettingsBatch(self, request, context):
+        by_owner = {}
+        for index, config in enumerate(request.configs):
+            by_owner.setdefault(self.owner_of(config.device_id), []).append((index, config))
+        if set(by_owner) <= {self.worker_index}:
+            return super().SetRFSettingsBatch(request, context)
+
+        results = [None] * len(request.configs)
+        pending = [
+            # Run in a copy of this context, so sub-batches carry the request ID
+            self._forward_executor.submit(
+                contextvars.copy_context().run, self._apply_shard_batch, owner, items, context
+            )
+            for owner, items in by_owner.items()
+        ]
+        for future in pending:
+            for index, response in future.result():
+                results[index] = response
+        return rfcontrol_pb2.RFBatchResponse(results=results)
+
+    def _forward_stream(self, owner, method, request, context):
+        """Relays a server-streaming call from the owning worker until either side ends it."""
+        call = getattr(self._peer(owner), method)(
+            request, wait_for_ready=True, metadata=propagated_metadata()
+        )
+        context.add_callback(call.cancel)
+        try:
+            yield from call
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                context.abort(e.code(), e.details())
+
+    def WatchDeviceStatus(self, request, context):
+        owner = self.owner_of(request.device_id)
+        if owner == self.worker_index:
+            return super().WatchDeviceStatus(request, context)
+        return self._forward_stream(owner, "WatchDeviceStatus", request, context)
+
+    def Sweep(self, request, context):
+        owner = self.owner_of(request.device_id)
+        if owner == self.worker_index:
+            return super().Sweep(request, context)
+        return self._forward_stream(owner, "Sweep", request, context)
+
+    def _list_shard(self, owner, request, context):
+        if owner == self.worker_index:
+            return self.registry.index.list_devices(request)
+        return self._peer(owner).ListDevices(
+            request, timeout=self._timeout(context), wait_for_ready=True,
+            metadata=propagated_metadata(),
+        )
+
+    def ListDevices(self, request, context):
+        """Asks every worker for a page of its own devices and merges them.
+
+        Each worker sees only the devices it owns, and their order is
+        shared by all workers, so the pages merge like sorted runs.
+        """
+        try:
+            query = FleetQuery.from_request(request)
+            cleared = projection(request)
+            if request.page_token:
+                decode_page_token(request.page_token, query.order)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        # Projected only once merged, which needs the fields the order is by
+        shard_request = rfcontrol_pb2.ListDevicesRequest()
+        shard_request.CopyFrom(request)
+        shard_request.ClearField("fields")
+        pending = [
+            self._forward_executor.submit(
+                contextvars.copy_context().run, self._list_shard, owner, shard_request, context
+            )
+            for owner in range(len(self._peer_addresses))
+        ]
+        try:
+            pages = [future.result() for future in pending]
+        except grpc.RpcError as e:
+            context.abort(e.code(), e.details())
+        return merge_pages(query.order, pages, page_size(request), cleared)
+
+class _LocalServicer:
+    """The unsharded RFControl handlers of a worker, for its peer socket.
+
+    Other workers only send a worker calls for devices it owns, and
+    ListDevices calls for its own share of the fleet, so these handlers
+    never forward anything themselves.
+    """
+
+    def __init__(self, servicer: ShardedRFControlServicer):
+        self._servicer = servicer
+
+    def __getattr__(self, name):
+        return getattr(RFControlServicer, name).__get__(self._servicer)
+
+def create_peer_server(config: ServerConfig, servicer: ShardedRFControlServicer, address: str) -> grpc.Server:
+    """Builds the server for calls forwarded by the other workers, on the private address.
+
+    It has its own thread pool. With one pool shared with client calls,
+    two workers whose threads were all forwarding to each other would
+    have no thread left to serve the forwarded calls, and would stall
+    until FORWARD_TIMEOUT.
+    """
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=config.max_workers, thread_name_prefix="rf-peer"),
+        interceptors=[InterceptorChain([TracingHook(), DeadlineHook()])],
+        options=config.grpc_options(),
+    )
+    add_servicer_to_server(_LocalServicer(servicer), server)
+    socket_path = address[len("unix:"):]
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server.add_insecure_port(address)
+    return server
+
+def _run_worker(index: int, config: ServerConfig, peer_addresses):
+    """Entry point of a worker process: serves until SIGTERM, then drains."""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    # Ctrl+C reaches the whole process group; let the supervisor coordinate
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    install_signal_handlers(config.profile_seconds, config.profile_dir)
+    # The parent's log listener thread does not survive the fork
+    setup_logging(config)
+
+    metrics = create_metrics(config)
+    server = create_server(config, extra_options=[("grpc.so_reuseport", 1)], metrics=metrics)
+    servicer = ShardedRFControlServicer(
+        index,
+        peer_addresses,
+        registry=DeviceRegistry(
+            create_device_factory(config), idle_timeout=config.idle_timeout,
+            journal=create_journal(config, index),
+        ),
+        batch_workers=config.batch_workers,
+        coalesce_writes=config.coalesce_writes,
+        schedule_workers=config.schedule_workers,
+        metrics=metrics,
+    )
+    servicer.registry.restore(config.restore_reapply, config.batch_workers)
+    servicer.registry.start_reaper()
+    add_servicer_to_server(servicer, server)
+    if config.admin:
+        # Profiles whichever worker the admin client's connection lands on
+        rfcontrol_pb2_grpc.add_AdminServicer_to_server(AdminServicer(config.profile_dir), server)
+    server.add_insecure_port(config.address)
+    # Private socket for requests forwarded by the other workers
+    peer_server = create_peer_server(config, servicer, peer_addresses[index])
+
+    peer_server.start()
+    server.start()
+    logger.info("Worker %d (pid %d) serving on %s.", index, os.getpid(), config.address)
+    # Each worker has its own metrics, on the next port up
+    metrics_server = start_metrics_server(config, metrics, port_offset=index)
+    stop.wait()
+    logger.info("Worker %d draining...", index)
+    server.stop(config.grace).wait()
+    # Only now, since draining calls may still be forwarding to the other workers
+    peer_server.stop(config.grace).wait()
+    if metrics_server is not None:
+        metrics_server.stop()
+    servicer.close()
+    logger.info("Worker %d stopped.", index)
+    stop_logging()
+
+class WorkerSupervisor:
+    """Starts, watches and restarts the worker processes of a multi-process server.
+
+    SIGTERM/SIGINT drain and stop all workers. SIGHUP restarts them one at a
+    time, so the port keeps accepting connections throughout. A worker that
+    exits unexpectedly is restarted with the same index, keeping its shard.
+    """
+
+    def __init__(self, config: ServerConfig):
+        self.config = config
+        self.num_workers = config.workers
+        self.address = config.address
+        self.grace = config.grace
+        self._socket_dir = tempfile.mkdtemp(prefix="rfcontrol-")
+        self.peer_addresses = [
+            f"unix:{os.path.join(self._socket_dir, f'worker-{i}.sock')}"
+            for i in range(self.num_workers)
+        ]
+        self._processes = [None] * self.num_workers
+        self._stopping = False
+        self._restart_requested = False
+
+    def _start_worker(self, index: int):
+        process = multiprocessing.Process(
+            target=_run_worker,
+            args=(index, self.config, self.peer_addresses),
+            name=f"rf-worker-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _stop_worker(self, index: int):
+        process = self._processes[index]
+        if process is None or not process.is_alive():
+            return
+        process.terminate()
+        process.join(self.grace + 5.0)
+        if process.is_alive():
+            logger.warning("Worker %d did not drain in time; killing it.", index)
+            process.kill()
+            process.join()
+
+    def rolling_restart(self):
+        """Drains and replaces workers one by one."""
+        logger.info("Rolling restart of workers...")
+        for index in range(self.num_workers):
+            self._stop_worker(index)
+            self._start_worker(index)
+        logger.info("Rolling restart complete.")
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _request_restart(self, signum, frame):
+        self._restart_requested = True
+
+    def _forward_signal(self, signum, frame):
+        # Diagnostics are per process; pass them on to every worker
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    def run(self):
+        """Runs the workers until SIGTERM or SIGINT."""
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._request_restart)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._forward_signal)
+            signal.signal(signal.SIGUSR2, self._forward_signal)
+
+        for index in range(self.num_workers):
+            self._start_worker(index)
+        logger.info("Started %d workers on %s.", self.num_workers, self.address)
+
+        try:
+            while not self._stopping:
+                time.sleep(0.5)
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self.rolling_restart()
+                for index, process in enumerate(self._processes):
+                    if not self._stopping and not process.is_alive():
+                        logger.warning(
+                            "Worker %d exited with code %s; restarting.", index, process.exitcode
+                        )
+                        self._start_worker(index)
+        finally:
+            logger.info("Stopping workers...")
+            # Signal every worker first so they all drain in parallel
+            for process in self._processes:
+                if process is not None and process.is_alive():
+                    process.terminate()
+            for index in range(self.num_workers):
+                self._stop_worker(index)
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            logger.info("All workers stopped.")
+
+def serve_multiprocess(config: ServerConfig):
+    """Serves on config.address from config.workers processes sharing the port via SO_REUSEPORT."""
+    WorkerSupervisor(config).run()
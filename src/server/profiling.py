@@ -0,0 +1,264 @@
+import cProfile
+import collections
+import faulthandler
+import io
+import logging
+import marshal
+import os
+import pstats
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from server.interceptors import ServerHook
+
+logger = logging.getLogger("rfcontrol.profiling")
+
+# Longest profiling session one request may ask for, in seconds.
+MAX_PROFILE_SECONDS = 300.0
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+
+# Pool threads are named like "rf-rpc_3"; samples are grouped per pool.
+_POOL_SUFFIX = re.compile(r"_\d+$")
+
+def _frame_label(code) -> str:
+    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ';' separates frames in the collapsed format
+    return label.replace(";", ":")
+
+class StackSampler:
+    """Samples the stacks of all other threads every interval seconds.
+
+    Counts are kept per collapsed stack: the thread's pool name followed by
+    its frames, outermost first, separated by ';'. Only threads whose name
+    starts with thread_prefix are sampled.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, thread_prefix: str = ""):
+        self.interval = interval
+        self.thread_prefix = thread_prefix
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rf-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        labels = {}
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == me or not name.startswith(self.thread_prefix):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(_POOL_SUFFIX.sub("", name).replace(";", ":"))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+    def summary(self, top: int = 15) -> str:
+        """Lists the functions most often on top of a stack."""
+        leaves = collections.Counter()
+        for stack, count in self.counts.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        lines = [f"{self.samples} samples, {sum(self.counts.values())} thread stacks"]
+        lines.extend(
+            f"{100.0 * count / total:6.2f}%  {leaf}" for leaf, count in leaves.most_common(top)
+        )
+        return "\n".join(lines)
+
+class ProfileOutput:
+    """A finished profile: format, file contents and a summary."""
+
+    def __init__(self, fmt: str, data: bytes, summary: str, samples: int):
+        self.format = fmt
+        self.data = data
+        self.summary = summary
+        self.samples = samples
+        self.path = ""
+
+    def save(self, directory: str) -> str:
+        extension = "collapsed" if self.format == "collapsed" else "pstats"
+        name = f"rfcontrol-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.{extension}"
+        self.path = os.path.join(directory, name)
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        return self.path
+
+class _CProfileSession:
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def finish(self) -> ProfileOutput:
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        if not profiles:
+            return ProfileOutput("pstats", b"", "No calls were profiled.", 0)
+        stream = io.StringIO()
+        stats = pstats.Stats(profiles[0], stream=stream)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.sort_stats("cumulative").print_stats(25)
+        return ProfileOutput("pstats", marshal.dumps(stats.stats), stream.getvalue(), len(profiles))
+
+class _SampleSession:
+    def __init__(self, interval: float, thread_prefix: str):
+        self._sampler = StackSampler(interval, thread_prefix)
+        self._sampler.start()
+
+    def finish(self) -> ProfileOutput:
+        self._sampler.stop()
+        sampler = self._sampler
+        return ProfileOutput(
+            "collapsed", sampler.collapsed().encode(), sampler.summary(), sampler.samples
+        )
+
+class Profiler:
+    """Runs at most one profiling session at a time in this process.
+
+    A SAMPLE session samples every thread from a background thread. A
+    CPROFILE session collects one cProfile.Profile per call from
+    ProfilingHook, plus any added directly with add().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+
+    def begin(self, mode: str = SAMPLE, interval: float = DEFAULT_SAMPLE_INTERVAL, thread_prefix: str = ""):
+        """Starts a session; raises RuntimeError if one is already running."""
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError("a profiling session is already running")
+            if mode == CPROFILE:
+                self._session = _CProfileSession()
+            else:
+                self._session = _SampleSession(interval, thread_prefix)
+
+    def end(self, output_dir: str = None) -> ProfileOutput:
+        """Ends the session and returns its profile, also saved to output_dir if given."""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is None:
+            raise RuntimeError("no profiling session is running")
+        output = session.finish()
+        if output_dir:
+            output.save(output_dir)
+            logger.info("Profile written to %s", output.path)
+        return output
+
+    def add(self, profile: cProfile.Profile):
+        """Adds a cProfile.Profile to a running CPROFILE session; otherwise drops it."""
+        session = self._session
+        if isinstance(session, _CProfileSession):
+            session.add(profile)
+
+    def cprofile_active(self) -> bool:
+        return isinstance(self._session, _CProfileSession)
+
+    def run(self, seconds: float, mode: str = SAMPLE, output_dir: str = None, **kwargs) -> ProfileOutput:
+        """Profiles for seconds (at most MAX_PROFILE_SECONDS) and returns the result."""
+        self.begin(mode, **kwargs)
+        try:
+            time.sleep(min(max(seconds, 0.0), MAX_PROFILE_SECONDS))
+        finally:
+            output = self.end(output_dir)
+        return output
+
+# One per process: profiling hooks and signals are process-wide.
+PROFILER = Profiler()
+
+class ProfilingHook(ServerHook):
+    """Profiles each call on its own thread while a CPROFILE session runs.
+
+    For the thread-pool server, where each call has a thread to itself.
+    When no session runs, this costs one check per call.
+    """
+
+    def __init__(self, profiler: Profiler = PROFILER):
+        self.profiler = profiler
+
+    def start(self, call):
+        if self.profiler.cprofile_active():
+            profile = cProfile.Profile()
+            call.state[self] = (threading.get_ident(), profile)
+            profile.enable()
+
+    def finish(self, call, code):
+        entry = call.state.pop(self, None)
+        if entry is None:
+            return
+        ident, profile = entry
+        # Only the thread that enabled a profile can disable it
+        if ident == threading.get_ident():
+            profile.disable()
+            self.profiler.add(profile)
+
+def dump_threads(thread_prefix: str = ""):
+    """Returns (thread, formatted stack) for every thread whose name starts with thread_prefix."""
+    frames = sys._current_frames()
+    dump = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        if frame is None or not thread.name.startswith(thread_prefix):
+            continue
+        dump.append((thread, "".join(traceback.format_stack(frame))))
+    return dump
+
+def install_signal_handlers(profile_seconds: float, output_dir: str = None):
+    """Makes SIGUSR1 dump all thread stacks to stderr and SIGUSR2 profile the process.
+
+    SIGUSR2 samples every thread for profile_seconds and writes a
+    collapsed-stack file to output_dir (the temp directory by default).
+    Must be called from the main thread. Does nothing on platforms without
+    these signals.
+    """
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    faulthandler.register(signal.SIGUSR1, all_threads=True)
+    directory = output_dir or tempfile.gettempdir()
+
+    def profile():
+        logger.info("SIGUSR2 received; profiling for %.0f s.", profile_seconds)
+        try:
+            output = PROFILER.run(profile_seconds, SAMPLE, directory)
+        except RuntimeError as e:
+            logger.warning("Cannot profile on SIGUSR2: %s", e)
+            return
+        logger.info("SIGUSR2 profile: %s\n%s", output.path, output.summary)
+
+    def on_signal(signum, frame):
+        threading.Thread(target=profile, name="rf-profile", daemon=True).start()
+
+    signal.signal(signal.SIGUSR2, on_signal)
@@ -1,71 +1,263 @@
+import math
+import time
+import asyncio
 import logging
+import itertools
+import threading
+from dataclasses import dataclass
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("rfcontrol.device")
 
-class SimulatedRFDevice:
-    """A simulated RF device for testing without hardware."""
+# Shared by all devices, so a generation is never reused, not even by a
+# device that is evicted and created again under the same id.
+_generations = itertools.count(1)
+
+@dataclass(frozen=True, eq=False)
+class DeviceSnapshot:
+    """Immutable copy of a device's state, replaced on every status change.
+
+    state is "DISCONNECTED", "IDLE" or "OPERATING" and status is the same
+    state as display text. Snapshots compare and hash by identity, so they
+    can key caches of anything derived from them.
+    """
+
+    state: str
+    frequency: float
+    gain: float
+    device_id: str
+    updated_at: float
+    generation: int
+    status: str
+
+class RFDevice:
+    """Base class of device drivers: state, status listeners and locking.
+
+    A driver talks to its hardware by overriding _open(), _close(),
+    _write() and _query_idn(); everything else is shared. Drivers whose
+    calls wait on I/O set blocking = True, so the aio server runs them on
+    an executor.
+    """
+
+    blocking = False
 
     def __init__(self):
         self._is_connected = False
         self._device_id = None
         self._frequency = 0.0
         self._gain = 0.0
-        self._status = "DISCONNECTED"
+        self._snapshot = DeviceSnapshot(
+            "DISCONNECTED", 0.0, 0.0, "", time.time(), next(_generations), "DISCONNECTED"
+        )
+        self._listeners = []
+        # Guards settings and status, so readers never see a half-applied config
+        self._lock = threading.RLock()
+
+    def _open(self, device_id: str) -> bool:
+        """Opens the connection to the hardware; returns False on failure."""
+        return True
+
+    def _close(self):
+        """Closes the connection opened by _open()."""
+
+    def _write(self, freq: float, gain: float) -> bool:
+        """Sends validated settings to the hardware; returns False if it refused them.
+
+        Called under the device lock before the new values are stored, so
+        self._frequency and self._gain still hold the previous settings.
+        """
+        return True
+
+    def _query_idn(self) -> str:
+        """Asks the hardware to identify itself; drivers that can should override this."""
+        return f"RF Device, s/n:{self._device_id}"
+
+    def add_listener(self, callback):
+        """Registers callback(status) to be called whenever the status changes.
+
+        Callbacks run on the thread that changed the device, so they must
+        return quickly and must not call back into the device.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Unregisters a callback added with add_listener."""
+        self._listeners.remove(callback)
+
+    def _set_status(self, status: str, state: str):
+        """Updates the status and notifies listeners if it actually changed."""
+        if status == self._snapshot.status:
+            return
+        self._snapshot = DeviceSnapshot(
+            state, self._frequency, self._gain, self._device_id or "",
+            time.time(), next(_generations), status,
+        )
+        for callback in list(self._listeners):
+            callback(status)
 
     def connect(self, device_id: str) -> bool:
-        """Simulates connecting to the device."""
-        if self._is_connected:
-            logging.warning(f"Device already connected to {self._device_id}.")
+        """Connects to the device."""
+        with self._lock:
+            if self._is_connected:
+                logger.warning("Device already connected to %s.", self._device_id)
+                return True
+
+            logger.info("Connecting to device '%s'...", device_id)
+            self._device_id = device_id
+            if not self._open(device_id):
+                self._device_id = None
+                logger.error("Could not connect to device '%s'.", device_id)
+                return False
+            self._is_connected = True
+            self._set_status("CONNECTED - IDLE", "IDLE")
+            logger.info("Successfully connected to %s.", self._device_id)
             return True
-        
-        logging.info(f"Connecting to device '{device_id}'...")
-        self._device_id = device_id
-        self._is_connected = True
-        self._status = "CONNECTED - IDLE"
-        logging.info(f"Successfully connected to {self._device_id}.")
-        return True
 
     def disconnect(self):
-        """Simulates disconnecting from the device."""
-        if not self._is_connected:
-            logging.warning("No device connected.")
-            return
-        
-        logging.info(f"Disconnecting from {self._device_id}...")
-        self._is_connected = False
-        self._device_id = None
-        self._status = "DISCONNECTED"
-        logging.info("Device disconnected.")
+        """Disconnects from the device."""
+        with self._lock:
+            if not self._is_connected:
+                logger.warning("No device connected.")
+                return
+
+            logger.info("Disconnecting from %s...", self._device_id)
+            try:
+                self._close()
+            finally:
+                self._is_connected = False
+                self._device_id = None
+                self._set_status("DISCONNECTED", "DISCONNECTED")
+            logger.info("Device disconnected.")
 
     def set_frequency(self, freq: float) -> bool:
-        """Simulates setting the RF frequency."""
-        if not self._is_connected:
-            logging.error("Cannot set frequency: No device connected.")
-            return False
-        
-        logging.info(f"Setting frequency to {freq} MHz.")
-        self._frequency = freq
-        self._status = f"OPERATING - Freq: {self._frequency}MHz, Gain: {self._gain}dB"
-        return True
+        """Sets the RF frequency."""
+        return self._apply_values(freq=freq)
 
     def set_gain(self, gain: float) -> bool:
-        """Simulates setting the RF gain."""
-        if not self._is_connected:
-            logging.error("Cannot set gain: No device connected.")
-            return False
-        
-        logging.info(f"Setting gain to {gain} dB.")
-        self._gain = gain
-        self._status = f"OPERATING - Freq: {self._frequency}MHz, Gain: {self._gain}dB"
-        return True
+        """Sets the RF gain."""
+        return self._apply_values(gain=gain)
+
+    def apply(self, config) -> bool:
+        """Applies config.frequency and config.gain as one operation.
+
+        Both values are validated first and then applied together under the
+        device lock, with a single status update, so no other thread or
+        status listener ever sees the new frequency with the old gain.
+        Nothing is changed if either value is invalid.
+        """
+        return self._apply_values(config.frequency, config.gain)
+
+    def _apply_values(self, freq: float = None, gain: float = None) -> bool:
+        """Applies the given values (None keeps the current one) under the lock."""
+        with self._lock:
+            freq = self._frequency if freq is None else freq
+            gain = self._gain if gain is None else gain
+            if not self._is_connected:
+                logger.error("Cannot apply settings: No device connected.")
+                return False
+            error = self._validate(freq, gain)
+            if error:
+                logger.error("Rejected settings: %s", error)
+                return False
+
+            # Per-call detail: the RPC record already carries the settings
+            logger.debug("Applying frequency %s MHz, gain %s dB.", freq, gain)
+            if not self._write(freq, gain):
+                return False
+            self._frequency = freq
+            self._gain = gain
+            self._set_status(
+                f"OPERATING - Freq: {self._frequency}MHz, Gain: {self._gain}dB", "OPERATING"
+            )
+            return True
+
+    @staticmethod
+    def _validate(freq: float, gain: float):
+        """Returns why the settings cannot be applied, or None if they can."""
+        if not math.isfinite(freq) or freq < 0:
+            return f"invalid frequency {freq} MHz"
+        if not math.isfinite(gain):
+            return f"invalid gain {gain} dB"
+        return None
 
     def get_idn(self) -> str:
-        """Simulates the *IDN? query."""
+        """Returns the device's answer to the *IDN? query."""
         if not self._is_connected:
             return "No device connected."
+        return self._query_idn()
+
+    @property
+    def status(self) -> str:
+        """Returns the current device status."""
+        return self._snapshot.status
+
+    def snapshot(self) -> DeviceSnapshot:
+        """Returns the current state; the same object until the status changes."""
+        return self._snapshot
+
+
+class SimulatedRFDevice(RFDevice):
+    """A simulated RF device for testing without hardware."""
+
+    def _query_idn(self) -> str:
         return f"Simulated RF Device, s/n:{self._device_id}, fw:1.0"
 
+
+class AsyncRFDevice:
+    """Async facade over a device, used by the grpc.aio server.
+
+    Device methods that are already coroutines are awaited directly. Plain
+    methods are called inline, which suits in-memory devices such as
+    SimulatedRFDevice. For drivers that block on I/O, pass blocking=True
+    so the calls run on an executor and never stall the event loop.
+    """
+
+    def __init__(self, device, blocking: bool = False, executor=None):
+        self._device = device
+        self._blocking = blocking
+        self._executor = executor
+
+    @property
+    def device(self):
+        """The wrapped device."""
+        return self._device
+
+    async def _call(self, name, *args):
+        method = getattr(self._device, name)
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args)
+        if not self._blocking:
+            return method(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, method, *args)
+
+    async def connect(self, device_id: str) -> bool:
+        return await self._call("connect", device_id)
+
+    async def disconnect(self):
+        return await self._call("disconnect")
+
+    async def set_frequency(self, freq: float) -> bool:
+        return await self._call("set_frequency", freq)
+
+    async def set_gain(self, gain: float) -> bool:
+        return await self._call("set_gain", gain)
+
+    async def apply(self, config) -> bool:
+        return await self._call("apply", config)
+
+    async def get_idn(self) -> str:
+        return await self._call("get_idn")
+
+    def add_listener(self, callback):
+        self._device.add_listener(callback)
+
+    def remove_listener(self, callback):
+        self._device.remove_listener(callback)
+
     @property
     def status(self) -> str:
         """Returns the current device status."""
-        return self._status
+        return self._device.status
+
+    def snapshot(self):
+        return self._device.snapshot()
@@ -0,0 +1,109 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent import futures
+
+from server.timing import SPIN_THRESHOLD
+
+# Furthest in the future an RFConfig.execute_at may be.
+MAX_SCHEDULE_AHEAD = 3600.0
+
+def deadline_for(timestamp) -> float:
+    """Converts a wall-clock protobuf Timestamp to a time.perf_counter() deadline.
+
+    Raises ValueError if it is more than MAX_SCHEDULE_AHEAD seconds away.
+    Times in the past are allowed; they are due immediately.
+    """
+    ahead = timestamp.ToNanoseconds() / 1e9 - time.time()
+    if ahead > MAX_SCHEDULE_AHEAD:
+        raise ValueError(f"execute_at is {ahead:.0f} s ahead; the limit is {MAX_SCHEDULE_AHEAD:.0f} s")
+    return time.perf_counter() + ahead
+
+class ApplyScheduler:
+    """Runs callables at time.perf_counter() deadlines.
+
+    Pending jobs sit in a heap, so scheduling and dispatching cost
+    O(log n) however many are waiting. One dispatcher thread sleeps until
+    shortly before the earliest deadline and spins for the rest. At the
+    deadline it hands the job to executor, so that jobs due together run in
+    parallel and a job that blocks does not hold up the others. Without an
+    executor, jobs run on the dispatcher thread and must return quickly.
+
+    schedule() returns a concurrent.futures.Future for the job's result;
+    cancelling it before the deadline drops the job.
+    """
+
+    def __init__(self, executor=None, spin: float = SPIN_THRESHOLD):
+        self._executor = executor
+        self._spin = spin
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def __len__(self):
+        """Number of jobs not yet dispatched, including cancelled ones."""
+        return len(self._heap)
+
+    def schedule(self, deadline: float, fn) -> futures.Future:
+        future = futures.Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            entry = (deadline, next(self._sequence), fn, future)
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._dispatch_loop, name="rf-scheduler", daemon=True
+                )
+                self._thread.start()
+        return future
+
+    def close(self):
+        """Stops the dispatcher and cancels every job that has not run yet."""
+        with self._cond:
+            self._closed = True
+            pending, self._heap = self._heap, []
+            self._cond.notify()
+        for _, _, _, future in pending:
+            future.cancel()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._heap:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                deadline = self._heap[0][0]
+                remaining = deadline - time.perf_counter()
+                if remaining > self._spin:
+                    # Woken early by an earlier job or by close; look again
+                    self._cond.wait(remaining - self._spin)
+                    continue
+            # Spin outside the lock so new jobs can still be scheduled
+            while time.perf_counter() < deadline:
+                time.sleep(0)
+            with self._cond:
+                if not self._heap or self._heap[0][0] > time.perf_counter():
+                    continue
+                _, _, fn, future = heapq.heappop(self._heap)
+            if not future.set_running_or_notify_cancel():
+                continue
+            if self._executor is not None:
+                self._executor.submit(self._run, fn, future)
+            else:
+                self._run(fn, future)
+
+    @staticmethod
+    def _run(fn, future):
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
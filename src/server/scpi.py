@@ -0,0 +1,229 @@
+import collections
+import logging
+import socket
+import threading
+from concurrent import futures
+
+from server.rf_device import RFDevice
+
+logger = logging.getLogger("rfcontrol.scpi")
+
+# Bytes asked for per recv(); replies that arrive together are split at once.
+_RECV_SIZE = 65536
+
+def parse_address(address: str):
+    """Splits "host:port" into (host, port)."""
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+class ScpiConnection:
+    """One persistent SCPI session over TCP, shared by many threads.
+
+    Requests are pipelined: request() sends without waiting for earlier
+    replies, and messages queued while another thread is sending go out
+    together in one write. A reader thread reads replies in bulk and hands
+    them out in order. If the connection breaks, every waiting request
+    fails with ConnectionError.
+    """
+
+    def __init__(self, host: str, port: int, instrument: str = None, timeout: float = 2.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.settimeout(None)
+        self._lock = threading.Lock()
+        # Futures waiting for replies, in the order their messages were queued
+        self._pending = collections.deque()
+        self._outbox = []
+        self._sending = False
+        self.closed = False
+        self._reader = threading.Thread(target=self._read, name="rf-scpi-reader", daemon=True)
+        self._reader.start()
+        if instrument is not None:
+            self.request(f'INST:SEL "{instrument}"', replies=0)
+
+    def __len__(self):
+        """The number of requests waiting for a reply."""
+        return len(self._pending)
+
+    def request(self, message: str, replies: int = 1) -> futures.Future:
+        """Queues message; the future's result is the list of its reply lines."""
+        future = futures.Future()
+        with self._lock:
+            if self.closed:
+                raise ConnectionError("SCPI connection is closed")
+            self._outbox.append(message.encode("ascii") + b"\n")
+            if replies:
+                self._pending.append((future, replies, []))
+        if not replies:
+            future.set_result([])
+        self._send()
+        return future
+
+    def _send(self):
+        """Writes queued messages; the thread already sending picks up later ones."""
+        while True:
+            with self._lock:
+                if self._sending or not self._outbox or self.closed:
+                    return
+                self._sending = True
+                data = b"".join(self._outbox)
+                self._outbox.clear()
+            try:
+                self._sock.sendall(data)
+            except OSError as e:
+                self._fail(e)
+            finally:
+                with self._lock:
+                    self._sending = False
+
+    def _read(self):
+        buffer = b""
+        try:
+            while True:
+                chunk = self._sock.recv(_RECV_SIZE)
+                if not chunk:
+                    raise ConnectionError("instrument closed the connection")
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    self._deliver(line.decode("ascii", "replace").rstrip("\r"))
+        except Exception as e:
+            self._fail(e)
+
+    def _deliver(self, line: str):
+        with self._lock:
+            if not self._pending:
+                logger.warning("Unexpected reply from instrument: %r", line)
+                return
+            future, expected, lines = self._pending[0]
+            lines.append(line)
+            if len(lines) < expected:
+                return
+            self._pending.popleft()
+        future.set_result(lines)
+
+    def _fail(self, error: Exception):
+        """Marks the connection closed and fails every waiting request."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            pending, self._pending = self._pending, collections.deque()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        for future, _, _ in pending:
+            future.set_exception(ConnectionError(f"SCPI connection lost: {error}"))
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._fail(ConnectionError("closed"))
+
+class ScpiPool:
+    """Up to size persistent connections to one instrument.
+
+    Each request goes to the connection with the fewest replies
+    outstanding; a new connection is opened only when all are busy.
+    Broken connections are dropped and replaced on the next request.
+    """
+
+    def __init__(self, address: str, instrument: str = None, size: int = 2, timeout: float = 2.0):
+        self.host, self.port = parse_address(address)
+        self.instrument = instrument
+        self.size = size
+        self.timeout = timeout
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> ScpiConnection:
+        with self._lock:
+            self._connections = [c for c in self._connections if not c.closed]
+            idle = min(self._connections, key=len, default=None)
+            if idle is not None and (len(idle) == 0 or len(self._connections) >= self.size):
+                return idle
+            connection = ScpiConnection(self.host, self.port, self.instrument, self.timeout)
+            self._connections.append(connection)
+            return connection
+
+    def query(self, message: str, replies: int = 1):
+        """Sends message and returns its reply lines.
+
+        Raises ConnectionError or TimeoutError. A connection that timed out
+        is closed, since its next reply might be the late one.
+        """
+        connection = self._connection()
+        future = connection.request(message, replies)
+        try:
+            return future.result(self.timeout)
+        except futures.TimeoutError:
+            connection.close()
+            raise TimeoutError(f"no reply to {message!r} within {self.timeout} s") from None
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+# SYST:ERR? reply when the instrument has no error queued
+_NO_ERROR = "0,"
+
+class ScpiRFDevice(RFDevice):
+    """Driver for instruments speaking SCPI over raw TCP (port 5025).
+
+    Selects the instrument named by device_id with INST:SEL on each of
+    its pooled connections, as server/emulator.py expects. Frequency is
+    sent in MHz and gain as POW in dB; every write is checked with
+    SYST:ERR? in the same round trip.
+    """
+
+    blocking = True
+
+    def __init__(self, address: str, connections: int = 2, timeout: float = 2.0):
+        super().__init__()
+        self.address = address
+        self.connections = connections
+        self.timeout = timeout
+        self._pool = None
+
+    def _open(self, device_id: str) -> bool:
+        pool = ScpiPool(self.address, device_id, self.connections, self.timeout)
+        try:
+            pool.query("*IDN?")
+        except (OSError, TimeoutError) as e:
+            logger.error("Cannot reach instrument %s at %s: %s", device_id, self.address, e)
+            pool.close()
+            return False
+        self._pool = pool
+        return True
+
+    def _close(self):
+        self._pool.close()
+        self._pool = None
+
+    def _write(self, freq: float, gain: float) -> bool:
+        commands = []
+        if freq != self._frequency:
+            commands.append(f"FREQ {freq!r}")
+        if gain != self._gain:
+            commands.append(f"POW {gain!r}")
+        commands.append("SYST:ERR?")
+        try:
+            error = self._pool.query(";".join(commands))[0]
+        except (OSError, TimeoutError) as e:
+            logger.error("Instrument %s did not apply settings: %s", self._device_id, e)
+            return False
+        if not error.startswith(_NO_ERROR):
+            logger.error("Instrument %s reported %s", self._device_id, error)
+            return False
+        return True
+
+    def _query_idn(self) -> str:
+        try:
+            return self._pool.query("*IDN?")[0]
+        except (OSError, TimeoutError) as e:
+            return f"ERROR - {e}"
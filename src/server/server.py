@@ -1,72 +1,628 @@
 import grpc
-import time
+import os
+import asyncio
 import logging
+import time
+import queue
+import signal
+import threading
 from concurrent import futures
 
 # Import generated classes
 import rfcontrol_pb2
 import rfcontrol_pb2_grpc
 
-from server.rf_device import SimulatedRFDevice
+from server.coalescing import CoalescingWriter
+from server.config import ServerConfig, load_config
+from server.device_registry import DeviceRegistry
+from server.drivers import create_device_factory
+from server.admin import AdminServicer
+from server.log_pipeline import RPC_LOGGER, configure_logging, parse_levels
+from server.interceptors import (
+    DeadlineHook, InterceptorChain, LoadShedHook, MetricsHook, TimingHook, TracingHook,
+)
+from server.metrics import MetricsServer, ServerMetrics
+from server.profiling import ProfilingHook, install_signal_handlers
+from server.scheduler import ApplyScheduler, deadline_for
+from server.state_journal import StateJournal
+from server.status_cache import NOT_MODIFIED, StatusResponseCache, serialize_response
+from server.sweep import run_sweep, sweep_frequencies
+
+logger = logging.getLogger("rfcontrol.server")
+# Per-request records; sampled with --log-sample-every
+rpc_logger = logging.getLogger(RPC_LOGGER)
+
+# Device used when a request does not name one.
+DEFAULT_DEVICE_ID = "DEV001"
+
+# How often an idle watch stream re-checks whether its client is still there.
+WATCH_POLL_INTERVAL = 1.0
 
-logging.basicConfig(level=logging.INFO)
+# Longest a conditional GetDeviceStatus waits for a change, whatever wait_ms
+# asks for. Each waiting call holds a server thread in the thread-pool server.
+MAX_STATUS_WAIT = 60.0
+
+def status_wait(request, context) -> float:
+    """Returns how long a conditional GetDeviceStatus may wait, in seconds."""
+    wait = min(request.wait_ms / 1000.0, MAX_STATUS_WAIT)
+    remaining = context.time_remaining() if context is not None else None
+    if remaining is not None:
+        # Leave time to send the reply before the deadline
+        wait = min(wait, remaining - 0.05)
+    return max(wait, 0.0)
 
 class RFControlServicer(rfcontrol_pb2_grpc.RFControlServicer):
     """Provides methods that implement functionality of RF control server."""
 
-    def __init__(self):
-        self.device = SimulatedRFDevice()
-        # Automatically connect to a default device on startup
-        self.device.connect("DEV001")
+    def __init__(
+        self, registry: DeviceRegistry = None, batch_workers: int = 32,
+        coalesce_writes: bool = False, schedule_workers: int = 8,
+        metrics: ServerMetrics = None,
+    ):
+        # Devices are connected lazily, on the first request that names them
+        self.registry = registry if registry is not None else DeviceRegistry()
+        # With coalescing, SetRFSettings goes through one CoalescingWriter per
+        # busy device; writers are dropped again once they go idle
+        self.coalesce_writes = coalesce_writes
+        self._writers = {}
+        self._writers_lock = threading.Lock()
+        self._status_cache = StatusResponseCache()
+        # Batches fan out per device on their own pool, so a large batch
+        # never competes with regular RPCs for the server's worker threads
+        self._batch_executor = futures.ThreadPoolExecutor(
+            max_workers=batch_workers, thread_name_prefix="rf-batch"
+        )
+        # Settings with an execute_at wait in the scheduler's heap, not on a
+        # thread each; only jobs that are due take a thread from this pool
+        self._schedule_executor = futures.ThreadPoolExecutor(
+            max_workers=schedule_workers, thread_name_prefix="rf-sched"
+        )
+        self._scheduler = ApplyScheduler(self._schedule_executor)
+        # Without metrics, nothing is recorded
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.track_executor("batch", self._batch_executor)
+            metrics.track_executor("schedule", self._schedule_executor)
+            metrics.track_length("scheduled", self._scheduler)
+
+    def close(self):
+        """Cancels scheduled settings, releases the pools and disconnects all devices."""
+        self._scheduler.close()
+        self._schedule_executor.shutdown(wait=True)
+        self._batch_executor.shutdown(wait=True)
+        self.registry.close()
+
+    def _apply_settings(self, device, config):
+        """Applies one RFConfig to an acquired device and returns (success, status)."""
+        if self.metrics is None:
+            success = device.apply(config)
+        else:
+            start = time.perf_counter()
+            success = device.apply(config)
+            self.metrics.observe_apply(time.perf_counter() - start)
+
+        # Get the latest status from the device
+        return success, device.status
+
+    def _apply_to_device(self, device_id, config):
+        """Acquires device_id, applies config and returns (success, status)."""
+        with self.registry.acquire(device_id) as device:
+            return self._apply_settings(device, config)
+
+    def _schedule(self, device_id, config) -> futures.Future:
+        """Schedules config for its execute_at time.
+
+        The future's result is (success, status, apply_error_us), where
+        apply_error_us is how late the device was told to apply, once its lock
+        was held. Raises ValueError if execute_at is too far ahead.
+        """
+        deadline = deadline_for(config.execute_at)
+
+        def apply():
+            with self.registry.acquire(device_id) as device:
+                error = time.perf_counter() - deadline
+                success, status = self._apply_settings(device, config)
+            return success, status, 1e6 * error
+
+        return self._scheduler.schedule(deadline, apply)
+
+    @staticmethod
+    def _scheduled_result(future):
+        try:
+            return future.result()
+        except futures.CancelledError:
+            return False, "ERROR - cancelled before execute_at", 0.0
+
+    def _apply_at(self, device_id, config):
+        """Waits for config to be applied at its execute_at time; returns (success, status, apply_error_us)."""
+        try:
+            future = self._schedule(device_id, config)
+        except ValueError as e:
+            return False, f"ERROR - {e}", 0.0
+        return self._scheduled_result(future)
+
+    def _writer(self, device_id) -> CoalescingWriter:
+        with self._writers_lock:
+            writer = self._writers.get(device_id)
+            if writer is None:
+                writer = CoalescingWriter(
+                    lambda config: self._apply_to_device(device_id, config),
+                    on_idle=lambda w: self._drop_writer(device_id, w),
+                )
+                self._writers[device_id] = writer
+            return writer
+
+    def _drop_writer(self, device_id, writer):
+        # A request that fetched this writer just before it is dropped still
+        # works; the device lock keeps it from overlapping the next writer
+        with self._writers_lock:
+            if self._writers.get(device_id) is writer and writer.idle:
+                del self._writers[device_id]
 
     def SetRFSettings(self, request, context):
         """Handles the SetRFSettings RPC."""
-        logging.info(
-            f"Received SetRFSettings request: Freq={request.frequency}MHz, "
-            f"Gain={request.gain}dB, DeviceID='{request.device_id}'"
+        rpc_logger.info(
+            "Received SetRFSettings request: Freq=%sMHz, Gain=%sdB, DeviceID='%s'",
+            request.frequency, request.gain, request.device_id,
+            extra={"rpc": "SetRFSettings", "device_id": request.device_id},
         )
 
-        # Use the simulated device
-        success_freq = self.device.set_frequency(request.frequency)
-        success_gain = self.device.set_gain(request.gain)
-
-        # Determine overall success
-        success = success_freq and success_gain
-        
-        # Get the latest status from the device
-        status = self.device.status
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        superseded = False
+        apply_error_us = 0.0
+        if request.HasField("execute_at"):
+            # Timed settings are never coalesced; each one runs at its own time
+            try:
+                future = self._schedule(device_id, request)
+            except ValueError as e:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+            # A client that gives up takes its pending settings with it
+            context.add_callback(future.cancel)
+            success, status, apply_error_us = self._scheduled_result(future)
+        elif self.coalesce_writes:
+            success, status, superseded = self._writer(device_id).submit(request)
+        else:
+            with self.registry.acquire(device_id) as device:
+                success, status = self._apply_settings(device, request)
 
         if not success:
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details("Failed to apply RF settings on the device.")
 
-        return rfcontrol_pb2.RFResponse(success=success, device_status=status)
+        return rfcontrol_pb2.RFResponse(
+            success=success, device_status=status, superseded=superseded,
+            apply_error_us=apply_error_us,
+        )
 
     def GetDeviceStatus(self, request, context):
         """Handles the GetDeviceStatus RPC."""
-        logging.info(f"Received GetDeviceStatus request for DeviceID='{request.device_id}'")
-        
-        # In a real scenario, you might query the device for its status
-        # For simulation, we just return the current internal status
-        status = self.device.status
-        success = True # Assume always successful for status query
+        rpc_logger.info(
+            "Received GetDeviceStatus request for DeviceID='%s'", request.device_id,
+            extra={"rpc": "GetDeviceStatus", "device_id": request.device_id},
+        )
+
+        # Polling is frequent and the status rarely changes, so the response
+        # is built once per status change (see StatusResponseCache)
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        with self.registry.acquire(device_id) as device:
+            snapshot = device.snapshot()
+        if snapshot.generation > request.if_newer_than:
+            return self._status_cache.get(snapshot)
+
+        wait = status_wait(request, context)
+        if wait <= 0:
+            return NOT_MODIFIED
+        return self._wait_for_status(device_id, request.if_newer_than, wait, context)
+
+    def _wait_for_status(self, device_id, generation, wait, context):
+        """Long poll: answers as soon as the status passes generation, or NOT_MODIFIED after wait."""
+        deadline = time.monotonic() + wait
+        subscription = self.registry.subscribe(device_id)
+        context.add_callback(subscription.close)
+        try:
+            # The subscription starts with the current status, so a change made
+            # after the check in GetDeviceStatus is not missed
+            while subscription.next(timeout=deadline - time.monotonic()) is not None:
+                with self.registry.acquire(device_id) as device:
+                    snapshot = device.snapshot()
+                if snapshot.generation > generation:
+                    return self._status_cache.get(snapshot)
+        finally:
+            subscription.close()
+        return NOT_MODIFIED
+
+    def _apply_device_batch(self, device_id, items):
+        """Applies (index, config) pairs for one device in order, holding its lock once."""
+        results = []
+        try:
+            with self.registry.acquire(device_id) as device:
+                for index, config in items:
+                    success, status = self._apply_settings(device, config)
+                    results.append(
+                        (index, rfcontrol_pb2.RFResponse(success=success, device_status=status))
+                    )
+        except Exception as e:
+            logger.exception("Batch apply failed for DeviceID='%s'", device_id)
+            done = {index for index, _ in results}
+            results.extend(
+                (index, rfcontrol_pb2.RFResponse(success=False, device_status=f"ERROR - {e}"))
+                for index, _ in items if index not in done
+            )
+        return results
+
+    def _apply_table_batch(self, by_device):
+        """Applies all groups through the registry's DeviceTable, taking its lock once."""
+        items = [
+            (index, device_id, config)
+            for device_id, group in by_device.items() for index, config in group
+        ]
+        try:
+            with self.registry.acquire_many(by_device):
+                applied = self.registry.table.apply_many(
+                    (device_id, config.frequency, config.gain) for _, device_id, config in items
+                )
+        except Exception as e:
+            logger.exception("Batch apply failed for %d device(s)", len(by_device))
+            return [
+                (index, rfcontrol_pb2.RFResponse(success=False, device_status=f"ERROR - {e}"))
+                for index, _, _ in items
+            ]
+        return [
+            (index, rfcontrol_pb2.RFResponse(success=success, device_status=status))
+            for (index, _, _), (success, status) in zip(items, applied)
+        ]
+
+    def SetRFSettingsBatch(self, request, context):
+        """Handles the SetRFSettingsBatch RPC.
+
+        Items are grouped by device. Groups for different devices are applied
+        concurrently, while items for the same device keep their request order.
+        With the table driver, all groups are applied in one pass over the
+        table instead. Items with an execute_at are scheduled individually
+        and applied at their own times.
+        """
+        rpc_logger.info(
+            "Received SetRFSettingsBatch request with %d item(s)", len(request.configs),
+            extra={"rpc": "SetRFSettingsBatch"},
+        )
 
-        return rfcontrol_pb2.RFResponse(success=success, device_status=status)
+        results = [None] * len(request.configs)
+        by_device = {}
+        scheduled = []
+        for index, config in enumerate(request.configs):
+            device_id = config.device_id or DEFAULT_DEVICE_ID
+            if not config.HasField("execute_at"):
+                by_device.setdefault(device_id, []).append((index, config))
+                continue
+            try:
+                scheduled.append((index, self._schedule(device_id, config)))
+            except ValueError as e:
+                results[index] = rfcontrol_pb2.RFResponse(success=False, device_status=f"ERROR - {e}")
+        for _, future in scheduled:
+            context.add_callback(future.cancel)
 
-def serve():
+        if self.registry.table is not None:
+            groups = [self._apply_table_batch(by_device)] if by_device else []
+        else:
+            pending = [
+                self._batch_executor.submit(self._apply_device_batch, device_id, items)
+                for device_id, items in by_device.items()
+            ]
+            groups = [future.result() for future in pending]
+        for group in groups:
+            for index, response in group:
+                results[index] = response
+        for index, future in scheduled:
+            success, status, apply_error_us = self._scheduled_result(future)
+            results[index] = rfcontrol_pb2.RFResponse(
+                success=success, device_status=status, apply_error_us=apply_error_us
+            )
+
+        if not all(response.success for response in results):
+            logger.warning("Some items in the batch failed to apply.")
+
+        return rfcontrol_pb2.RFBatchResponse(results=results)
+
+    def WatchDeviceStatus(self, request, context):
+        """Handles the WatchDeviceStatus RPC.
+
+        The current status is sent first, then one update per change. Changes
+        that arrive while the watcher is still sending, or within
+        min_interval_ms of the last update, are coalesced into the newest one.
+        """
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        rpc_logger.info(
+            "Received WatchDeviceStatus request for DeviceID='%s'", device_id,
+            extra={"rpc": "WatchDeviceStatus", "device_id": device_id},
+        )
+
+        subscription = self.registry.subscribe(device_id)
+        # Wake the loop below as soon as the client goes away
+        context.add_callback(subscription.close)
+        min_interval = request.min_interval_ms / 1000.0
+        try:
+            while context.is_active():
+                status = subscription.next(timeout=WATCH_POLL_INTERVAL)
+                if status is None:
+                    continue
+                yield rfcontrol_pb2.RFResponse(success=True, device_status=status)
+                if min_interval and not subscription.sleep(min_interval):
+                    break
+        finally:
+            subscription.close()
+            rpc_logger.info(
+                "Stopped watching DeviceID='%s' (%d update(s) coalesced)",
+                device_id, subscription.coalesced,
+            )
+
+    def ControlSession(self, request_iterator, context):
+        """Handles the ControlSession RPC.
+
+        Updates are applied strictly in the order they arrive and each one is
+        acknowledged with the sequence number the client gave it. Per-update
+        logging is skipped here; at thousands of updates per second it would
+        cost more than applying the settings. An update with an execute_at
+        holds up the updates after it until it has been applied.
+        """
+        rpc_logger.info("ControlSession opened.", extra={"rpc": "ControlSession"})
+        applied = failed = 0
+        for update in request_iterator:
+            config = update.config
+            device_id = config.device_id or DEFAULT_DEVICE_ID
+            apply_error_us = 0.0
+            if config.HasField("execute_at"):
+                success, status, apply_error_us = self._apply_at(device_id, config)
+            else:
+                success, status = self._apply_to_device(device_id, config)
+            if success:
+                applied += 1
+            else:
+                failed += 1
+            yield rfcontrol_pb2.ControlAck(
+                sequence=update.sequence, success=success, device_status=status,
+                apply_error_us=apply_error_us,
+            )
+        rpc_logger.info("ControlSession closed: %d applied, %d failed.", applied, failed)
+
+    def Sweep(self, request, context):
+        """Handles the Sweep RPC.
+
+        The sweep runs on its own thread, holding the device for its whole
+        duration, so step timing does not depend on how fast the
+        confirmations are sent. Cancelling the call stops the sweep.
+        """
+        device_id = request.device_id or DEFAULT_DEVICE_ID
+        rpc_logger.info(
+            "Received Sweep request: %s-%s MHz step %s MHz, dwell %s ms, DeviceID='%s'",
+            request.start_frequency, request.stop_frequency, request.step_frequency,
+            request.dwell_ms, device_id, extra={"rpc": "Sweep", "device_id": device_id},
+        )
+        try:
+            frequencies = sweep_frequencies(
+                request.start_frequency, request.stop_frequency, request.step_frequency
+            )
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        progress = queue.SimpleQueue()
+        cancelled = threading.Event()
+        context.add_callback(cancelled.set)
+
+        def run():
+            try:
+                with self.registry.acquire(device_id) as device:
+                    summary = run_sweep(device, request, frequencies, progress.put, cancelled)
+                progress.put(rfcontrol_pb2.SweepProgress(summary=summary))
+            except Exception as e:
+                logger.exception("Sweep failed for DeviceID='%s'", device_id)
+                progress.put(e)
+            finally:
+                progress.put(None)
+
+        threading.Thread(target=run, name=f"rf-sweep-{device_id}", daemon=True).start()
+        try:
+            while True:
+                try:
+                    item = progress.get(timeout=WATCH_POLL_INTERVAL)
+                except queue.Empty:
+                    if not context.is_active():
+                        return
+                    continue
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    context.abort(grpc.StatusCode.INTERNAL, f"Sweep failed: {item}")
+                yield item
+        finally:
+            cancelled.set()
+
+    def ListDevices(self, request, context):
+        """Handles the ListDevices RPC from the registry's fleet index."""
+        rpc_logger.info(
+            "Received ListDevices request: page_size %d, token %s",
+            request.page_size, "set" if request.page_token else "unset",
+            extra={"rpc": "ListDevices"},
+        )
+        try:
+            return self.registry.index.list_devices(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+def add_servicer_to_server(servicer, server):
+    """Registers servicer like rfcontrol_pb2_grpc.add_RFControlServicer_to_server.
+
+    The difference is the RFResponse serializer, which sends cached status
+    responses without serializing them again.
+    """
+    rpc_method_handlers = {
+        'SetRFSettings': grpc.unary_unary_rpc_method_handler(
+            servicer.SetRFSettings,
+            request_deserializer=rfcontrol_pb2.RFConfig.FromString,
+            response_serializer=serialize_response,
+        ),
+        'GetDeviceStatus': grpc.unary_unary_rpc_method_handler(
+            servicer.GetDeviceStatus,
+            request_deserializer=rfcontrol_pb2.DeviceStatusRequest.FromString,
+            response_serializer=serialize_response,
+        ),
+        'SetRFSettingsBatch': grpc.unary_unary_rpc_method_handler(
+            servicer.SetRFSettingsBatch,
+            request_deserializer=rfcontrol_pb2.RFConfigBatch.FromString,
+            response_serializer=rfcontrol_pb2.RFBatchResponse.SerializeToString,
+        ),
+        'WatchDeviceStatus': grpc.unary_stream_rpc_method_handler(
+            servicer.WatchDeviceStatus,
+            request_deserializer=rfcontrol_pb2.WatchStatusRequest.FromString,
+            response_serializer=serialize_response,
+        ),
+        'ControlSession': grpc.stream_stream_rpc_method_handler(
+            servicer.ControlSession,
+            request_deserializer=rfcontrol_pb2.ControlUpdate.FromString,
+            response_serializer=rfcontrol_pb2.ControlAck.SerializeToString,
+        ),
+        'Sweep': grpc.unary_stream_rpc_method_handler(
+            servicer.Sweep,
+            request_deserializer=rfcontrol_pb2.SweepRequest.FromString,
+            response_serializer=rfcontrol_pb2.SweepProgress.SerializeToString,
+        ),
+        'ListDevices': grpc.unary_unary_rpc_method_handler(
+            servicer.ListDevices,
+            request_deserializer=rfcontrol_pb2.ListDevicesRequest.FromString,
+            response_serializer=rfcontrol_pb2.ListDevicesResponse.SerializeToString,
+        ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler('rfcontrol.RFControl', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('rfcontrol.RFControl', rpc_method_handlers)
+
+def create_metrics(config: ServerConfig) -> ServerMetrics:
+    """Returns a ServerMetrics if config enables the metrics endpoint, else None."""
+    return ServerMetrics() if config.metrics_port is not None else None
+
+def start_metrics_server(config: ServerConfig, metrics: ServerMetrics, port_offset: int = 0):
+    """Serves metrics on the configured port plus port_offset; returns None if disabled."""
+    if metrics is None:
+        return None
+    port = config.metrics_port + port_offset if config.metrics_port else 0
+    return MetricsServer(metrics, config.metrics_address, port).start()
+
+def create_journal(config: ServerConfig, worker: int = None) -> StateJournal:
+    """Returns the device state journal if config has a state_dir, else None.
+
+    Each worker of a multi-process server keeps its own, in state_dir/worker-N.
+    """
+    if config.state_dir is None:
+        return None
+    if worker is None:
+        return StateJournal(config.state_dir)
+    return StateJournal(os.path.join(config.state_dir, f"worker-{worker}"))
+
+def create_servicer(config: ServerConfig, metrics: ServerMetrics = None) -> RFControlServicer:
+    """Builds the servicer and its device registry from config."""
+    return RFControlServicer(
+        registry=DeviceRegistry(
+            create_device_factory(config), idle_timeout=config.idle_timeout,
+            journal=create_journal(config),
+        ),
+        batch_workers=config.batch_workers,
+        coalesce_writes=config.coalesce_writes,
+        schedule_workers=config.schedule_workers,
+        metrics=metrics,
+    )
+
+def create_hooks(config: ServerConfig, metrics: ServerMetrics = None, queue_depth=None):
+    """Returns the interceptor chain's hooks for config, in the order they run.
+
+    queue_depth() gives the number of calls waiting for a thread; load
+    shedding needs it and is skipped without it.
+    """
+    slow = config.slow_rpc_ms / 1000.0 if config.slow_rpc_ms is not None else None
+    hooks = [TracingHook()]
+    if metrics is not None:
+        hooks.append(MetricsHook(metrics))
+    hooks.append(TimingHook(slow))
+    if config.shed_queue_depth is not None and queue_depth is not None:
+        hooks.append(LoadShedHook(queue_depth, config.shed_queue_depth))
+    hooks.append(DeadlineHook())
+    return hooks
+
+def create_server(
+    config: ServerConfig, extra_options=(), metrics: ServerMetrics = None, extra_hooks=()
+) -> grpc.Server:
+    """Builds a thread-pool grpc.Server with the pool size, channel options and interceptors from config.
+
+    extra_hooks are ServerHooks that run after the standard ones.
+    """
+    executor = futures.ThreadPoolExecutor(max_workers=config.max_workers, thread_name_prefix="rf-rpc")
+    if metrics is not None:
+        metrics.track_executor("rpc", executor)
+    hooks = create_hooks(config, metrics, executor._work_queue.qsize)
+    if config.admin:
+        # Lets an Admin CPROFILE session profile each call on its thread
+        hooks.append(ProfilingHook())
+    hooks.extend(extra_hooks)
+    return grpc.server(
+        executor,
+        interceptors=[InterceptorChain(hooks)],
+        options=config.grpc_options() + list(extra_options),
+        maximum_concurrent_rpcs=config.maximum_concurrent_rpcs,
+        compression=config.grpc_compression(),
+    )
+
+def serve(config: ServerConfig = None):
     """Starts the gRPC server."""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    rfcontrol_pb2_grpc.add_RFControlServicer_to_server(RFControlServicer(), server)
-    server.add_insecure_port('0.0.0.0:50051')
+    config = config if config is not None else ServerConfig()
+    metrics = create_metrics(config)
+    server = create_server(config, metrics=metrics)
+    servicer = create_servicer(config, metrics)
+    servicer.registry.restore(config.restore_reapply, config.batch_workers)
+    servicer.registry.start_reaper()
+    add_servicer_to_server(servicer, server)
+    if config.admin:
+        rfcontrol_pb2_grpc.add_AdminServicer_to_server(AdminServicer(config.profile_dir), server)
+    server.add_insecure_port(config.address)
     server.start()
-    logging.info("Server started on port 50051.")
+    logger.info("Server started on %s.", config.address)
+    install_signal_handlers(config.profile_seconds, config.profile_dir)
+    metrics_server = start_metrics_server(config, metrics)
+
+    # Drain in-flight RPCs on `docker stop` as well as on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop(config.grace))
     try:
-        while True:
-            time.sleep(86400)  # One day in seconds
+        server.wait_for_termination()
     except KeyboardInterrupt:
-        logging.info("Server stopping...")
-        server.stop(0)
-        logging.info("Server stopped.")
+        logger.info("Server stopping...")
+        server.stop(config.grace).wait()
+    if metrics_server is not None:
+        metrics_server.stop()
+    servicer.close()
+    logger.info("Server stopped.")
+
+def setup_logging(config: ServerConfig):
+    """Starts the queue-based logging pipeline with the levels and sampling from config."""
+    configure_logging(
+        level=config.log_level,
+        levels=parse_levels(config.log_levels),
+        fmt=config.log_format,
+        sample_every=config.log_sample_every,
+    )
+
+def main(argv=None):
+    config = load_config(argv)
+    setup_logging(config)
+    config.log_effective()
+
+    if config.workers > 1:
+        from server.multiproc import serve_multiprocess
+        serve_multiprocess(config)
+    elif config.aio:
+        from server.aio_server import serve_async
+        try:
+            asyncio.run(serve_async(config))
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve(config)
 
 if __name__ == '__main__':
-    serve()
+    main()
@@ -0,0 +1,266 @@
+import collections
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from server.device_table import OPERATING
+
+logger = logging.getLogger("rfcontrol.journal")
+
+JOURNAL_FILE = "journal.bin"
+SNAPSHOT_FILE = "snapshot.bin"
+
+_SET = 1
+_FORGET = 2
+
+# kind, frequency, gain, updated_at, device_id length; then the device_id
+# bytes. Journal records end with a CRC32 of the record.
+_RECORD = struct.Struct("<BdddH")
+_CRC = struct.Struct("<I")
+# magic, record count and CRC32 of the records that follow
+_SNAPSHOT_MAGIC = b"RFST\x02\x00\x00\x00"
+_SNAPSHOT_HEADER = struct.Struct("<8sII")
+
+# Last settings applied to a device; has the fields device.apply() reads.
+SavedState = collections.namedtuple("SavedState", "frequency gain updated_at")
+
+def _pack(kind: int, device_id: str, state: SavedState) -> bytes:
+    name = device_id.encode()
+    return _RECORD.pack(kind, state.frequency, state.gain, state.updated_at, len(name)) + name
+
+def _encode(kind: int, device_id: str, state: SavedState = SavedState(0.0, 0.0, 0.0)) -> bytes:
+    body = _pack(kind, device_id, state)
+    return body + _CRC.pack(zlib.crc32(body))
+
+def _decode(buffer, offset: int, states: dict) -> int:
+    """Applies the record at offset to states; returns the next offset, or -1 if torn or corrupt."""
+    end = offset + _RECORD.size
+    if end > len(buffer):
+        return -1
+    kind, frequency, gain, updated_at, length = _RECORD.unpack_from(buffer, offset)
+    crc_at = end + length
+    if crc_at + _CRC.size > len(buffer):
+        return -1
+    (crc,) = _CRC.unpack_from(buffer, crc_at)
+    if crc != zlib.crc32(buffer[offset:crc_at]):
+        return -1
+    device_id = bytes(buffer[end:crc_at]).decode()
+    if kind == _SET:
+        states[device_id] = SavedState(frequency, gain, updated_at)
+    elif kind == _FORGET:
+        states.pop(device_id, None)
+    else:
+        return -1
+    return crc_at + _CRC.size
+
+def _read_snapshot(path: str) -> dict:
+    """Returns the states in the snapshot at path, or {} if there is none."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return {}
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        magic, count, crc = _SNAPSHOT_HEADER.unpack_from(buffer, 0)
+        if magic != _SNAPSHOT_MAGIC or zlib.crc32(buffer[_SNAPSHOT_HEADER.size:]) != crc:
+            raise ValueError(f"{path} is not a valid device state snapshot")
+        states = {}
+        unpack, size = _RECORD.unpack_from, _RECORD.size
+        offset = _SNAPSHOT_HEADER.size
+        for _ in range(count):
+            _, frequency, gain, updated_at, length = unpack(buffer, offset)
+            offset += size
+            states[buffer[offset:offset + length].decode()] = SavedState(frequency, gain, updated_at)
+            offset += length
+        return states
+
+def _replay(path: str, states: dict) -> int:
+    """Applies the records in the journal at path to states; returns how many were read."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            offset = count = 0
+            while offset < len(buffer):
+                offset = _decode(buffer, offset, states)
+                if offset < 0:
+                    logger.warning("Ignoring a torn or corrupt record at the end of %s.", path)
+                    break
+                count += 1
+            return count
+
+class StateJournal:
+    """Remembers the last settings of every device across restarts.
+
+    Changes are appended to journal.bin by a background thread, at most
+    flush_interval seconds after they happen, so recording one costs the
+    caller a dict update and a list append. Once compact_every records
+    have been appended, all current states are written to snapshot.bin
+    and the journal starts over. load() reads the snapshot through mmap
+    and replays the journal on top; a torn last record is ignored.
+
+    At most compact_every records wait for the journal thread; beyond
+    that they are dropped and the next flush compacts instead, which
+    writes the same states. Before load(), changes are only kept in
+    memory and merged into the loaded states.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.1, compact_every: int = 10000):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        os.makedirs(directory, exist_ok=True)
+        self._journal_path = os.path.join(directory, JOURNAL_FILE)
+        self._snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self._lock = threading.Lock()
+        self._states = {}
+        self._pending = []
+        self._compact_due = False
+        self._loaded = False
+        self._appended = 0
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self) -> dict:
+        """Returns {device_id: SavedState} as of the last run and starts journaling."""
+        start = time.perf_counter()
+        states = _read_snapshot(self._snapshot_path)
+        replayed = _replay(self._journal_path, states)
+        with self._lock:
+            # Changes made before loading win; None marks a forgotten device
+            changed, self._states = self._states, dict(states)
+            for device_id, state in changed.items():
+                if state is None:
+                    self._states.pop(device_id, None)
+                else:
+                    self._states[device_id] = state
+            self._loaded = True
+        if replayed or changed or not os.path.exists(self._snapshot_path):
+            # Starting from a fresh snapshot also drops a torn record, if any
+            self._compact()
+        else:
+            self._file = open(self._journal_path, "wb")
+        self._thread = threading.Thread(target=self._run, name="rf-journal", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Loaded %d device states (%d journal records) in %.1f ms.",
+            len(states), replayed, 1000.0 * (time.perf_counter() - start),
+        )
+        return states
+
+    def __len__(self):
+        return sum(state is not None for state in self._states.values())
+
+    def record(self, device_id: str, frequency: float, gain: float):
+        """Remembers the settings just applied to device_id."""
+        state = SavedState(frequency, gain, time.time())
+        with self._lock:
+            self._states[device_id] = state
+            if self._loaded:
+                self._append(_encode(_SET, device_id, state))
+
+    def forget(self, device_id: str):
+        """Drops device_id, e.g. once it has been evicted as idle."""
+        with self._lock:
+            if not self._loaded:
+                self._states[device_id] = None
+            elif self._states.pop(device_id, None) is not None:
+                self._append(_encode(_FORGET, device_id))
+
+    def _append(self, record: bytes):
+        """Queues record for the journal thread; call with the lock held."""
+        if len(self._pending) < self.compact_every:
+            self._pending.append(record)
+        elif not self._compact_due:
+            logger.warning("The device state journal is falling behind; compacting instead.")
+            self._pending = []
+            self._compact_due = True
+
+    def watch(self, device_id: str, device):
+        """Records device's settings whenever it starts operating with new ones."""
+
+        def on_status(status):
+            snapshot = device.snapshot()
+            if snapshot.state == "OPERATING":
+                self.record(device_id, snapshot.frequency, snapshot.gain)
+
+        device.add_listener(on_status)
+
+    def watch_table(self, table):
+        """Records the settings of every device in a DeviceTable that starts operating with new ones.
+
+        One listener for the whole table, reading the row's columns.
+        """
+
+        def on_change(row):
+            device_id, state, frequency, gain, _, _ = table.read(row)
+            if device_id is not None and state == OPERATING:
+                self.record(device_id, frequency, gain)
+
+        table.add_listener(on_change)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._flush()
+            except OSError:
+                logger.exception("Could not write the device state journal.")
+
+    def _flush(self):
+        """Writes pending records and compacts the journal when it has grown enough."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            compact_due, self._compact_due = self._compact_due, False
+        if compact_due:
+            self._compact()
+        elif pending:
+            self._file.write(b"".join(pending))
+            self._file.flush()
+            self._appended += len(pending)
+        if self._appended >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        """Writes all states to a new snapshot and starts an empty journal.
+
+        Only the journal thread (or load() and close(), when it is not
+        running) writes files, so records made meanwhile simply stay
+        pending for the new journal.
+        """
+        with self._lock:
+            # Pending records are already part of the states copied here
+            states = list(self._states.items())
+            self._pending = []
+            self._compact_due = False
+        body = b"".join(_pack(_SET, device_id, state) for device_id, state in states)
+        temp_path = self._snapshot_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(states), zlib.crc32(body)))
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._snapshot_path)
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._journal_path, "wb")
+        self._appended = 0
+        logger.debug("Compacted the device state journal: %d devices.", len(states))
+
+    def close(self):
+        """Stops journaling and leaves a compact snapshot for the next start."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._compact()
+        self._file.close()
+        self._file = None
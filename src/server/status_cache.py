@@ -0,0 +1,70 @@
+import threading
+import weakref
+
+import rfcontrol_pb2
+
+# DeviceSnapshot.state -> DeviceState
+DEVICE_STATES = {
+    "DISCONNECTED": rfcontrol_pb2.DEVICE_STATE_DISCONNECTED,
+    "IDLE": rfcontrol_pb2.DEVICE_STATE_IDLE,
+    "OPERATING": rfcontrol_pb2.DEVICE_STATE_OPERATING,
+}
+
+# Reply to a conditional GetDeviceStatus when nothing changed.
+NOT_MODIFIED = rfcontrol_pb2.RFResponse(success=True, not_modified=True)
+
+# id(response) -> (response, bytes) for every cached response. Holding the
+# response keeps its id from being reused while the entry exists.
+_serialized = {}
+
+def status_message(snapshot) -> rfcontrol_pb2.DeviceStatus:
+    """Converts a DeviceSnapshot to a DeviceStatus message."""
+    message = rfcontrol_pb2.DeviceStatus(
+        state=DEVICE_STATES.get(snapshot.state, rfcontrol_pb2.DEVICE_STATE_UNSPECIFIED),
+        frequency=snapshot.frequency,
+        gain=snapshot.gain,
+        device_id=snapshot.device_id,
+        generation=snapshot.generation,
+    )
+    message.updated_at.FromNanoseconds(int(snapshot.updated_at * 1e9))
+    return message
+
+def serialize_response(response) -> bytes:
+    """RFResponse serializer that reuses the bytes of cached status responses."""
+    entry = _serialized.get(id(response))
+    if entry is not None and entry[0] is response:
+        return entry[1]
+    return response.SerializeToString()
+
+class StatusResponseCache:
+    """GetDeviceStatus responses, built and serialized once per device snapshot.
+
+    Devices replace their snapshot on every status change, so a cached
+    response is valid exactly as long as the device still returns the
+    snapshot it was built from. Entries are held weakly and disappear with
+    the snapshot they describe. Cached responses are shared between calls
+    and must not be modified.
+    """
+
+    def __init__(self):
+        self._responses = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, snapshot) -> rfcontrol_pb2.RFResponse:
+        with self._lock:
+            response = self._responses.get(snapshot)
+            if response is not None:
+                self.hits += 1
+                return response
+        response = rfcontrol_pb2.RFResponse(
+            success=True, device_status=snapshot.status, status=status_message(snapshot)
+        )
+        key = id(response)
+        _serialized[key] = (response, response.SerializeToString())
+        weakref.finalize(snapshot, _serialized.pop, key, None).atexit = False
+        with self._lock:
+            self.misses += 1
+            self._responses[snapshot] = response
+        return response
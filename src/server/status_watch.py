@@ -0,0 +1,145 @@
+import asyncio
+import threading
+
+
+class StatusSubscription:
+    """One watcher's mailbox for device status updates.
+
+    The mailbox holds only the latest undelivered status. Publishing never
+    blocks: if the watcher has not picked up the previous update yet, it is
+    overwritten, so a slow watcher sees fewer, newer updates instead of
+    holding up the device or buffering without bound.
+    """
+
+    def __init__(self, broadcaster):
+        self._broadcaster = broadcaster
+        self._cond = threading.Condition()
+        self._latest = None
+        self._closed = False
+        self.coalesced = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def offer(self, status):
+        """Replaces any pending status with the new one and wakes the watcher."""
+        with self._cond:
+            if self._latest is not None:
+                self.coalesced += 1
+            self._latest = status
+            self._cond.notify()
+
+    def next(self, timeout: float = None):
+        """Waits for and returns the next status, or None on timeout or close."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._latest is not None or self._closed, timeout)
+            status, self._latest = self._latest, None
+            return None if self._closed else status
+
+    def sleep(self, seconds: float) -> bool:
+        """Waits up to seconds, returning early (False) if the subscription closes."""
+        with self._cond:
+            return not self._cond.wait_for(lambda: self._closed, seconds)
+
+    def close(self):
+        """Detaches from the broadcaster and wakes any waiting watcher."""
+        self._broadcaster.unsubscribe(self)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class AsyncStatusSubscription:
+    """The asyncio counterpart of StatusSubscription, for the grpc.aio server.
+
+    offer() may be called from any thread (a blocking device can change on
+    an executor thread); the watcher is woken on the subscription's loop.
+    """
+
+    def __init__(self, broadcaster, loop=None):
+        self._broadcaster = broadcaster
+        self._loop = loop or asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._closed_event = asyncio.Event()
+        self._latest = None
+        self._closed = False
+        self.coalesced = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _call_in_loop(self, callback):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            callback()
+        else:
+            self._loop.call_soon_threadsafe(callback)
+
+    def offer(self, status):
+        """Replaces any pending status with the new one and wakes the watcher."""
+        if self._latest is not None:
+            self.coalesced += 1
+        self._latest = status
+        self._call_in_loop(self._ready.set)
+
+    async def next(self, timeout: float = None):
+        """Waits for and returns the next status, or None on timeout or close."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        status, self._latest = self._latest, None
+        return None if self._closed else status
+
+    async def sleep(self, seconds: float) -> bool:
+        """Waits up to seconds, returning early (False) if the subscription closes."""
+        try:
+            await asyncio.wait_for(self._closed_event.wait(), seconds)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    def close(self):
+        """Detaches from the broadcaster and wakes any waiting watcher."""
+        self._broadcaster.unsubscribe(self)
+        self._closed = True
+
+        def wake():
+            self._closed_event.set()
+            self._ready.set()
+
+        self._call_in_loop(wake)
+
+
+class StatusBroadcaster:
+    """Fans a device's status changes out to its subscribers."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, subscription_class=StatusSubscription):
+        subscription = subscription_class(self)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, status):
+        """Delivers status to every subscriber. Safe to call as a device listener."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(status)
@@ -0,0 +1,76 @@
+import math
+import time
+
+import rfcontrol_pb2
+
+from server.timing import SPIN_THRESHOLD, JitterStats, sleep_until
+
+# Largest number of steps one Sweep may have.
+MAX_SWEEP_STEPS = 100_000
+
+def sweep_frequencies(start: float, stop: float, step: float):
+    """Returns the frequencies of a sweep from start towards stop, in MHz.
+
+    Raises ValueError for a sweep that cannot be run.
+    """
+    if not all(math.isfinite(value) for value in (start, stop, step)):
+        raise ValueError("start, stop and step frequencies must be finite")
+    if start == stop:
+        return [start]
+    if step <= 0:
+        raise ValueError("step_frequency must be positive")
+    direction = 1.0 if stop > start else -1.0
+    # Tolerate rounding so that a stop frequency on a step boundary is included
+    count = int(math.floor(abs(stop - start) / step + 1e-9)) + 1
+    if count > MAX_SWEEP_STEPS:
+        raise ValueError(f"sweep has {count} steps; the limit is {MAX_SWEEP_STEPS}")
+    # Computed from the start each time, so rounding errors do not accumulate
+    return [start + direction * i * step for i in range(count)]
+
+def run_sweep(device, request, frequencies, emit, cancelled, spin: float = SPIN_THRESHOLD):
+    """Applies each frequency on schedule and returns the SweepSummary.
+
+    Step i is due dwell_ms * i after the first one. Deadlines are absolute,
+    so a late step does not delay the ones after it. emit(SweepProgress) is
+    called after every step and must not block. The sweep stops early once
+    the cancelled event is set. device is a synchronous device that is
+    already acquired.
+    """
+    dwell = max(request.dwell_ms, 0.0) / 1000.0
+    jitter = JitterStats()
+    failed = 0
+    stopped = False
+    begin = time.perf_counter()
+    for index, frequency in enumerate(frequencies):
+        scheduled = begin + index * dwell
+        if not sleep_until(scheduled, cancelled, spin):
+            stopped = True
+            break
+        late = time.perf_counter() - scheduled
+        success = device.apply(rfcontrol_pb2.RFConfig(frequency=frequency, gain=request.gain))
+        jitter.record(late)
+        if not success:
+            failed += 1
+        emit(rfcontrol_pb2.SweepProgress(step=rfcontrol_pb2.SweepStep(
+            index=index,
+            frequency=frequency,
+            success=success,
+            device_status=device.status,
+            scheduled_ms=1000.0 * index * dwell,
+            late_us=1e6 * late,
+        )))
+    if not stopped:
+        # Hold the last frequency for its dwell time as well
+        stopped = not sleep_until(begin + len(frequencies) * dwell, cancelled, spin)
+
+    late = jitter.summary()
+    return rfcontrol_pb2.SweepSummary(
+        steps=len(jitter),
+        failed=failed,
+        cancelled=stopped,
+        elapsed_ms=1000.0 * (time.perf_counter() - begin),
+        late_mean_us=late["mean_us"],
+        late_p50_us=late["p50_us"],
+        late_p99_us=late["p99_us"],
+        late_max_us=late["max_us"],
+    )
@@ -0,0 +1,54 @@
+import time
+
+# Sleeping can overshoot by a millisecond or more, so the last stretch
+# before a deadline is spent spinning on the clock instead.
+SPIN_THRESHOLD = 0.002
+
+def sleep_until(deadline: float, cancelled=None, spin: float = SPIN_THRESHOLD) -> bool:
+    """Waits until time.perf_counter() reaches deadline, returning False if cancelled first.
+
+    Sleeps (on the cancelled event, if one is given, so cancelling wakes it)
+    until spin seconds before the deadline, then spins. The spin yields the
+    GIL on every pass so other threads keep running.
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        if cancelled is not None:
+            if cancelled.wait(remaining - spin):
+                return False
+        else:
+            time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        if cancelled is not None and cancelled.is_set():
+            return False
+        time.sleep(0)
+    return True
+
+def percentile(sorted_values, q: float) -> float:
+    """Returns the q-th percentile (0-100) of an ascending list, nearest-rank method."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-q * len(sorted_values) // 100))
+    return sorted_values[min(int(rank), len(sorted_values)) - 1]
+
+class JitterStats:
+    """Collects how late scheduled actions ran, in seconds."""
+
+    def __init__(self):
+        self._samples = []
+
+    def record(self, lateness: float):
+        self._samples.append(lateness)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def summary(self) -> dict:
+        """Returns mean, p50, p99 and max lateness in microseconds."""
+        samples = sorted(self._samples)
+        return {
+            "mean_us": 1e6 * sum(samples) / len(samples) if samples else 0.0,
+            "p50_us": 1e6 * percentile(samples, 50),
+            "p99_us": 1e6 * percentile(samples, 99),
+            "max_us": 1e6 * samples[-1] if samples else 0.0,
+        }
@@ -0,0 +1,74 @@
+import asyncio
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from client.aio_client import AsyncRFClient
+from client.latency import LatencyStats, percentile
+from server.server import RFControlServicer
+import rfcontrol_pb2_grpc
+
+@pytest.fixture
+def server_addr():
+    """An in-process server on a free local port."""
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    rfcontrol_pb2_grpc.add_RFControlServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield f"127.0.0.1:{port}"
+    server.stop(0)
+    servicer.close()
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 99.9) == 100
+    assert percentile([], 50) == 0.0
+
+def test_latency_stats_summary():
+    stats = LatencyStats()
+    for ms in range(1, 11):
+        stats.record("SetRFSettings", ms / 1000.0)
+    stats.record("GetDeviceStatus", 0.5, ok=False)
+
+    summary = stats.summary("SetRFSettings")
+    assert summary["count"] == 10
+    assert summary["errors"] == 0
+    assert summary["p50_ms"] == pytest.approx(5.0)
+    assert summary["max_ms"] == pytest.approx(10.0)
+    assert stats.summary()["count"] == 11
+    assert stats.summary()["errors"] == 1
+
+def test_many_requests_in_flight(server_addr):
+    """Hundreds of concurrent calls share one channel and are all recorded."""
+    async def run():
+        async with AsyncRFClient(server_addr, max_in_flight=25) as client:
+            responses = await asyncio.gather(*(
+                client.set_settings(900.0 + i, 10.0, f"AIOC{i:03d}") for i in range(300)
+            ))
+            status = await client.get_status("AIOC000")
+            return responses, status, client.stats
+
+    responses, status, stats = asyncio.run(run())
+    assert all(r.success for r in responses)
+    assert status.device_status == "OPERATING - Freq: 900.0MHz, Gain: 10.0dB"
+    assert stats.summary("SetRFSettings")["count"] == 300
+    assert stats.summary("GetDeviceStatus")["count"] == 1
+
+def test_failed_calls_are_counted():
+    """Errors propagate as grpc.aio.AioRpcError and count as errors in stats."""
+    async def run():
+        async with AsyncRFClient("127.0.0.1:1", timeout=0.2) as client:
+            with pytest.raises(grpc.aio.AioRpcError):
+                await client.get_status("NOPE")
+            return client.stats
+
+    assert asyncio.run(run()).summary("GetDeviceStatus")["errors"] == 1
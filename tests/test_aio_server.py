@@ -0,0 +1,96 @@
+import asyncio
+
+import grpc
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.aio_server import AsyncRFControlServicer
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+async def _with_server(test):
+    """Runs test(stub, servicer) against an in-process grpc.aio server."""
+    server = grpc.aio.server()
+    servicer = AsyncRFControlServicer()
+    rfcontrol_pb2_grpc.add_RFControlServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            await test(rfcontrol_pb2_grpc.RFControlStub(channel), servicer)
+    finally:
+        await server.stop(0)
+        await servicer.close()
+
+def test_aio_unary_and_batch():
+    """Unary and batch RPCs behave the same as on the thread-pool server."""
+    async def test(stub, servicer):
+        response = await stub.SetRFSettings(
+            rfcontrol_pb2.RFConfig(frequency=99.9, gain=15.5, device_id="AIO01")
+        )
+        assert response.success is True
+        assert response.device_status == "OPERATING - Freq: 99.9MHz, Gain: 15.5dB"
+
+        batch = await stub.SetRFSettingsBatch(rfcontrol_pb2.RFConfigBatch(configs=[
+            rfcontrol_pb2.RFConfig(frequency=433.0, gain=1.0, device_id="AIO02"),
+            rfcontrol_pb2.RFConfig(frequency=868.0, gain=2.0, device_id="AIO03"),
+        ]))
+        assert [r.device_status for r in batch.results] == [
+            "OPERATING - Freq: 433.0MHz, Gain: 1.0dB",
+            "OPERATING - Freq: 868.0MHz, Gain: 2.0dB",
+        ]
+
+        status = await stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id="AIO01"))
+        assert status.device_status == "OPERATING - Freq: 99.9MHz, Gain: 15.5dB"
+        assert sorted(servicer.registry.device_ids()) == ["AIO01", "AIO02", "AIO03"]
+
+        listed = await stub.ListDevices(rfcontrol_pb2.ListDevicesRequest(min_frequency=400.0))
+        assert [(d.device_id, d.frequency) for d in listed.devices] == [("AIO02", 433.0), ("AIO03", 868.0)]
+
+    asyncio.run(_with_server(test))
+
+def test_aio_streams():
+    """Watch and control session streams work on the asyncio server."""
+    async def test(stub, servicer):
+        watch = stub.WatchDeviceStatus(rfcontrol_pb2.WatchStatusRequest(device_id="AIO04"))
+        assert (await watch.read()).device_status == "CONNECTED - IDLE"
+
+        updates = [
+            rfcontrol_pb2.ControlUpdate(
+                sequence=seq,
+                config=rfcontrol_pb2.RFConfig(frequency=freq, gain=3.0, device_id="AIO04")
+            )
+            for seq, freq in enumerate((902.0, 915.0))
+        ]
+        acks = [ack async for ack in stub.ControlSession(iter(updates))]
+        assert [ack.sequence for ack in acks] == [0, 1]
+
+        # Intermediate states may be coalesced, but the watcher ends on the last one
+        status = None
+        while status != "OPERATING - Freq: 915.0MHz, Gain: 3.0dB":
+            status = (await asyncio.wait_for(watch.read(), 2)).device_status
+        watch.cancel()
+
+    asyncio.run(_with_server(test))
+
+def test_aio_long_poll_get_device_status():
+    """A conditional GetDeviceStatus waits for the next change on the asyncio server."""
+    async def test(stub, servicer):
+        current = await stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id="AIO05"))
+        poll = stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(
+            device_id="AIO05", if_newer_than=current.status.generation, wait_ms=5000
+        ))
+        await asyncio.sleep(0.05)
+        await stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=50.0, gain=1.0, device_id="AIO05"))
+        changed = await asyncio.wait_for(poll, 2)
+        assert changed.device_status == "OPERATING - Freq: 50.0MHz, Gain: 1.0dB"
+
+        unchanged = await stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(
+            device_id="AIO05", if_newer_than=changed.status.generation, wait_ms=20
+        ))
+        assert unchanged.not_modified
+
+    asyncio.run(_with_server(test))
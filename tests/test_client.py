@@ -0,0 +1,58 @@
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from client.channel_pool import ChannelPool
+from client.rf_client import RFClient
+from server.server import RFControlServicer
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+@pytest.fixture
+def server_addr():
+    """An in-process server on a free local port."""
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    rfcontrol_pb2_grpc.add_RFControlServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield f"127.0.0.1:{port}"
+    server.stop(0)
+    servicer.close()
+
+def test_pool_reuses_one_channel_per_address():
+    """Channels and stubs are shared per address and replaced after reset."""
+    pool = ChannelPool()
+    first = pool.channel("localhost:1")
+    assert pool.channel("localhost:1") is first
+    assert pool.channel("localhost:2") is not first
+    stub = pool.stub("localhost:1", rfcontrol_pb2_grpc.RFControlStub)
+    assert pool.stub("localhost:1", rfcontrol_pb2_grpc.RFControlStub) is stub
+
+    pool.reset("localhost:1")
+    assert pool.channel("localhost:1") is not first
+    assert pool.stub("localhost:1", rfcontrol_pb2_grpc.RFControlStub) is not stub
+    pool.close()
+
+def test_clients_share_a_warm_connection(server_addr):
+    """Separate RFClient instances for one server go through the same channel."""
+    pool = ChannelPool()
+    response = RFClient(server_addr, pool=pool).set_settings(433.0, 5.0, "POOL01")
+    assert response.device_status == "OPERATING - Freq: 433.0MHz, Gain: 5.0dB"
+
+    channel = pool.channel(server_addr)
+    status = RFClient(server_addr, pool=pool).get_status("POOL01")
+    assert status.device_status == "OPERATING - Freq: 433.0MHz, Gain: 5.0dB"
+    assert pool.channel(server_addr) is channel
+
+    acks = list(RFClient(server_addr, pool=pool).control_session([
+        rfcontrol_pb2.RFConfig(frequency=915.0, gain=20.0, device_id="POOL01")
+    ]))
+    assert acks[0][1].success
+    pool.close()
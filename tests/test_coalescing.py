@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.coalescing import AsyncCoalescingWriter, CoalescingWriter
+from server.server import RFControlServicer
+import rfcontrol_pb2
+
+def test_writes_queued_behind_a_slow_apply_collapse_to_the_newest():
+    release = threading.Event()
+    applied = []
+
+    def apply(config):
+        applied.append(config)
+        if len(applied) == 1:
+            release.wait(5)
+        return True, f"applied {config}"
+
+    writer = CoalescingWriter(apply)
+    results = {}
+
+    def submit(value):
+        results[value] = writer.submit(value)
+
+    first = threading.Thread(target=submit, args=(0,))
+    first.start()
+    while not applied:
+        time.sleep(0.001)
+
+    # These arrive while 0 is being applied; only the last one should run
+    queued = []
+    for value in (1, 2, 3, 4):
+        thread = threading.Thread(target=submit, args=(value,))
+        thread.start()
+        queued.append(thread)
+        time.sleep(0.02)
+    release.set()
+    for thread in [first] + queued:
+        thread.join(5)
+
+    assert applied == [0, 4]
+    assert results[0] == (True, "applied 0", False)
+    assert results[4] == (True, "applied 4", False)
+    for value in (1, 2, 3):
+        assert results[value] == (True, "applied 4", True)
+    assert writer.superseded == 3
+    assert writer.idle
+
+def test_apply_errors_are_reported_to_every_waiter():
+    writer = CoalescingWriter(MagicMock(side_effect=RuntimeError("bus fault")))
+    assert writer.submit("x") == (False, "ERROR - bus fault", False)
+    assert writer.idle
+
+def test_async_writer_collapses_queued_writes():
+    async def scenario():
+        release = asyncio.Event()
+        applied = []
+
+        async def apply(config):
+            applied.append(config)
+            if len(applied) == 1:
+                await release.wait()
+            return True, f"applied {config}"
+
+        writer = AsyncCoalescingWriter(apply)
+        tasks = [asyncio.ensure_future(writer.submit(0))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(writer.submit(value)) for value in (1, 2, 3)]
+        await asyncio.sleep(0)
+        release.set()
+        return applied, await asyncio.gather(*tasks), writer
+
+    applied, results, writer = asyncio.run(scenario())
+    assert applied == [0, 3]
+    assert results == [
+        (True, "applied 0", False),
+        (True, "applied 3", True),
+        (True, "applied 3", True),
+        (True, "applied 3", False),
+    ]
+    assert writer.idle
+
+def test_servicer_coalescing_mode_applies_and_releases_writers():
+    service = RFControlServicer(coalesce_writes=True)
+    try:
+        response = service.SetRFSettings(
+            rfcontrol_pb2.RFConfig(frequency=100.0, gain=1.0, device_id="COAL01"), MagicMock()
+        )
+        assert response.success and not response.superseded
+        assert response.device_status == "OPERATING - Freq: 100.0MHz, Gain: 1.0dB"
+        # Idle writers are released again
+        assert service._writers == {}
+    finally:
+        service.close()
@@ -0,0 +1,57 @@
+import json
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.config import ServerConfig, load_config
+
+def test_defaults_match_previous_hard_coded_server():
+    config = load_config([], environ={})
+    assert config.address == "0.0.0.0:50051"
+    assert config.max_workers == 10
+    assert config.maximum_concurrent_rpcs is None
+    assert config.grpc_options() == []
+    assert config.grpc_compression() == grpc.Compression.NoCompression
+
+def test_cli_overrides_environment_overrides_file(tmp_path):
+    config_file = tmp_path / "server.json"
+    config_file.write_text(json.dumps({
+        "max_workers": 16, "max_concurrent_streams": 50, "compression": "gzip", "address": "file:1"
+    }))
+    environ = {
+        "RFCONTROL_CONFIG": str(config_file),
+        "RFCONTROL_MAX_WORKERS": "32",
+        "RFCONTROL_KEEPALIVE_PERMIT_WITHOUT_CALLS": "true",
+        "RFCONTROL_ADDRESS": "env:2",
+    }
+
+    config = load_config(["--address", "cli:3", "--maximum-concurrent-rpcs", "200"], environ=environ)
+
+    assert config.address == "cli:3"
+    assert config.max_workers == 32
+    assert config.maximum_concurrent_rpcs == 200
+    assert config.compression == "gzip"
+    assert sorted(config.grpc_options()) == [
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.max_concurrent_streams", 50),
+    ]
+
+def test_invalid_settings_are_rejected(tmp_path):
+    with pytest.raises(SystemExit):
+        load_config(["--workers", "2", "--aio"], environ={})
+    config_file = tmp_path / "server.json"
+    config_file.write_text('{"max_wokers": 4}')
+    with pytest.raises(SystemExit):
+        load_config(["--config", str(config_file)], environ={})
+    with pytest.raises(SystemExit):
+        load_config([], environ={"RFCONTROL_AIO": "maybe"})
+
+def test_config_survives_pickling_for_worker_processes():
+    import pickle
+    config = ServerConfig(workers=4, max_workers=20)
+    assert pickle.loads(pickle.dumps(config)) == config
@@ -0,0 +1,67 @@
+import threading
+from unittest.mock import MagicMock
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.device_registry import DeviceRegistry
+from server.rf_device import SimulatedRFDevice
+
+def test_devices_are_connected_lazily_and_reused():
+    """Each device_id gets its own device, connected once on first use."""
+    registry = DeviceRegistry()
+    assert len(registry) == 0
+
+    with registry.acquire("DEV_A") as dev_a:
+        assert dev_a.get_idn() == "Simulated RF Device, s/n:DEV_A, fw:1.0"
+    with registry.acquire("DEV_B") as dev_b:
+        assert dev_b is not dev_a
+    with registry.acquire("DEV_A") as again:
+        assert again is dev_a
+
+    assert sorted(registry.device_ids()) == ["DEV_A", "DEV_B"]
+
+def test_different_devices_do_not_block_each_other():
+    """Holding one device's lock must not stall requests for another."""
+    registry = DeviceRegistry()
+    done = threading.Event()
+
+    def use_other_device():
+        with registry.acquire("DEV_B"):
+            done.set()
+
+    with registry.acquire("DEV_A"):
+        worker = threading.Thread(target=use_other_device)
+        worker.start()
+        assert done.wait(timeout=2)
+    worker.join()
+
+def test_evict_idle_disconnects_unused_devices():
+    """Idle devices are disconnected and dropped; busy ones are kept."""
+    devices = []
+
+    def factory():
+        device = MagicMock(spec=SimulatedRFDevice)
+        device.connect.return_value = True
+        # The registry indexes every device by its snapshot
+        device.snapshot.return_value = SimulatedRFDevice().snapshot()
+        devices.append(device)
+        return device
+
+    registry = DeviceRegistry(device_factory=factory, idle_timeout=10.0)
+    with registry.acquire("IDLE"):
+        pass
+    with registry.acquire("BUSY"):
+        assert registry.evict_idle(now=float("inf")) == 1
+
+    assert "IDLE" not in registry
+    assert "BUSY" in registry
+    devices[0].disconnect.assert_called_once()
+    devices[1].disconnect.assert_not_called()
+
+    # A later request for an evicted device reconnects a fresh instance
+    with registry.acquire("IDLE") as device:
+        assert device is devices[2]
+    device.connect.assert_called_once_with("IDLE")
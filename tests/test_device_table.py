@@ -0,0 +1,176 @@
+import gc
+import threading
+import tracemalloc
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.config import ServerConfig
+from server.device_registry import DeviceRegistry
+from server.device_table import DeviceTable
+from server.rf_device import SimulatedRFDevice
+from server.server import create_servicer
+from server.state_journal import StateJournal
+from server.status_cache import status_message
+import rfcontrol_pb2
+
+def test_table_devices_behave_like_simulated_devices():
+    table = DeviceTable()
+    device, reference = table.device(), SimulatedRFDevice()
+    changes, expected = [], []
+    device.add_listener(changes.append)
+    reference.add_listener(expected.append)
+    for d in (device, reference):
+        assert d.status == "DISCONNECTED"
+        assert d.connect("DEV-T")
+        assert d.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=20.0))
+        assert d.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=20.0))
+        assert not d.apply(rfcontrol_pb2.RFConfig(frequency=-1.0, gain=20.0))
+        assert d.set_gain(3.5)
+    assert changes == expected
+    assert device.get_idn() == reference.get_idn()
+
+    snapshot = device.snapshot()
+    assert device.snapshot() is snapshot
+    assert (snapshot.state, snapshot.frequency, snapshot.gain, snapshot.device_id) == (
+        "OPERATING", 915.0, 3.5, "DEV-T"
+    )
+    assert status_message(snapshot).state == rfcontrol_pb2.DEVICE_STATE_OPERATING
+    device.set_frequency(100.0)
+    assert device.snapshot().generation > snapshot.generation
+
+    device.disconnect()
+    assert device.status == "DISCONNECTED" and changes[-1] == "DISCONNECTED"
+    assert not device.apply(rfcontrol_pb2.RFConfig(frequency=1.0, gain=1.0))
+    assert "DEV-T" not in table and len(table) == 0
+
+def test_rows_are_reused_and_ids_interned():
+    table = DeviceTable()
+    devices = [table.device() for _ in range(3)]
+    for i, device in enumerate(devices):
+        device.connect("".join(["D", str(i)]))
+    assert table.row_of("D1") == 1 and table.device_ids[1] is sys.intern("D1")
+    devices[1].disconnect()
+    assert table.row_of("D1") == -1
+
+    replacement = table.device()
+    replacement.connect("D9")
+    assert table.row_of("D9") == 1 and len(table.frequency) == 3
+
+    # A device created for an id that is still connected takes over its row
+    successor = table.device()
+    successor.connect("D0")
+    assert devices[0].status == "DISCONNECTED"
+    assert successor.status == "CONNECTED - IDLE" and table.row_of("D0") == 0
+
+def test_fleet_queries_and_bulk_updates():
+    table = DeviceTable()
+    devices = [table.device() for _ in range(100)]
+    for i, device in enumerate(devices):
+        device.connect(f"DEV{i:03d}")
+        if i % 2:
+            device.apply(rfcontrol_pb2.RFConfig(frequency=100.0 + i, gain=i / 10))
+    changes = []
+    devices[3].add_listener(changes.append)
+
+    assert len(table.query(state="IDLE")) == 50
+    assert table.query(min_frequency=190.0, max_frequency=195.0) == ["DEV091", "DEV093", "DEV095"]
+    assert table.query(min_gain=9.6, state="OPERATING") == ["DEV097", "DEV099"]
+    assert len(table.query()) == 100
+
+    assert table.bulk_apply(["DEV001", "DEV003", "MISSING"], gain=-2.0) == 2
+    assert changes == ["OPERATING - Freq: 103.0MHz, Gain: -2.0dB"]
+    assert devices[1].snapshot().gain == -2.0
+    assert table.bulk_apply(["DEV000"], frequency=float("nan")) == 0
+    assert devices[0].status == "CONNECTED - IDLE"
+
+    devices[5].disconnect()
+    assert "DEV005" not in table.query(state="OPERATING")
+    assert None not in table.query() and len(table.query()) == 99
+    assert table.query(min_frequency=105.0, max_frequency=105.0) == []
+
+    # The freed row is reused for a new device, which starts idle
+    devices[5].connect("DEV-NEW")
+    assert table.row_of("DEV-NEW") == 5
+    assert "DEV-NEW" in table.query(state="IDLE") and None not in table.query()
+    assert table.query(min_frequency=105.0, max_frequency=105.0) == []
+
+    assert table.apply_many([("DEV002", 50.0, 1.0), ("DEV002", -1.0, 1.0), ("MISSING", 1.0, 1.0)]) == [
+        (True, "OPERATING - Freq: 50.0MHz, Gain: 1.0dB"),
+        (False, "OPERATING - Freq: 50.0MHz, Gain: 1.0dB"),
+        (False, "DISCONNECTED"),
+    ]
+
+def test_listeners_run_after_the_table_lock_is_released():
+    table = DeviceTable()
+    device = table.device()
+    device.connect("DEV-L")
+    seen = []
+
+    def on_status(status):
+        # Another thread can take the table lock from inside a listener
+        other = threading.Thread(target=lambda: seen.append(table.read(0)[2]))
+        other.start()
+        other.join(timeout=5)
+
+    device.add_listener(on_status)
+    table.add_listener(lambda row: seen.append(row))
+    device.apply(rfcontrol_pb2.RFConfig(frequency=7.0, gain=0.0))
+    assert seen == [0, 7.0]
+
+def test_registry_serves_list_devices_and_batches_from_the_table(tmp_path):
+    servicer = create_servicer(ServerConfig(driver="table", state_dir=str(tmp_path)))
+    try:
+        registry = servicer.registry
+        registry.restore()
+        table = registry.table
+        for i in range(5):
+            with registry.acquire(f"DEV{i}") as device:
+                device.apply(rfcontrol_pb2.RFConfig(frequency=100.0 + i, gain=1.0))
+        assert table.query(state="OPERATING") == [f"DEV{i}" for i in range(5)]
+
+        request = rfcontrol_pb2.RFConfigBatch(configs=[
+            rfcontrol_pb2.RFConfig(frequency=200.0, gain=2.0, device_id="DEV1"),
+            rfcontrol_pb2.RFConfig(frequency=-1.0, gain=2.0, device_id="DEV2"),
+            rfcontrol_pb2.RFConfig(frequency=300.0, gain=3.0, device_id="NEW"),
+        ])
+        results = servicer.SetRFSettingsBatch(request, None).results
+        assert [r.success for r in results] == [True, False, True]
+        assert results[2].device_status == "OPERATING - Freq: 300.0MHz, Gain: 3.0dB"
+
+        # The index and journal follow the table, not each device
+        assert all(not device._listeners[1:] for device in table._views if device is not None)
+        assert [s.device_id for s in registry.index.list_devices(
+            rfcontrol_pb2.ListDevicesRequest(min_frequency=150.0)).devices] == ["DEV1", "NEW"]
+        assert registry._journal._states["NEW"][:2] == (300.0, 3.0)
+
+        registry._entries["DEV1"].last_used = 0.0
+        registry.evict_idle()
+        assert len(registry.index) == 5 and len(table) == 5
+        assert [s.device_id for s in registry.index.list_devices(
+            rfcontrol_pb2.ListDevicesRequest(min_frequency=150.0)).devices] == ["NEW"]
+    finally:
+        servicer.close()
+
+def test_table_devices_use_less_memory_in_a_registry(tmp_path):
+    """Measured with the fleet index and the journal attached, as the server runs them."""
+
+    def footprint(factory, directory, count=5000):
+        gc.collect()
+        tracemalloc.start()
+        registry = DeviceRegistry(factory, journal=StateJournal(str(directory), flush_interval=3600))
+        registry.restore()
+        for i in range(count):
+            with registry.acquire(f"DEV{i:05d}") as device:
+                device.apply(rfcontrol_pb2.RFConfig(frequency=100.0 + i, gain=1.0))
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        registry.close()
+        return size
+
+    table = footprint(DeviceTable(), tmp_path / "table")
+    simulated = footprint(SimulatedRFDevice, tmp_path / "simulated")
+    # Most of what is left is the registry's own entry per device
+    assert table < 0.7 * simulated
@@ -0,0 +1,113 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.config import ServerConfig
+from server.emulator import EmulatedRFDevice, Latency, LatencyModel, ScpiEmulator
+from server.drivers import create_device_factory
+import rfcontrol_pb2
+
+def _model(**kwargs):
+    return LatencyModel({
+        "command": Latency("fixed", ms=1.0),
+        "frequency": Latency("fixed", ms=4.0),
+        "query": Latency("fixed", ms=20.0),
+    }, **kwargs)
+
+def test_profile_parsing():
+    model = LatencyModel.from_dict({
+        "command": 0.5,
+        "frequency": {"dist": "uniform", "low_ms": 1.0, "high_ms": 2.0},
+        "gain": {"dist": "lognormal", "median_ms": 0.3, "sigma": 0.2},
+        "failure_rate": 0.01,
+        "seed": 7,
+    })
+    assert model.sample("command") == 0.0005
+    assert 0.001 <= model.sample("frequency") <= 0.002
+    assert model.sample("connect") == 0.0
+    assert model.failure_rate == 0.01
+    with pytest.raises(ValueError):
+        LatencyModel.from_dict({"reboot": 1.0})
+    with pytest.raises(ValueError):
+        Latency("gamma", ms=1.0)
+    with pytest.raises(KeyError):
+        Latency("normal", mean_ms=1.0)
+
+def test_settling_time_is_paid_only_for_changed_values(tmp_path):
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps({"command": 1.0, "frequency": 4.0}))
+    device = create_device_factory(ServerConfig(device_emulation=str(profile)))()
+    assert isinstance(device, EmulatedRFDevice)
+    device.connect("E01")
+    assert device.busy_time == pytest.approx(0.001)
+
+    assert device.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=0.0))
+    assert device.busy_time == pytest.approx(0.006)
+    assert device.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=0.0))
+    assert device.busy_time == pytest.approx(0.007)
+    # Rejected before reaching the instrument
+    assert not device.apply(rfcontrol_pb2.RFConfig(frequency=-1.0, gain=0.0))
+    assert device.transactions == 3
+
+def test_injected_faults_fail_without_changing_settings():
+    device = EmulatedRFDevice(_model())
+    device.connect("E02")
+    device.apply(rfcontrol_pb2.RFConfig(frequency=100.0, gain=1.0))
+    before = device.status
+
+    device.model = _model(failure_rate=1.0)
+    assert not device.apply(rfcontrol_pb2.RFConfig(frequency=200.0, gain=1.0))
+    assert device.last_error == "failure" and device.status == before
+
+    device.model = _model(timeout_rate=1.0, timeout_ms=30.0)
+    start = time.perf_counter()
+    assert not device.apply(rfcontrol_pb2.RFConfig(frequency=200.0, gain=1.0))
+    assert time.perf_counter() - start >= 0.03
+    assert device.last_error == "timeout" and device.status == before
+
+def test_command_bus_runs_one_transaction_at_a_time():
+    device = EmulatedRFDevice(_model())
+    device.connect("E03")
+    threads = [threading.Thread(target=device.get_idn) for _ in range(3)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - start >= 3 * 0.021
+
+def _session(port):
+    sock = socket.create_connection(("127.0.0.1", port))
+    reader = sock.makefile("r")
+
+    def ask(message, lines=1):
+        sock.sendall((message + "\n").encode())
+        replies = [reader.readline().rstrip("\n") for _ in range(lines)]
+        return replies[0] if lines == 1 else replies
+
+    return sock, ask
+
+def test_scpi_endpoint():
+    emulator = ScpiEmulator(port=0, model=_model()).start()
+    try:
+        sock, ask = _session(emulator.port)
+        with sock:
+            assert ask("SYST:ERR?") == '0,"No error"'
+            assert ask("FREQ 915;SYST:ERR?").startswith("-221,")
+            assert ask('INST:SEL "S01";FREQ 915.5;POW 12;*OPC?') == "1"
+            assert ask("SOUR:FREQ?;POW?", lines=2) == ["915.5", "12.0"]
+            assert ask("*IDN?") == "Emulated RF Device, s/n:S01, fw:1.0"
+            assert ask("FREQ -5;BOGUS 1;SYST:ERR?").startswith("-113,")
+            assert ask("SYST:ERR?").startswith("-222,")
+            assert ask("SYSTEM:STATUS?") == "OPERATING - Freq: 915.5MHz, Gain: 12.0dB"
+        assert emulator.registry.device_ids() == ["S01"]
+    finally:
+        emulator.stop()
@@ -0,0 +1,170 @@
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from client.rf_client import RFClient, list_request
+from server.config import ServerConfig
+from server.device_registry import DeviceRegistry
+from server.fleet_index import FleetQuery, _SortedKeys, merge_pages
+from server.server import add_servicer_to_server, create_servicer
+import rfcontrol_pb2
+
+def populate(registry, count=300):
+    """Device i is tuned to 100 + i % 50 MHz with gain i % 7; every tenth stays idle."""
+    for i in range(count):
+        with registry.acquire(f"DEV{i:04d}") as device:
+            if i % 10:
+                device.apply(rfcontrol_pb2.RFConfig(frequency=100.0 + i % 50, gain=float(i % 7)))
+
+def list_all(index, **query):
+    request = list_request(page_size=7, **query)
+    devices = []
+    while True:
+        response = index.list_devices(request)
+        devices.extend(response.devices)
+        if not response.next_page_token:
+            return devices
+        request.page_token = response.next_page_token
+
+def test_queries_match_a_full_scan_in_index_order():
+    registry = DeviceRegistry()
+    populate(registry)
+    snapshots = {}
+    for device_id in registry.device_ids():
+        with registry.acquire(device_id) as device:
+            snapshots[device_id] = device.snapshot()
+
+    def expected(predicate, key):
+        return sorted((i for i, s in snapshots.items() if predicate(i, s)), key=lambda i: key(i, snapshots[i]))
+
+    by_id = lambda i, s: i
+    by_frequency = lambda i, s: (s.frequency, i)
+    cases = [
+        (dict(), lambda i, s: True, by_id),
+        (dict(id_prefix="DEV01"), lambda i, s: i.startswith("DEV01"), by_id),
+        (dict(states=["IDLE"]), lambda i, s: s.state == "IDLE", by_id),
+        (dict(min_frequency=120.0, max_frequency=125.0),
+         lambda i, s: 120.0 <= s.frequency <= 125.0, by_frequency),
+        (dict(max_frequency=104.0, min_gain=5.0, states=["OPERATING"]),
+         lambda i, s: s.frequency <= 104.0 and s.gain >= 5.0 and s.state == "OPERATING", by_frequency),
+        (dict(min_gain=6.0), lambda i, s: s.gain >= 6.0, lambda i, s: (s.gain, i)),
+    ]
+    for query, predicate, key in cases:
+        assert [status.device_id for status in list_all(registry.index, **query)] == expected(predicate, key)
+
+    # Projection leaves out every field not asked for
+    (status,) = registry.index.list_devices(list_request(id_prefix="DEV0011", fields=["device_id", "gain"])).devices
+    assert status == rfcontrol_pb2.DeviceStatus(device_id="DEV0011", gain=4.0)
+
+def test_index_follows_status_changes_and_evictions():
+    registry = DeviceRegistry(idle_timeout=10.0)
+    populate(registry, count=20)
+    with registry.acquire("DEV0003") as device:
+        device.apply(rfcontrol_pb2.RFConfig(frequency=900.0, gain=1.0))
+    assert [s.device_id for s in list_all(registry.index, min_frequency=800.0)] == ["DEV0003"]
+
+    registry.evict_idle(now=float("inf"))
+    assert len(registry.index) == 0 and list_all(registry.index) == []
+    with registry.acquire("DEV0003"):
+        pass
+    (status,) = list_all(registry.index)
+    assert status.state == rfcontrol_pb2.DEVICE_STATE_IDLE and status.device_id == "DEV0003"
+
+def test_short_pages_and_merged_shards():
+    registries = [DeviceRegistry() for _ in range(3)]
+    whole = DeviceRegistry()
+    for i in range(200):
+        for registry in (registries[i % 3], whole):
+            with registry.acquire(f"D{i:03d}") as device:
+                device.apply(rfcontrol_pb2.RFConfig(frequency=float(i % 40), gain=0.0))
+
+    # A sparse match stops after max_scan entries with a token to go on from
+    query = FleetQuery(min_frequency=10.0, max_frequency=30.0, id_prefix="D19")
+    page, resume = whole.index.query(query, limit=100, max_scan=10)
+    assert len(page) < 5 and resume is not None
+
+    for query in (dict(), dict(min_frequency=5.0, max_frequency=12.0), dict(id_prefix="D1")):
+        request = list_request(page_size=9, **query)
+        merged = []
+        while True:
+            pages = [registry.index.list_devices(request) for registry in registries]
+            response = merge_pages(FleetQuery.from_request(request).order, pages, 9)
+            assert len(response.devices) <= 9
+            merged.extend(response.devices)
+            if not response.next_page_token:
+                break
+            request.page_token = response.next_page_token
+        assert [s.device_id for s in merged] == [s.device_id for s in list_all(whole.index, **query)]
+
+def test_list_devices_rpc():
+    servicer = create_servicer(ServerConfig(driver="table"))
+    populate(servicer.registry, count=50)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        client = RFClient(f"127.0.0.1:{port}")
+        band = list(client.list_devices(min_frequency=110.0, max_frequency=111.0, page_size=2,
+                                        fields=["device_id", "frequency"]))
+        # DEV0010 is idle; only DEV0011 is tuned within the band
+        assert [(s.device_id, s.frequency) for s in band] == [("DEV0011", 111.0)]
+        assert not band[0].HasField("updated_at")
+
+        with pytest.raises(grpc.RpcError) as error:
+            client.stub.ListDevices(rfcontrol_pb2.ListDevicesRequest(page_token="not-a-token"))
+        assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+        with pytest.raises(grpc.RpcError) as error:
+            list(client.list_devices(fields=["voltage"]))
+        assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    finally:
+        server.stop(0)
+        servicer.close()
+
+def test_queries_do_not_scan_the_fleet():
+    registry = DeviceRegistry()
+    populate(registry, count=20000)
+    request = list_request(min_frequency=121.0, max_frequency=121.5, min_gain=3.0, page_size=100)
+    start = time.perf_counter()
+    for _ in range(100):
+        response = registry.index.list_devices(request)
+    elapsed = (time.perf_counter() - start) / 100
+    assert len(response.devices) == 100 and response.next_page_token
+    # A full scan of 20000 devices takes several milliseconds
+    assert elapsed < 0.002
+
+def test_status_changes_update_the_index_cheaply():
+    registry = DeviceRegistry()
+    populate(registry, count=20000)
+    devices = []
+    for i in range(0, 20000, 4):
+        with registry.acquire(f"DEV{i:04d}") as device:
+            devices.append(device)
+    retunes = [rfcontrol_pb2.RFConfig(frequency=200.0 + i % 97, gain=float(i % 5)) for i in range(len(devices))]
+    start = time.perf_counter()
+    for device, config in zip(devices, retunes):
+        device.apply(config)
+    elapsed = (time.perf_counter() - start) / len(devices)
+    assert [s.device_id for s in list_all(registry.index, min_frequency=200.0, max_frequency=200.0)] == sorted(
+        f"DEV{i:04d}" for i in range(0, 20000, 4 * 97)
+    )
+    # Moving a key shifts one run of the index, not the whole fleet's entries
+    assert elapsed < 0.0001
+
+def test_sorted_keys_stay_sorted_across_runs():
+    keys = _SortedKeys()
+    values = [(float(i * 7919 % 5000), f"D{i}") for i in range(5000)]
+    for value in values:
+        keys.add(value)
+    for value in values[::3]:
+        keys.remove(value)
+    expected = sorted(set(values) - set(values[::3]))
+    assert list(keys.irange((-1.0,))) == expected and len(keys) == len(expected)
+    assert list(keys.irange(expected[100], inclusive=False)) == expected[101:]
@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.aio_server import AsyncRFControlServicer
+from server.config import ServerConfig
+from server.interceptors import (
+    REQUEST_ID_KEY, AsyncInterceptorChain, DeadlineHook, InterceptorChain, RejectRpc, RpcCall,
+    ServerHook, TracingHook, propagated_metadata,
+)
+from server.log_pipeline import request_id
+from server.server import RFControlServicer, add_servicer_to_server, create_server
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+class _Context:
+    """Just enough of a ServicerContext for the hooks."""
+
+    def __init__(self, metadata=(), remaining=None):
+        self.metadata = metadata
+        self.remaining = remaining
+        self.trailing = None
+
+    def invocation_metadata(self):
+        return self.metadata
+
+    def set_trailing_metadata(self, metadata):
+        self.trailing = metadata
+
+    def time_remaining(self):
+        return self.remaining
+
+def test_tracing_hook_sets_and_restores_request_id():
+    hook = TracingHook()
+    context = _Context(metadata=((REQUEST_ID_KEY, "abc"), ("traceparent", "00-1-2-01")))
+    call = RpcCall("SetRFSettings", context, streaming=False)
+    hook.start(call)
+    assert request_id.get() == "abc"
+    assert context.trailing == ((REQUEST_ID_KEY, "abc"),)
+    assert set(propagated_metadata()) == {(REQUEST_ID_KEY, "abc"), ("traceparent", "00-1-2-01")}
+    hook.finish(call, grpc.StatusCode.OK)
+    assert request_id.get() is None and propagated_metadata() == ()
+
+    generated = RpcCall("SetRFSettings", _Context(), streaming=False)
+    hook.start(generated)
+    assert len(generated.request_id) == 32
+    hook.finish(generated, grpc.StatusCode.OK)
+
+def test_deadline_hook_rejects_expired_calls():
+    hook = DeadlineHook()
+    hook.start(RpcCall("SetRFSettings", _Context(remaining=None), streaming=False))
+    hook.start(RpcCall("SetRFSettings", _Context(remaining=1.0), streaming=False))
+    with pytest.raises(RejectRpc) as rejected:
+        hook.start(RpcCall("SetRFSettings", _Context(remaining=0.0), streaming=False))
+    assert rejected.value.code == grpc.StatusCode.DEADLINE_EXCEEDED
+
+class _BlockingServicer(RFControlServicer):
+    """Holds SetRFSettings for device "BLOCK" until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.seen = []
+
+    def SetRFSettings(self, request, context):
+        self.seen.append((request.device_id, propagated_metadata()))
+        if request.device_id == "BLOCK":
+            self.entered.set()
+            self.release.wait(5)
+        return super().SetRFSettings(request, context)
+
+def _start(config, servicer):
+    server = create_server(config)
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, port
+
+def _config(device_id):
+    return rfcontrol_pb2.RFConfig(frequency=10.0, gain=1.0, device_id=device_id)
+
+def test_request_id_round_trip():
+    servicer = _BlockingServicer()
+    server, port = _start(ServerConfig(max_workers=2), servicer)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            _, call = stub.SetRFSettings.with_call(_config("T1"), metadata=((REQUEST_ID_KEY, "req-1"),))
+    finally:
+        server.stop(0)
+        servicer.close()
+    assert (REQUEST_ID_KEY, "req-1") in call.trailing_metadata()
+    assert servicer.seen == [("T1", ((REQUEST_ID_KEY, "req-1"),))]
+
+def test_overload_is_shed_and_expired_calls_skip_the_device():
+    servicer = _BlockingServicer()
+    server, port = _start(ServerConfig(max_workers=1, shed_queue_depth=1), servicer)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            blocked = stub.SetRFSettings.future(_config("BLOCK"))
+            assert servicer.entered.wait(5)
+            # Queued behind the blocked call until after its deadline
+            expired = stub.SetRFSettings.future(_config("LATE"), timeout=0.2)
+            queued = stub.SetRFSettings.future(_config("QUEUED"))
+            time.sleep(0.1)
+            with pytest.raises(grpc.RpcError) as shed:
+                stub.SetRFSettings(_config("SHED"))
+            assert shed.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+            time.sleep(0.2)
+            servicer.release.set()
+            assert blocked.result(timeout=5).success
+            assert queued.result(timeout=5).success
+            with pytest.raises(grpc.RpcError) as late:
+                expired.result()
+            assert late.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    finally:
+        servicer.release.set()
+        server.stop(0)
+        servicer.close()
+    assert [device_id for device_id, _ in servicer.seen] == ["BLOCK", "QUEUED"]
+    assert "LATE" not in servicer.registry
+
+def test_aio_chain_runs_custom_hooks():
+    class Recorder(ServerHook):
+        def __init__(self):
+            self.calls = []
+
+        def admit(self, method, metadata):
+            if method == "GetDeviceStatus":
+                raise RejectRpc(grpc.StatusCode.UNAVAILABLE, "maintenance")
+
+        def finish(self, call, code):
+            self.calls.append((call.method, code.name))
+
+    recorder = Recorder()
+
+    async def run():
+        server = grpc.aio.server(interceptors=[AsyncInterceptorChain([TracingHook(), recorder])])
+        servicer = AsyncRFControlServicer()
+        add_servicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+                call = stub.SetRFSettings(_config("A1"))
+                await call
+                trailing = await call.trailing_metadata()
+                with pytest.raises(grpc.RpcError) as rejected:
+                    await stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id="A1"))
+                return trailing, rejected.value.code()
+        finally:
+            await server.stop(0)
+            await servicer.close()
+
+    trailing, code = asyncio.run(run())
+    assert code == grpc.StatusCode.UNAVAILABLE
+    assert any(key == REQUEST_ID_KEY for key, _ in trailing)
+    assert recorder.calls == [("SetRFSettings", "OK"), ("GetDeviceStatus", "UNAVAILABLE")]
+
+def test_hooks_finish_when_a_returned_iterator_ends():
+    """A streaming method may return an iterator instead of being a generator itself."""
+
+    class Recorder(ServerHook):
+        def __init__(self):
+            self.events = []
+
+        def start(self, call):
+            self.events.append(("start", call.streaming))
+
+        def finish(self, call, code):
+            self.events.append(("finish", code.name))
+
+    class IteratorServicer(RFControlServicer):
+        def WatchDeviceStatus(self, request, context):
+            return self._statuses(request)
+
+        def _statuses(self, request):
+            recorder.events.append(("message", request_id.get() is not None))
+            yield rfcontrol_pb2.RFResponse(device_status="one")
+            recorder.events.append(("message", request_id.get() is not None))
+            yield rfcontrol_pb2.RFResponse(device_status="two")
+
+    recorder = Recorder()
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=2),
+        interceptors=[InterceptorChain([TracingHook(), recorder])],
+    )
+    servicer = IteratorServicer()
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            replies = list(stub.WatchDeviceStatus(rfcontrol_pb2.WatchStatusRequest(device_id="I1")))
+    finally:
+        server.stop(0)
+        servicer.close()
+    assert [r.device_status for r in replies] == ["one", "two"]
+    assert recorder.events == [
+        ("start", True), ("message", True), ("message", True), ("finish", "OK"),
+    ]
@@ -0,0 +1,31 @@
+import json
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import loadgen
+
+def test_loadgen_writes_results(tmp_path):
+    """A short in-process run reports every timed request and writes JSON."""
+    output = tmp_path / "results.json"
+    assert loadgen.main([
+        "--requests", "60", "--warmup", "10", "--concurrency", "8",
+        "--devices", "5", "--output", str(output),
+    ]) == 0
+
+    results = json.loads(output.read_text())
+    assert results["overall"]["count"] == 60
+    assert results["overall"]["errors"] == 0
+    assert set(results["methods"]) == {"SetRFSettings", "GetDeviceStatus"}
+    assert results["throughput_rps"] > 0
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {"throughput_rps": 1000.0, "overall": {"p50_ms": 1.0, "p99_ms": 10.0}}
+    same = {"throughput_rps": 950.0, "overall": {"p50_ms": 1.05, "p99_ms": 10.5}}
+    worse = {"throughput_rps": 800.0, "overall": {"p50_ms": 1.0, "p99_ms": 15.0}}
+
+    assert loadgen.compare_to_baseline(same, baseline, 0.10) == []
+    regressions = loadgen.compare_to_baseline(worse, baseline, 0.10)
+    assert [line.split(":")[0] for line in regressions] == ["throughput_rps", "p99_ms"]
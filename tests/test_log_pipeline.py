@@ -0,0 +1,95 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.log_pipeline import RPC_LOGGER, configure_logging, parse_levels, stop_logging
+
+@pytest.fixture
+def pipeline():
+    """Yields a function that configures the pipeline into a StringIO and returns it."""
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    touched = []
+    # Benchmarks run earlier in the session disable INFO globally
+    logging.disable(logging.NOTSET)
+
+    def configure(**kwargs):
+        stream = io.StringIO()
+        touched.extend((kwargs.get("levels") or {}).keys())
+        configure_logging(stream=stream, **kwargs)
+        return stream
+
+    yield configure
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in saved_handlers:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+    for name in touched:
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    logging.getLogger(RPC_LOGGER).filters.clear()
+
+class _Tracked:
+    """Argument that records which thread converted it to text."""
+
+    def __init__(self):
+        self.formatted_on = None
+
+    def __str__(self):
+        self.formatted_on = threading.current_thread()
+        return "tracked"
+
+def test_formatting_happens_on_listener_thread(pipeline):
+    stream = pipeline()
+    arg = _Tracked()
+    logging.getLogger("rfcontrol.test").info("value=%s", arg)
+    stop_logging()
+    assert "value=tracked" in stream.getvalue()
+    assert arg.formatted_on is not threading.current_thread()
+
+def test_per_logger_levels(pipeline):
+    stream = pipeline(level="INFO", levels={"rfcontrol.quiet": "WARNING", "rfcontrol.loud": "DEBUG"})
+    logging.getLogger("rfcontrol.quiet").info("hidden")
+    logging.getLogger("rfcontrol.loud").debug("shown")
+    stop_logging()
+    assert "hidden" not in stream.getvalue()
+    assert "shown" in stream.getvalue()
+
+def test_rpc_records_are_sampled_but_warnings_are_not(pipeline):
+    stream = pipeline(sample_every=10)
+    rpc_logger = logging.getLogger(RPC_LOGGER)
+    for i in range(100):
+        rpc_logger.info("request %d", i)
+    rpc_logger.warning("slow request")
+    stop_logging()
+    lines = stream.getvalue().splitlines()
+    assert sum("request " in line for line in lines) == 10
+    assert any("slow request" in line for line in lines)
+
+def test_json_format_includes_extra_fields(pipeline):
+    stream = pipeline(fmt="json")
+    logging.getLogger(RPC_LOGGER).info(
+        "Received %s", "SetRFSettings", extra={"rpc": "SetRFSettings", "device_id": "DEV7"}
+    )
+    stop_logging()
+    entry = json.loads(stream.getvalue().splitlines()[-1])
+    assert entry["msg"] == "Received SetRFSettings"
+    assert entry["logger"] == RPC_LOGGER
+    assert entry["device_id"] == "DEV7"
+
+def test_parse_levels():
+    assert parse_levels("rfcontrol.rpc=warning, rfcontrol.device=DEBUG") == {
+        "rfcontrol.rpc": "WARNING", "rfcontrol.device": "DEBUG"
+    }
+    assert parse_levels("") == {}
+    with pytest.raises(ValueError):
+        parse_levels("rfcontrol.rpc=LOUD")
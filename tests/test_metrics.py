@@ -0,0 +1,108 @@
+import asyncio
+import urllib.request
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.aio_server import AsyncRFControlServicer
+from server.interceptors import AsyncInterceptorChain, InterceptorChain, MetricsHook
+from server.metrics import Counter, Gauge, Histogram, MetricsRegistry, MetricsServer, ServerMetrics
+from server.server import RFControlServicer, add_servicer_to_server
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+def test_text_format():
+    registry = MetricsRegistry()
+    calls = registry.register(Counter("calls", "Calls made.", ["method"]))
+    depth = registry.register(Gauge("depth", "Queue depth."))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    calls.labels('Set"X"').inc()
+    calls.labels('Set"X"').inc(2)
+    depth.labels().set_function(lambda: 7)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels().observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE calls counter" in lines
+    assert 'calls_total{method="Set\\"X\\""} 3' in lines
+    assert "depth 7" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert "latency_seconds_count 4" in lines
+    with pytest.raises(ValueError):
+        calls.labels()
+
+def test_thread_server_records_rpcs_and_applies():
+    metrics = ServerMetrics()
+    servicer = RFControlServicer(metrics=metrics)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=4),
+        interceptors=[InterceptorChain([MetricsHook(metrics)])],
+    )
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    endpoint = MetricsServer(metrics, "127.0.0.1", 0).start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=10.0, gain=1.0, device_id="M01"))
+            stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=11.0, gain=1.0, device_id="M01"))
+            with pytest.raises(grpc.RpcError):
+                list(stub.Sweep(rfcontrol_pb2.SweepRequest(
+                    device_id="M01", start_frequency=1.0, stop_frequency=2.0, step_frequency=-1.0
+                )))
+        with urllib.request.urlopen(f"http://127.0.0.1:{endpoint.port}/metrics") as response:
+            content_type = response.headers["Content-Type"]
+            text = response.read().decode()
+    finally:
+        endpoint.stop()
+        server.stop(0)
+        servicer.close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    lines = text.splitlines()
+    assert 'rfcontrol_rpc_started_total{method="SetRFSettings"} 2' in lines
+    assert 'rfcontrol_rpc_handled_total{method="SetRFSettings",code="OK"} 2' in lines
+    assert 'rfcontrol_rpc_handled_total{method="Sweep",code="INVALID_ARGUMENT"} 1' in lines
+    assert 'rfcontrol_rpc_duration_seconds_count{method="SetRFSettings"} 2' in lines
+    assert 'rfcontrol_rpc_in_flight{method="SetRFSettings"} 0' in lines
+    assert 'rfcontrol_streams_active{method="Sweep"} 0' in lines
+    assert 'rfcontrol_device_apply_seconds_count 2' in lines
+    assert 'rfcontrol_queue_depth{queue="batch"} 0' in lines
+
+def test_aio_server_records_rpcs():
+    metrics = ServerMetrics()
+
+    async def run():
+        server = grpc.aio.server(interceptors=[AsyncInterceptorChain([MetricsHook(metrics)])])
+        servicer = AsyncRFControlServicer(metrics=metrics)
+        add_servicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+                await stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=1.0, gain=1.0, device_id="M02"))
+                updates = [rfcontrol_pb2.ControlUpdate(
+                    sequence=1, config=rfcontrol_pb2.RFConfig(frequency=2.0, gain=1.0, device_id="M02")
+                )]
+                [ack async for ack in stub.ControlSession(iter(updates))]
+        finally:
+            await server.stop(0)
+            await servicer.close()
+
+    asyncio.run(run())
+    lines = metrics.render().splitlines()
+    assert 'rfcontrol_rpc_handled_total{method="SetRFSettings",code="OK"} 1' in lines
+    assert 'rfcontrol_rpc_handled_total{method="ControlSession",code="OK"} 1' in lines
+    assert 'rfcontrol_streams_active{method="ControlSession"} 0' in lines
+    assert 'rfcontrol_device_apply_seconds_count 2' in lines
@@ -0,0 +1,151 @@
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.config import ServerConfig
+from server import multiproc
+from server.multiproc import ShardedRFControlServicer, create_peer_server, shard_for
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two sharded servicers in this process, each with a small public server and a peer server.
+
+    Yields a stub for worker 0's public server, the servicers and the
+    public addresses, all unix sockets.
+    """
+    peers = [f"unix:{tmp_path / f'worker-{i}.sock'}" for i in range(2)]
+    public = [f"unix:{tmp_path / f'public-{i}.sock'}" for i in range(2)]
+    servers, servicers = [], []
+    for index, address in enumerate(peers):
+        servicer = ShardedRFControlServicer(index, peers)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        rfcontrol_pb2_grpc.add_RFControlServicer_to_server(servicer, server)
+        server.add_insecure_port(public[index])
+        peer_server = create_peer_server(ServerConfig(max_workers=4), servicer, address)
+        for s in (server, peer_server):
+            s.start()
+            servers.append(s)
+        servicers.append(servicer)
+    channel = grpc.insecure_channel(public[0])
+    yield rfcontrol_pb2_grpc.RFControlStub(channel), servicers, public
+    channel.close()
+    for server in servers:
+        server.stop(0)
+    for servicer in servicers:
+        servicer.close()
+
+def _device_owned_by(owner, num_workers=2):
+    return next(
+        f"SHARD{i:03d}" for i in range(1000) if shard_for(f"SHARD{i:03d}", num_workers) == owner
+    )
+
+def test_shard_for_is_stable():
+    """Every process must agree on a device's owner."""
+    assert shard_for("DEV001", 4) == shard_for("DEV001", 4)
+    assert shard_for("", 4) == shard_for("DEV001", 4)
+    assert {shard_for(f"DEV{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+def test_requests_are_served_by_the_owning_worker(workers):
+    """Worker 0 forwards requests for worker 1's devices instead of driving them."""
+    stub, servicers, _ = workers
+    local, remote = _device_owned_by(0), _device_owned_by(1)
+
+    for device_id in (local, remote):
+        response = stub.SetRFSettings(
+            rfcontrol_pb2.RFConfig(frequency=100.0, gain=10.0, device_id=device_id)
+        )
+        assert response.device_status == "OPERATING - Freq: 100.0MHz, Gain: 10.0dB"
+
+    batch = stub.SetRFSettingsBatch(rfcontrol_pb2.RFConfigBatch(configs=[
+        rfcontrol_pb2.RFConfig(frequency=200.0, gain=20.0, device_id=remote),
+        rfcontrol_pb2.RFConfig(frequency=300.0, gain=30.0, device_id=local),
+    ]))
+    assert [r.device_status for r in batch.results] == [
+        "OPERATING - Freq: 200.0MHz, Gain: 20.0dB",
+        "OPERATING - Freq: 300.0MHz, Gain: 30.0dB",
+    ]
+
+    status = stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id=remote))
+    assert status.device_status == "OPERATING - Freq: 200.0MHz, Gain: 20.0dB"
+
+    assert servicers[0].registry.device_ids() == [local]
+    assert servicers[1].registry.device_ids() == [remote]
+
+def test_settings_scheduled_past_the_forward_timeout_are_forwarded(workers, monkeypatch):
+    """The owner holds a timed call open until execute_at, which may be past FORWARD_TIMEOUT."""
+    monkeypatch.setattr(multiproc, "FORWARD_TIMEOUT", 0.3)
+    stub, _, _ = workers
+    remote = _device_owned_by(1)
+
+    def timed(frequency):
+        config = rfcontrol_pb2.RFConfig(frequency=frequency, gain=1.0, device_id=remote)
+        config.execute_at.FromNanoseconds(int((time.time() + 0.8) * 1e9))
+        return config
+
+    response = stub.SetRFSettings(timed(150.0))
+    assert response.success and response.device_status == "OPERATING - Freq: 150.0MHz, Gain: 1.0dB"
+    batch = stub.SetRFSettingsBatch(rfcontrol_pb2.RFConfigBatch(configs=[
+        timed(250.0), rfcontrol_pb2.RFConfig(frequency=1.0, gain=1.0, device_id=_device_owned_by(0)),
+    ]))
+    assert [r.success for r in batch.results] == [True, True]
+    assert batch.results[0].device_status == "OPERATING - Freq: 250.0MHz, Gain: 1.0dB"
+
+def test_list_devices_merges_every_workers_devices(workers):
+    stub, servicers, _ = workers
+    configs = [
+        rfcontrol_pb2.RFConfig(frequency=float(900 - i), gain=1.0, device_id=f"SHARD{i:03d}")
+        for i in range(20)
+    ]
+    stub.SetRFSettingsBatch(rfcontrol_pb2.RFConfigBatch(configs=configs))
+    assert all(len(servicer.registry) for servicer in servicers)
+
+    request = rfcontrol_pb2.ListDevicesRequest(min_frequency=885.0, page_size=3)
+    request.fields.paths.append("device_id")
+    listed = []
+    while True:
+        response = stub.ListDevices(request)
+        assert len(response.devices) <= 3
+        listed.extend(status.device_id for status in response.devices)
+        if not response.next_page_token:
+            break
+        request.page_token = response.next_page_token
+    # Ordered by frequency across both workers
+    assert listed == [f"SHARD{i:03d}" for i in range(15, -1, -1)]
+
+def test_cross_shard_load_does_not_stall_the_workers(workers):
+    """Every public thread of both workers forwarding to the other must not deadlock them."""
+    _, servicers, public = workers
+    channels = [grpc.insecure_channel(address) for address in public]
+    stubs = [rfcontrol_pb2_grpc.RFControlStub(channel) for channel in channels]
+    # Worker 0 gets only requests for worker 1's devices, and the other way round
+    device_ids = [
+        [f"X{i:04d}" for i in range(400) if shard_for(f"X{i:04d}", 2) != worker][:40]
+        for worker in range(2)
+    ]
+
+    def call(worker, device_id):
+        return stubs[worker].SetRFSettings(
+            rfcontrol_pb2.RFConfig(frequency=100.0, gain=1.0, device_id=device_id), timeout=5
+        ).success
+
+    try:
+        with futures.ThreadPoolExecutor(max_workers=32) as pool:
+            results = [
+                pool.submit(call, worker, device_id)
+                for device_id_pair in zip(*device_ids)
+                for worker, device_id in enumerate(device_id_pair)
+            ]
+            assert all(result.result() for result in results)
+    finally:
+        for channel in channels:
+            channel.close()
+    assert len(servicers[0].registry) == len(servicers[1].registry) == 40
@@ -0,0 +1,108 @@
+import asyncio
+import marshal
+import threading
+import time
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.admin import AdminServicer, AsyncAdminServicer
+from server.config import ServerConfig
+from server.profiling import CPROFILE, SAMPLE, Profiler, StackSampler
+from server.server import RFControlServicer, add_servicer_to_server, create_server
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+def test_sampler_collapses_stacks_per_pool():
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=_spin, args=(stop,), name=f"spin-pool_{i}") for i in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    sampler = StackSampler(interval=0.002, thread_prefix="spin-pool")
+    sampler.start()
+    time.sleep(0.1)
+    sampler.stop()
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    assert sampler.samples > 0
+    lines = sampler.collapsed().splitlines()
+    assert lines and all(line.startswith("spin-pool;") for line in lines)
+    assert any("_spin (test_profiling.py:" in line for line in lines)
+    assert "samples" in sampler.summary()
+
+def test_profiler_runs_one_session_at_a_time(tmp_path):
+    profiler = Profiler()
+    profiler.begin(SAMPLE, interval=0.001)
+    with pytest.raises(RuntimeError):
+        profiler.begin(CPROFILE)
+    output = profiler.end(str(tmp_path))
+    assert output.format == "collapsed"
+    assert os.path.dirname(output.path) == str(tmp_path)
+    with pytest.raises(RuntimeError):
+        profiler.end()
+
+def test_admin_cprofiles_rpc_handlers_and_dumps_threads():
+    server = create_server(ServerConfig(max_workers=4, admin=True))
+    servicer = RFControlServicer()
+    add_servicer_to_server(servicer, server)
+    rfcontrol_pb2_grpc.add_AdminServicer_to_server(AdminServicer(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            admin = rfcontrol_pb2_grpc.AdminStub(channel)
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            profile = admin.Profile.future(
+                rfcontrol_pb2.ProfileRequest(mode=rfcontrol_pb2.ProfileRequest.CPROFILE, seconds=0.5)
+            )
+            time.sleep(0.1)
+            for i in range(3):
+                stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=10.0 + i, gain=1.0, device_id="P01"))
+            with pytest.raises(grpc.RpcError) as busy:
+                admin.Profile(rfcontrol_pb2.ProfileRequest(seconds=0.1))
+            result = profile.result(timeout=5)
+            dump = admin.DumpThreads(rfcontrol_pb2.ThreadDumpRequest(thread_prefix="rf-rpc"))
+    finally:
+        server.stop(0)
+        servicer.close()
+
+    assert busy.value.code() == grpc.StatusCode.FAILED_PRECONDITION
+    assert result.format == "pstats" and result.pid == os.getpid()
+    # The three SetRFSettings calls and the turned-away Profile call
+    assert result.samples == 4
+    stats = marshal.loads(result.data)
+    assert any(name == "SetRFSettings" for _, _, name in stats)
+    assert dump.threads and all(thread.name.startswith("rf-rpc") for thread in dump.threads)
+    assert any("DumpThreads" in thread.stack for thread in dump.threads)
+
+def test_aio_admin_profiles_the_event_loop():
+    async def run():
+        server = grpc.aio.server()
+        rfcontrol_pb2_grpc.add_AdminServicer_to_server(AsyncAdminServicer(), server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                admin = rfcontrol_pb2_grpc.AdminStub(channel)
+                return await admin.Profile(rfcontrol_pb2.ProfileRequest(
+                    mode=rfcontrol_pb2.ProfileRequest.CPROFILE, seconds=0.1
+                ))
+        finally:
+            await server.stop(0)
+
+    result = asyncio.run(run())
+    assert result.format == "pstats" and result.samples == 1
+    assert "function calls" in result.summary
@@ -0,0 +1,64 @@
+import threading
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.rf_device import RFDevice, SimulatedRFDevice
+import rfcontrol_pb2
+
+def connected_device():
+    device = SimulatedRFDevice()
+    device.connect("DEV-T")
+    return device
+
+def test_apply_sets_both_values_with_one_status_change():
+    device = connected_device()
+    changes = []
+    device.add_listener(changes.append)
+
+    assert device.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=20.0)) is True
+    assert changes == ["OPERATING - Freq: 915.0MHz, Gain: 20.0dB"]
+    assert device.status == changes[-1]
+
+def test_apply_rejects_invalid_values_without_partial_changes():
+    device = connected_device()
+    device.apply(rfcontrol_pb2.RFConfig(frequency=100.0, gain=5.0))
+    before = device.status
+
+    assert device.apply(rfcontrol_pb2.RFConfig(frequency=200.0, gain=float("nan"))) is False
+    assert device.apply(rfcontrol_pb2.RFConfig(frequency=-1.0, gain=10.0)) is False
+    assert device.status == before
+
+def test_apply_fails_when_disconnected():
+    device = SimulatedRFDevice()
+    assert device.apply(rfcontrol_pb2.RFConfig(frequency=100.0, gain=5.0)) is False
+    assert device.status == "DISCONNECTED"
+
+def test_base_driver_answers_idn_with_its_id():
+    device = RFDevice()
+    assert device.get_idn() == "No device connected."
+    device.connect("DEV-B")
+    assert device.get_idn() == "RF Device, s/n:DEV-B"
+
+def test_concurrent_applies_never_mix_settings():
+    """Every status seen matches one of the submitted (frequency, gain) pairs."""
+    device = connected_device()
+    seen = []
+    device.add_listener(seen.append)
+    pairs = [(100.0 + i, float(i)) for i in range(8)]
+
+    def hammer(freq, gain):
+        config = rfcontrol_pb2.RFConfig(frequency=freq, gain=gain)
+        for _ in range(200):
+            device.apply(config)
+
+    threads = [threading.Thread(target=hammer, args=pair) for pair in pairs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    allowed = {f"OPERATING - Freq: {freq}MHz, Gain: {gain}dB" for freq, gain in pairs}
+    assert seen and set(seen) <= allowed
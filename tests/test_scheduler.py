@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from client.rf_client import rf_config
+from server.aio_server import AsyncRFControlServicer
+from server.scheduler import MAX_SCHEDULE_AHEAD, ApplyScheduler
+from server.server import RFControlServicer, add_servicer_to_server
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+def test_jobs_run_in_deadline_order():
+    scheduler = ApplyScheduler()
+    ran = []
+    now = time.perf_counter()
+    try:
+        jobs = [
+            scheduler.schedule(now + delay, lambda name=name: ran.append(name) or time.perf_counter())
+            for name, delay in [("c", 0.03), ("a", 0.01), ("b", 0.02)]
+        ]
+        finished = [job.result(timeout=2) for job in jobs]
+    finally:
+        scheduler.close()
+    assert ran == ["a", "b", "c"]
+    assert finished[0] >= now + 0.03
+
+def test_cancelled_and_closed_jobs_do_not_run():
+    scheduler = ApplyScheduler()
+    ran = []
+    now = time.perf_counter()
+    dropped = scheduler.schedule(now + 0.02, lambda: ran.append("dropped"))
+    kept = scheduler.schedule(now + 0.03, lambda: ran.append("kept"))
+    pending = scheduler.schedule(now + 60, lambda: ran.append("pending"))
+    assert dropped.cancel()
+    kept.result(timeout=2)
+    scheduler.close()
+    assert ran == ["kept"]
+    assert pending.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.schedule(now, lambda: None)
+
+def test_thousands_of_pending_jobs():
+    executor = futures.ThreadPoolExecutor(max_workers=4)
+    scheduler = ApplyScheduler(executor)
+    count = 5000
+    ran = []
+    lock = threading.Lock()
+
+    def job(i):
+        with lock:
+            ran.append(i)
+
+    start = time.perf_counter()
+    try:
+        jobs = [scheduler.schedule(start + 0.05 + (i % 50) / 1000, lambda i=i: job(i)) for i in range(count)]
+        futures.wait(jobs, timeout=10)
+    finally:
+        scheduler.close()
+        executor.shutdown()
+    assert len(ran) == count
+    assert len(scheduler) == 0
+
+def test_set_rf_settings_at_a_time():
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            at = time.time() + 0.1
+            response = stub.SetRFSettings(rf_config(144.0, 5.0, "TIMED01", at))
+            finished = time.time()
+            batch = stub.SetRFSettingsBatch(rfcontrol_pb2.RFConfigBatch(configs=[
+                rf_config(145.0, 5.0, "TIMED01", time.time() + 0.05),
+                rf_config(146.0, 5.0, "TIMED02"),
+                rf_config(147.0, 5.0, "TIMED02", time.time() + 2 * MAX_SCHEDULE_AHEAD),
+            ]))
+            with pytest.raises(grpc.RpcError) as error:
+                stub.SetRFSettings(rf_config(1.0, 1.0, "TIMED01", time.time() + 2 * MAX_SCHEDULE_AHEAD))
+            assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    finally:
+        server.stop(0)
+        servicer.close()
+
+    assert response.success and response.device_status == "OPERATING - Freq: 144.0MHz, Gain: 5.0dB"
+    assert finished >= at
+    assert 0.0 <= response.apply_error_us < 100_000
+    assert [r.success for r in batch.results] == [True, True, False]
+    assert batch.results[0].device_status == "OPERATING - Freq: 145.0MHz, Gain: 5.0dB"
+    assert batch.results[0].apply_error_us >= 0.0
+    assert "ahead" in batch.results[2].device_status
+
+def test_aio_control_session_at_a_time():
+    async def run():
+        server = grpc.aio.server()
+        servicer = AsyncRFControlServicer()
+        add_servicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+                at = time.time() + 0.05
+                updates = [
+                    rfcontrol_pb2.ControlUpdate(sequence=1, config=rf_config(50.0, 1.0, "TIMED03", at)),
+                    rfcontrol_pb2.ControlUpdate(sequence=2, config=rf_config(51.0, 1.0, "TIMED03")),
+                ]
+                acks = [ack async for ack in stub.ControlSession(iter(updates))]
+                return acks, at, time.time()
+        finally:
+            await server.stop(0)
+            await servicer.close()
+
+    acks, at, finished = asyncio.run(run())
+    assert [ack.sequence for ack in acks] == [1, 2]
+    assert all(ack.success for ack in acks)
+    assert acks[0].apply_error_us >= 0.0
+    assert acks[1].device_status == "OPERATING - Freq: 51.0MHz, Gain: 1.0dB"
+    assert finished >= at
@@ -0,0 +1,131 @@
+import asyncio
+import socket
+import threading
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.aio_server import AsyncRFControlServicer
+from server.config import ServerConfig
+from server.device_registry import AsyncDeviceRegistry
+from server.drivers import create_device_factory
+from server.emulator import Latency, LatencyModel, ScpiEmulator
+from server.scpi import ScpiConnection, ScpiPool, ScpiRFDevice
+from server.server import add_servicer_to_server, create_servicer
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+@pytest.fixture
+def emulator():
+    model = LatencyModel({"command": Latency("fixed", ms=1.0)})
+    emulator = ScpiEmulator(port=0, model=model).start()
+    yield emulator
+    emulator.stop()
+
+def test_pipelined_requests_get_their_own_replies(emulator):
+    connection = ScpiConnection("127.0.0.1", emulator.port, instrument="P01")
+    try:
+        # Sent back to back without waiting for the replies in between
+        requests = [connection.request(f"FREQ {100 + i};FREQ?") for i in range(50)]
+        assert [future.result(5) for future in requests] == [[f"{100 + i:.1f}"] for i in range(50)]
+        assert connection.request("*OPC?;SYST:ERR?", replies=2).result(5) == ["1", '0,"No error"']
+    finally:
+        connection.close()
+    with pytest.raises(ConnectionError):
+        connection.request("*OPC?")
+
+def test_pool_reuses_and_replaces_connections(emulator):
+    pool = ScpiPool(f"127.0.0.1:{emulator.port}", "P02", size=2)
+    try:
+        assert pool.query("*IDN?") == ["Emulated RF Device, s/n:P02, fw:1.0"]
+        first = pool._connections[0]
+        assert pool.query("*OPC?") == ["1"]
+        assert pool._connections == [first]
+
+        threads = [threading.Thread(target=pool.query, args=("*IDN?",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert 1 <= len(pool._connections) <= 2
+
+        for connection in pool._connections:
+            connection.close()
+        assert pool.query("*OPC?") == ["1"]
+    finally:
+        pool.close()
+
+def test_timeout_closes_the_connection():
+    listener = socket.create_server(("127.0.0.1", 0))
+    pool = ScpiPool(f"127.0.0.1:{listener.getsockname()[1]}", size=1, timeout=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            pool.query("*IDN?")
+        assert all(connection.closed for connection in pool._connections)
+    finally:
+        pool.close()
+        listener.close()
+
+def test_driver_applies_settings_and_reports_instrument_errors(emulator):
+    config = ServerConfig(driver="scpi", scpi_address=f"127.0.0.1:{emulator.port}")
+    device = create_device_factory(config)()
+    assert isinstance(device, ScpiRFDevice)
+    assert device.connect("D01")
+    try:
+        assert device.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=20.0))
+        assert device.get_idn() == "Emulated RF Device, s/n:D01, fw:1.0"
+        with emulator.registry.acquire("D01") as instrument:
+            assert (instrument.snapshot().frequency, instrument.snapshot().gain) == (915.0, 20.0)
+            instrument.model = LatencyModel(failure_rate=1.0)
+        before = device.status
+        assert not device.apply(rfcontrol_pb2.RFConfig(frequency=916.0, gain=20.0))
+        assert device.status == before
+    finally:
+        device.disconnect()
+
+def test_unreachable_instrument_fails_to_connect():
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    listener.close()
+    device = ScpiRFDevice(f"127.0.0.1:{port}")
+    assert not device.connect("D02")
+    assert device.status == "DISCONNECTED"
+    with pytest.raises(ValueError):
+        ServerConfig(driver="visa").validate()
+
+def test_servers_drive_scpi_instruments(emulator):
+    config = ServerConfig(driver="scpi", scpi_address=f"127.0.0.1:{emulator.port}")
+    servicer = create_servicer(config)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            response = stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=433.0, gain=3.0, device_id="G01"))
+    finally:
+        server.stop(0)
+        servicer.close()
+    assert response.success
+
+    async def run():
+        registry = AsyncDeviceRegistry(create_device_factory(config))
+        servicer = AsyncRFControlServicer(registry)
+        try:
+            async with registry.acquire("G02") as device:
+                # Socket I/O runs on an executor, off the event loop
+                assert device._blocking
+                return await device.apply(rfcontrol_pb2.RFConfig(frequency=868.0, gain=1.0))
+        finally:
+            await servicer.close()
+
+    assert asyncio.run(run())
+    with emulator.registry.acquire("G01") as instrument:
+        assert instrument.snapshot().frequency == 433.0
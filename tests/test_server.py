@@ -1,3 +1,6 @@
+import threading
+import time
+
 import pytest
 from unittest.mock import MagicMock, patch
 import grpc
@@ -8,15 +11,16 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
 from server.server import RFControlServicer
+from server.device_registry import DeviceRegistry
 import rfcontrol_pb2
 
 @pytest.fixture
 def servicer():
     """Fixture to create an RFControlServicer with a mocked device."""
     with patch('server.rf_device.SimulatedRFDevice') as MockDevice:
-        # The servicer __init__ creates an instance, so we mock the class
+        # The registry creates devices on demand, so hand it the mock instance
         mock_instance = MockDevice.return_value
-        service = RFControlServicer()
+        service = RFControlServicer(registry=DeviceRegistry(device_factory=lambda: mock_instance))
         # Attach the mock instance to the service for inspection in tests
         service.device = mock_instance 
         yield service
@@ -25,8 +29,7 @@ def test_set_rf_settings_success(servicer):
     """Test the SetRFSettings RPC call with successful device operations."""
     # Arrange
     mock_device = servicer.device
-    mock_device.set_frequency.return_value = True
-    mock_device.set_gain.return_value = True
+    mock_device.apply.return_value = True
     mock_device.status = "OPERATING - Freq: 100.0MHz, Gain: 10.0dB"
 
     request = rfcontrol_pb2.RFConfig(
@@ -40,8 +43,7 @@ def test_set_rf_settings_success(servicer):
     response = servicer.SetRFSettings(request, context)
 
     # Assert
-    mock_device.set_frequency.assert_called_once_with(100.0)
-    mock_device.set_gain.assert_called_once_with(10.0)
+    mock_device.apply.assert_called_once_with(request)
     assert response.success is True
     assert response.device_status == "OPERATING - Freq: 100.0MHz, Gain: 10.0dB"
     context.set_code.assert_not_called()
@@ -50,8 +52,7 @@ def test_set_rf_settings_failure(servicer):
     """Test the SetRFSettings RPC call when a device operation fails."""
     # Arrange
     mock_device = servicer.device
-    mock_device.set_frequency.return_value = False  # Simulate failure
-    mock_device.set_gain.return_value = True
+    mock_device.apply.return_value = False  # Simulate failure
     mock_device.status = "CONNECTED - IDLE"
 
     request = rfcontrol_pb2.RFConfig(
@@ -65,9 +66,113 @@ def test_set_rf_settings_failure(servicer):
     response = servicer.SetRFSettings(request, context)
 
     # Assert
-    mock_device.set_frequency.assert_called_once_with(200.0)
-    mock_device.set_gain.assert_called_once_with(15.0)
+    mock_device.apply.assert_called_once_with(request)
     assert response.success is False
     assert response.device_status == "CONNECTED - IDLE"
     context.set_code.assert_called_once_with(grpc.StatusCode.INTERNAL)
     context.set_details.assert_called_once()
+
+def test_set_rf_settings_batch_applies_each_item():
+    """Test that a batch returns one result per item, in request order."""
+    # Arrange
+    service = RFControlServicer()
+    request = rfcontrol_pb2.RFConfigBatch(configs=[
+        rfcontrol_pb2.RFConfig(frequency=100.0, gain=10.0, device_id="BATCH01"),
+        rfcontrol_pb2.RFConfig(frequency=200.0, gain=20.0, device_id="BATCH02"),
+        rfcontrol_pb2.RFConfig(frequency=300.0, gain=30.0, device_id="BATCH01"),
+    ])
+    context = MagicMock()
+
+    # Act
+    response = service.SetRFSettingsBatch(request, context)
+    service.close()
+
+    # Assert
+    assert [r.success for r in response.results] == [True, True, True]
+    assert [r.device_status for r in response.results] == [
+        "OPERATING - Freq: 100.0MHz, Gain: 10.0dB",
+        "OPERATING - Freq: 200.0MHz, Gain: 20.0dB",
+        "OPERATING - Freq: 300.0MHz, Gain: 30.0dB",
+    ]
+    context.set_code.assert_not_called()
+
+def test_watch_device_status_streams_changes():
+    """Test that WatchDeviceStatus sends the current status, then each change."""
+    # Arrange
+    service = RFControlServicer()
+    context = MagicMock()
+    context.is_active.return_value = True
+    stream = service.WatchDeviceStatus(
+        rfcontrol_pb2.WatchStatusRequest(device_id="WATCH02"), context
+    )
+
+    # Act
+    first = next(stream)
+    service.SetRFSettings(
+        rfcontrol_pb2.RFConfig(frequency=100.0, gain=10.0, device_id="WATCH02"), MagicMock()
+    )
+    second = next(stream)
+    stream.close()
+
+    # Assert
+    assert first.device_status == "CONNECTED - IDLE"
+    assert second.device_status == "OPERATING - Freq: 100.0MHz, Gain: 10.0dB"
+    assert len(service.registry._entries["WATCH02"].broadcaster) == 0
+    service.close()
+
+def test_control_session_acks_updates_in_order():
+    """Test that ControlSession applies updates in order and echoes sequence numbers."""
+    # Arrange
+    service = RFControlServicer()
+    updates = [
+        rfcontrol_pb2.ControlUpdate(
+            sequence=seq,
+            config=rfcontrol_pb2.RFConfig(frequency=freq, gain=12.0, device_id="HOP01")
+        )
+        for seq, freq in ((7, 902.0), (8, 915.0), (9, 927.5))
+    ]
+
+    # Act
+    acks = list(service.ControlSession(iter(updates), MagicMock()))
+    service.close()
+
+    # Assert
+    assert [ack.sequence for ack in acks] == [7, 8, 9]
+    assert all(ack.success for ack in acks)
+    assert acks[-1].device_status == "OPERATING - Freq: 927.5MHz, Gain: 12.0dB"
+
+def test_conditional_get_device_status_and_long_poll():
+    """GetDeviceStatus answers not_modified until the generation moves past if_newer_than."""
+    service = RFControlServicer()
+    context = MagicMock()
+    context.time_remaining.return_value = None
+
+    current = service.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id="POLL01"), context)
+    generation = current.status.generation
+    unchanged = service.GetDeviceStatus(
+        rfcontrol_pb2.DeviceStatusRequest(device_id="POLL01", if_newer_than=generation), context
+    )
+    assert unchanged.not_modified and not unchanged.device_status
+
+    # A long poll times out with not_modified when nothing changes...
+    timed_out = service.GetDeviceStatus(
+        rfcontrol_pb2.DeviceStatusRequest(device_id="POLL01", if_newer_than=generation, wait_ms=50),
+        context,
+    )
+    assert timed_out.not_modified
+
+    # ...and returns the new status as soon as something does
+    threading.Timer(0.05, service.SetRFSettings, args=(
+        rfcontrol_pb2.RFConfig(frequency=144.0, gain=2.0, device_id="POLL01"), MagicMock()
+    )).start()
+    start = time.monotonic()
+    changed = service.GetDeviceStatus(
+        rfcontrol_pb2.DeviceStatusRequest(device_id="POLL01", if_newer_than=generation, wait_ms=5000),
+        context,
+    )
+    assert time.monotonic() - start < 2
+    assert not changed.not_modified
+    assert changed.status.generation > generation
+    assert changed.device_status == "OPERATING - Freq: 144.0MHz, Gain: 2.0dB"
+    assert len(service.registry._entries["POLL01"].broadcaster) == 0
+    service.close()
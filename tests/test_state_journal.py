@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+# Add project root to path to allow imports
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.device_registry import AsyncDeviceRegistry, DeviceRegistry
+from server.state_journal import JOURNAL_FILE, StateJournal
+import rfcontrol_pb2
+
+def _journal(path, **kwargs):
+    # Flushed by hand in these tests
+    return StateJournal(str(path), flush_interval=3600, **kwargs)
+
+def test_journal_survives_a_crash_with_a_torn_record(tmp_path):
+    journal = _journal(tmp_path)
+    assert journal.load() == {}
+    journal.record("A", 915.0, 20.0)
+    journal.record("B", 433.0, 1.0)
+    journal.record("A", 916.0, 21.0)
+    journal.forget("B")
+    journal._flush()
+    # Killed mid-write: half a record at the end, and no close()
+    with open(tmp_path / JOURNAL_FILE, "ab") as f:
+        f.write(b"\x01\x00\x00")
+
+    states = _journal(tmp_path).load()
+    assert list(states) == ["A"]
+    assert (states["A"].frequency, states["A"].gain) == (916.0, 21.0)
+
+def test_compaction_writes_a_snapshot_and_starts_a_new_journal(tmp_path):
+    journal = _journal(tmp_path, compact_every=3)
+    journal.load()
+    for i in range(4):
+        journal.record(f"D{i}", 100.0 + i, 0.0)
+    journal._flush()
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) == 0
+    journal.record("D0", 50.0, 5.0)
+    journal._flush()
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) > 0
+    journal.close()
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) == 0
+
+    states = _journal(tmp_path).load()
+    assert sorted(states) == ["D0", "D1", "D2", "D3"]
+    assert states["D0"][:2] == (50.0, 5.0)
+
+def test_registry_restores_devices_and_their_settings(tmp_path):
+    registry = DeviceRegistry(journal=_journal(tmp_path))
+    registry.restore()
+    for device_id, frequency in (("R1", 915.0), ("R2", 868.0), ("IDLE", 1.0)):
+        with registry.acquire(device_id) as device:
+            device.apply(rfcontrol_pb2.RFConfig(frequency=frequency, gain=10.0))
+    # Evicted as idle: not brought back
+    registry._entries["IDLE"].last_used = 0.0
+    registry.evict_idle()
+    registry.close()
+
+    lazy = DeviceRegistry(journal=_journal(tmp_path))
+    assert lazy.restore() == 2
+    assert sorted(lazy.device_ids()) == ["R1", "R2"]
+    assert lazy._entries["R1"].device.status == "DISCONNECTED"
+    with lazy.acquire("R1") as device:
+        assert (device.snapshot().frequency, device.snapshot().gain) == (915.0, 10.0)
+    lazy.close()
+
+    eager = DeviceRegistry(journal=_journal(tmp_path))
+    eager.restore(reapply=True, max_workers=4)
+    assert all(entry.connected for entry in eager._entries.values())
+    assert eager._entries["R2"].device.status == "OPERATING - Freq: 868.0MHz, Gain: 10.0dB"
+    eager.close()
+
+def test_async_registry_reapplies_in_parallel(tmp_path):
+    journal = _journal(tmp_path)
+    journal.load()
+    for i in range(20):
+        journal.record(f"A{i}", 100.0 + i, 2.0)
+    journal.close()
+
+    async def run():
+        registry = AsyncDeviceRegistry(journal=_journal(tmp_path))
+        await registry.restore(reapply=True)
+        statuses = {device_id: registry._entries[device_id].device.snapshot() for device_id in registry.device_ids()}
+        await registry.close()
+        return statuses
+
+    statuses = asyncio.run(run())
+    assert len(statuses) == 20
+    assert statuses["A7"].frequency == 107.0 and statuses["A7"].state == "OPERATING"
+
+def test_pending_records_stay_bounded(tmp_path):
+    previous = _journal(tmp_path)
+    previous.load()
+    previous.record("GONE", 1.0, 1.0)
+    previous.close()
+    journal = _journal(tmp_path, compact_every=5)
+    # Before load(), changes are merged into the loaded states instead of queued
+    journal.record("EARLY", 1.0, 1.0)
+    journal.forget("GONE")
+    assert journal._pending == []
+    journal.load()
+    assert len(journal) == 1
+
+    for i in range(50):
+        journal.record(f"D{i}", 100.0 + i, 0.0)
+    assert len(journal._pending) <= 5
+    journal._flush()
+    journal.close()
+    states = _journal(tmp_path).load()
+    assert len(states) == 51 and states["D49"].frequency == 149.0
@@ -0,0 +1,76 @@
+from concurrent import futures
+
+import grpc
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.rf_device import SimulatedRFDevice
+from server.server import RFControlServicer, add_servicer_to_server
+from server.status_cache import StatusResponseCache, serialize_response
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+def test_snapshot_changes_only_with_status():
+    device = SimulatedRFDevice()
+    initial = device.snapshot()
+    device.connect("SNAP01")
+    idle = device.snapshot()
+    assert idle is not initial and idle.generation > initial.generation
+    assert (idle.state, idle.device_id, idle.status) == ("IDLE", "SNAP01", "CONNECTED - IDLE")
+
+    device.apply(rfcontrol_pb2.RFConfig(frequency=433.0, gain=7.0))
+    operating = device.snapshot()
+    device.apply(rfcontrol_pb2.RFConfig(frequency=433.0, gain=7.0))
+    assert device.snapshot() is operating
+    assert (operating.state, operating.frequency, operating.gain) == ("OPERATING", 433.0, 7.0)
+
+def test_generations_are_not_reused_by_a_new_device():
+    first = SimulatedRFDevice()
+    first.connect("SAME")
+    second = SimulatedRFDevice()
+    second.connect("SAME")
+    assert second.snapshot().generation > first.snapshot().generation
+
+def test_cache_builds_one_response_per_snapshot():
+    device = SimulatedRFDevice()
+    device.connect("CACHE01")
+    cache = StatusResponseCache()
+
+    response = cache.get(device.snapshot())
+    assert cache.get(device.snapshot()) is response
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert serialize_response(response) == response.SerializeToString()
+    assert response.status.state == rfcontrol_pb2.DEVICE_STATE_IDLE
+    assert response.status.device_id == "CACHE01"
+
+    device.apply(rfcontrol_pb2.RFConfig(frequency=915.0, gain=20.0))
+    updated = cache.get(device.snapshot())
+    assert updated is not response
+    assert updated.device_status == "OPERATING - Freq: 915.0MHz, Gain: 20.0dB"
+    assert updated.status.generation > response.status.generation
+
+def test_get_device_status_over_grpc_returns_structured_status():
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            stub.SetRFSettings(rfcontrol_pb2.RFConfig(frequency=99.5, gain=3.0, device_id="GRPC01"))
+            first = stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id="GRPC01"))
+            second = stub.GetDeviceStatus(rfcontrol_pb2.DeviceStatusRequest(device_id="GRPC01"))
+    finally:
+        server.stop(0)
+        servicer.close()
+
+    assert first == second
+    assert first.device_status == "OPERATING - Freq: 99.5MHz, Gain: 3.0dB"
+    assert first.status.state == rfcontrol_pb2.DEVICE_STATE_OPERATING
+    assert (first.status.frequency, first.status.gain) == (99.5, 3.0)
+    assert first.status.updated_at.seconds > 0
+    assert servicer._status_cache.hits >= 1
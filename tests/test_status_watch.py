@@ -0,0 +1,50 @@
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.device_registry import DeviceRegistry
+from server.status_watch import StatusBroadcaster
+
+def test_slow_subscriber_only_sees_latest_status():
+    """Publishing never blocks; undelivered updates are replaced by newer ones."""
+    broadcaster = StatusBroadcaster()
+    subscription = broadcaster.subscribe()
+
+    for i in range(100):
+        broadcaster.publish(f"status {i}")
+
+    assert subscription.next(timeout=0) == "status 99"
+    assert subscription.coalesced == 99
+    assert subscription.next(timeout=0) is None
+
+def test_closed_subscription_stops_receiving():
+    """Closing detaches the subscription and wakes a blocked watcher."""
+    broadcaster = StatusBroadcaster()
+    subscription = broadcaster.subscribe()
+    subscription.close()
+
+    broadcaster.publish("ignored")
+    assert len(broadcaster) == 0
+    assert subscription.next(timeout=1) is None
+    assert subscription.sleep(1) is False
+
+def test_registry_subscription_follows_device_changes():
+    """A subscription starts with the current status and sees only real changes."""
+    registry = DeviceRegistry()
+    subscription = registry.subscribe("WATCH01")
+    assert subscription.next(timeout=0) == "CONNECTED - IDLE"
+
+    with registry.acquire("WATCH01") as device:
+        device.set_frequency(100.0)
+    assert subscription.next(timeout=0) == "OPERATING - Freq: 100.0MHz, Gain: 0.0dB"
+
+    # Re-applying the same value is not a change
+    with registry.acquire("WATCH01") as device:
+        device.set_frequency(100.0)
+    assert subscription.next(timeout=0) is None
+
+    # Watched devices are never evicted
+    assert registry.evict_idle(now=float("inf")) == 0
+    subscription.close()
+    assert registry.evict_idle(now=float("inf")) == 1
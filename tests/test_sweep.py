@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+# Add project root to path to allow imports
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from server.aio_server import AsyncRFControlServicer
+from server.rf_device import SimulatedRFDevice
+from server.server import RFControlServicer, add_servicer_to_server
+from server.sweep import MAX_SWEEP_STEPS, run_sweep, sweep_frequencies
+from server.timing import sleep_until
+import rfcontrol_pb2
+import rfcontrol_pb2_grpc
+
+def test_sweep_frequencies_include_stop_and_go_both_ways():
+    assert sweep_frequencies(100.0, 100.3, 0.1) == pytest.approx([100.0, 100.1, 100.2, 100.3])
+    assert sweep_frequencies(5.0, 1.0, 2.0) == [5.0, 3.0, 1.0]
+    assert sweep_frequencies(7.0, 7.0, 0.0) == [7.0]
+    with pytest.raises(ValueError):
+        sweep_frequencies(1.0, 2.0, 0.0)
+    with pytest.raises(ValueError):
+        sweep_frequencies(0.0, MAX_SWEEP_STEPS + 1.0, 1.0)
+
+def test_sleep_until_is_cancellable():
+    cancelled = threading.Event()
+    threading.Timer(0.05, cancelled.set).start()
+    start = time.perf_counter()
+    assert sleep_until(start + 5.0, cancelled) is False
+    assert time.perf_counter() - start < 1.0
+    assert sleep_until(time.perf_counter() + 0.003) is True
+
+def test_run_sweep_keeps_the_schedule():
+    device = SimulatedRFDevice()
+    device.connect("SWEEP01")
+    request = rfcontrol_pb2.SweepRequest(dwell_ms=5.0, gain=4.0)
+    steps = []
+
+    summary = run_sweep(
+        device, request, [100.0, 101.0, 102.0, 103.0], steps.append, threading.Event()
+    )
+
+    assert [m.step.frequency for m in steps] == [100.0, 101.0, 102.0, 103.0]
+    assert [m.step.scheduled_ms for m in steps] == [0.0, 5.0, 10.0, 15.0]
+    assert all(m.step.success for m in steps)
+    assert (summary.steps, summary.failed, summary.cancelled) == (4, 0, False)
+    # Four steps, each held for its dwell time
+    assert summary.elapsed_ms >= 20.0
+    assert summary.late_max_us >= summary.late_p50_us >= 0.0
+    assert device.status == "OPERATING - Freq: 103.0MHz, Gain: 4.0dB"
+
+def _sweep_request(**kwargs):
+    values = dict(device_id="SWEEP02", start_frequency=400.0, stop_frequency=410.0,
+                  step_frequency=2.0, dwell_ms=1.0, gain=6.0)
+    values.update(kwargs)
+    return rfcontrol_pb2.SweepRequest(**values)
+
+def test_sweep_rpc_streams_steps_then_summary():
+    servicer = RFControlServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    add_servicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+            messages = list(stub.Sweep(_sweep_request()))
+            with pytest.raises(grpc.RpcError) as error:
+                list(stub.Sweep(_sweep_request(step_frequency=-1.0)))
+            assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    finally:
+        server.stop(0)
+        servicer.close()
+
+    steps = [m.step for m in messages[:-1]]
+    assert [s.frequency for s in steps] == [400.0, 402.0, 404.0, 406.0, 408.0, 410.0]
+    assert messages[-1].HasField("summary")
+    assert messages[-1].summary.steps == 6
+
+def test_aio_sweep_rpc():
+    async def run():
+        server = grpc.aio.server()
+        servicer = AsyncRFControlServicer()
+        add_servicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                stub = rfcontrol_pb2_grpc.RFControlStub(channel)
+                return [m async for m in stub.Sweep(_sweep_request(device_id="SWEEP03"))]
+        finally:
+            await server.stop(0)
+            await servicer.close()
+
+    messages = asyncio.run(run())
+    assert len(messages) == 7
+    assert messages[-1].summary.steps == 6
+    assert messages[-2].step.device_status == "OPERATING - Freq: 410.0MHz, Gain: 6.0dB"
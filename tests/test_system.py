@@ -64,3 +64,32 @@ def test_client_server_communication(server_process):
     # The client logs to stderr by default with basicConfig
     assert "Server Response: Success=True" in result.stderr
     assert "Status='OPERATING - Freq: 99.9MHz, Gain: 15.5dB'" in result.stderr
+
+def test_client_batch_file(server_process, tmp_path):
+    """The CLI client applies every entry of a batch file in one call."""
+    # Arrange
+    batch_file = tmp_path / "batch.json"
+    batch_file.write_text(
+        '[{"frequency": 433.0, "gain": 5.0, "device_id": "SYS_BATCH_01"},'
+        ' {"frequency": 868.0, "gain": 7.5, "device_id": "SYS_BATCH_02"}]'
+    )
+    client_cmd = [
+        sys.executable,
+        "-m",
+        "src.client.client",
+        "--batch", str(batch_file)
+    ]
+
+    # Act
+    result = subprocess.run(
+        client_cmd,
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH="src")
+    )
+
+    # Assert
+    assert "[SYS_BATCH_01]: Success=True, Status='OPERATING - Freq: 433.0MHz, Gain: 5.0dB'" in result.stderr
+    assert "[SYS_BATCH_02]: Success=True, Status='OPERATING - Freq: 868.0MHz, Gain: 7.5dB'" in result.stderr
+    assert "Batch complete: 2 succeeded, 0 failed" in result.stderr